@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+from scrapy.http import HtmlResponse, Request
+from scrapy.settings import Settings
+
+from world_athletics.benchmark import ReplayPage
+from world_athletics.pipelines import AnchorGroupingPipeline
+from world_athletics.spiders.anchor_collector import AnchorCollectorSpider
+
+BUDAPEST = "world-athletics-championships-budapest-2023-7138987"
+OREGON = "world-athletics-championships-oregon-2022-7137279"
+
+ROW = (
+    "<tr><td>{position}</td><td>1</td><td>1</td><td>{bib}</td><td>JAM</td>"
+    "<td>{athlete}</td><td>10.{position}0</td><td>Q</td><td>0.130</td>"
+    "<td>+0.1</td></tr>"
+)
+
+
+def _page(athletes):
+    rows = "".join(
+        ROW.format(position=i, bib=100 + i, athlete=athlete)
+        for i, athlete in enumerate(athletes, start=1)
+    )
+    return (
+        "<html><body>"
+        "<div role='button' class='ResultsLOC_unitTabActive__1e8HU'>Summary</div>"
+        f"<table class='Table_table__2zsdR'>{rows}</table>"
+        "</body></html>"
+    )
+
+
+def _callback(spider, championship, athletes):
+    url = f"https://worldathletics.org/results/world-athletics-championships/{championship}/women/100-metres/heats/summary"
+    html = _page(athletes)
+    request = Request(url, meta={"playwright_page": ReplayPage(html)})
+    response = HtmlResponse(url, body=html, encoding="utf-8", request=request)
+    return spider.parse_results(
+        response,
+        result_name="Heats",
+        event_name="women 100 Metres",
+        round_name="Heats",
+        anchor_id=1,
+        championship=championship,
+    )
+
+
+async def _interleave(*generators):
+    ## One row of each callback in turn, as concurrent callbacks would yield
+    items = []
+    pending = list(generators)
+    while pending:
+        for generator in list(pending):
+            try:
+                items.append(await generator.__anext__())
+            except StopAsyncIteration:
+                pending.remove(generator)
+    return items
+
+
+def test_interleaved_championships_get_their_own_files(tmp_path):
+    spider = AnchorCollectorSpider(output_dir=str(tmp_path))
+    spider.settings = Settings({"STREAMING_FSYNC": False})
+    budapest = ["Shericka JACKSON", "Marie-Josée TA LOU", "Sha'Carri RICHARDSON"]
+    oregon = ["Shelly-Ann FRASER-PRYCE", "Elaine THOMPSON-HERAH"]
+    items = asyncio.run(
+        _interleave(
+            _callback(spider, BUDAPEST, budapest),
+            _callback(spider, OREGON, oregon),
+        )
+    )
+    assert [item.championship for item in items[:2]] == [BUDAPEST, OREGON]
+
+    pipeline = AnchorGroupingPipeline()
+    pipeline.open_spider(spider)
+    for item in items:
+        pipeline.process_item(item, spider)
+    pipeline.close_spider(spider)
+
+    for championship, athletes in ((BUDAPEST, budapest), (OREGON, oregon)):
+        path = tmp_path / championship / "women_100_metres.json"
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)
+        assert [row["athlete"] for row in rows] == athletes
+        assert {row["championship"] for row in rows} == {championship}
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([BUDAPEST, OREGON])
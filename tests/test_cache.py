@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from world_athletics.cache import CacheTTL, content_fingerprint
+
+THIS_YEAR = datetime.now().year
+
+
+def test_explicit_patterns_win():
+    ttl = CacheTTL(patterns=[(r"/timetable", 60)], live_ttl=900)
+    assert ttl.ttl("https://worldathletics.org/competitions/x-2019/timetable") == 60
+
+
+def test_past_seasons_never_expire():
+    ttl = CacheTTL(live_ttl=900)
+    url = "https://worldathletics.org/results/world-athletics-championships/2019/x"
+    assert ttl.ttl(url) == 0
+
+
+def test_current_season_uses_the_live_ttl():
+    ttl = CacheTTL(live_ttl=900)
+    url = f"https://worldathletics.org/competitions/indoor-{THIS_YEAR}-7138/timetable"
+    assert ttl.ttl(url) == 900
+
+
+def test_latest_season_in_the_url_decides():
+    ttl = CacheTTL(live_ttl=900)
+    url = f"https://worldathletics.org/results/series-2019/{THIS_YEAR}/x"
+    assert ttl.ttl(url) == 900
+
+
+def test_urls_without_a_season_use_the_default():
+    assert CacheTTL(default_ttl=30).ttl("https://worldathletics.org/") == 30
+    ## Digits inside a longer number are no season
+    assert CacheTTL().ttl("https://worldathletics.org/athletes/id-14201847") == 0
+
+
+def test_content_fingerprint_changes_with_the_body():
+    assert content_fingerprint(b"a") == content_fingerprint(b"a")
+    assert content_fingerprint(b"a") != content_fingerprint(b"b")
@@ -0,0 +1,122 @@
+import json
+import os
+
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.utils.request import RequestFingerprinter
+from scrapy_playwright.page import PageMethod
+
+from world_athletics.cache import uncached_request
+from world_athletics.checkpoint import (
+    CHECKPOINT_KEY,
+    CrawlCheckpoint,
+    _decode_meta,
+    _encode_meta,
+    rotate,
+)
+from world_athletics.discovery import render_request
+
+
+def test_meta_round_trip_keeps_page_methods():
+    meta = {
+        "playwright": True,
+        "playwright_page_methods": [
+            PageMethod("wait_for_selector", "table", timeout=1000)
+        ],
+        "handle_httpstatus_list": [404],
+    }
+    decoded = _decode_meta(json.loads(json.dumps(_encode_meta(meta))))
+    assert decoded["playwright"] is True
+    assert decoded["handle_httpstatus_list"] == [404]
+    (method,) = decoded["playwright_page_methods"]
+    assert (method.method, method.args, method.kwargs) == (
+        "wait_for_selector",
+        ("table",),
+        {"timeout": 1000},
+    )
+
+
+def test_transient_and_unserialisable_meta_is_dropped():
+    meta = {
+        "playwright_page": object(),
+        "download_latency": 0.5,
+        "_private": 1,
+        "callback_state": object(),
+        "depth": 2,
+    }
+    assert _encode_meta(meta) == {"depth": 2}
+
+
+def test_rotate_keeps_the_previous_journal(tmp_path):
+    path = tmp_path / "frontier.jsonl"
+    assert rotate(str(path)) is None
+    path.write_text("line\n")
+    first = rotate(str(path))
+    path.write_text("line\n")
+    second = rotate(str(path))
+    assert not path.exists()
+    assert first != second
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(p) for p in (first, second)
+    )
+
+
+class Spider:
+    name = "test"
+
+    def parse(self, response):
+        pass
+
+
+def test_journal_is_buffered_and_resumed(tmp_path):
+    path = str(tmp_path / "frontier.jsonl")
+    spider = Spider()
+    fingerprinter = RequestFingerprinter()
+    checkpoint = CrawlCheckpoint(path, fingerprinter, buffer_size=100)
+    done = Request("https://example.com/a", callback=spider.parse)
+    pending = Request(
+        "https://example.com/b", callback=spider.parse, cb_kwargs={"anchor_id": 1}
+    )
+    checkpoint.scheduled(spider, done)
+    checkpoint.scheduled(spider, pending)
+    checkpoint.mark_done(done)
+    assert os.path.getsize(path) == 0
+    checkpoint.close()
+
+    resumed = CrawlCheckpoint(path, fingerprinter, resume=True)
+    (request,) = resumed.pending(spider)
+    assert request.url == "https://example.com/b"
+    assert request.cb_kwargs == {"anchor_id": 1}
+    assert resumed.is_done(done)
+    resumed.close()
+
+    ## A run that does not resume starts a new journal next to the old one
+    CrawlCheckpoint(path, fingerprinter).close()
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_children_sharing_the_parent_fingerprint_are_resumed(tmp_path):
+    path = str(tmp_path / "frontier.jsonl")
+    spider = Spider()
+    fingerprinter = RequestFingerprinter()
+    checkpoint = CrawlCheckpoint(path, fingerprinter)
+    parent = Request("https://example.com/timetable", callback=spider.parse)
+    response = HtmlResponse(parent.url, body=b"<html></html>", request=parent)
+    fallback = render_request(spider, response)
+    refresh = uncached_request(response)
+    checkpoint.scheduled(spider, parent)
+    checkpoint.scheduled(spider, fallback)
+    checkpoint.scheduled(spider, refresh)
+    ## Crash after the parent is done, before its children ran
+    checkpoint.mark_done(parent)
+    checkpoint.close()
+
+    resumed = CrawlCheckpoint(path, fingerprinter, resume=True)
+    requests = list(resumed.pending(spider))
+    assert [r.meta[CHECKPOINT_KEY] for r in requests] == ["rendered", "refresh"]
+    assert requests[0].meta["playwright"] is True
+    assert requests[0].dont_filter
+    assert requests[1].meta["render_cache_refresh"] is True
+    assert resumed.is_done(parent)
+    assert not resumed.is_done(fallback)
+    resumed.close()
@@ -0,0 +1,159 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+from scrapy.settings import Settings
+
+from world_athletics import concurrency
+from world_athletics.concurrency import AdaptiveConcurrency, available_memory_mb
+
+
+class FakeStats(dict):
+    def inc_value(self, key, count=1, start=0):
+        self[key] = self.get(key, start) + count
+
+    def set_value(self, key, value):
+        self[key] = value
+
+    def max_value(self, key, value):
+        self[key] = max(self.get(key, value), value)
+
+
+def _controller(free_mb=4096, **kwargs):
+    kwargs.setdefault("min_concurrency", 1)
+    kwargs.setdefault("max_concurrency", 4)
+    kwargs.setdefault("min_delay", 0.25)
+    kwargs.setdefault("max_delay", 10.0)
+    kwargs.setdefault("window", 10)
+    return AdaptiveConcurrency(
+        target_latency=5.0,
+        max_error_rate=0.1,
+        min_free_memory_mb=1024,
+        memory_probe=lambda: free_mb,
+        stats=FakeStats(),
+        **kwargs,
+    )
+
+
+def _window(controller, slot, n=10, latency=1.0, errors=0, timeouts=0):
+    for i in range(n):
+        controller.observe(
+            "example.com",
+            slot,
+            latency=latency,
+            error=i < errors,
+            timeout=i >= n - timeouts,
+        )
+
+
+def _within_bounds(controller, slot):
+    assert controller.min_concurrency <= slot.concurrency
+    assert slot.concurrency <= controller.max_concurrency
+    assert controller.min_delay <= slot.delay <= controller.max_delay
+
+
+def test_healthy_windows_increase_up_to_the_maximum():
+    controller = _controller()
+    slot = SimpleNamespace(concurrency=1, delay=1.0)
+    _window(controller, slot, n=9)
+    assert slot.concurrency == 1
+    for expected in (2, 3, 4, 4, 4):
+        _window(controller, slot)
+        assert slot.concurrency == expected
+        _within_bounds(controller, slot)
+    ## The delay shrinks down to its floor
+    for _ in range(10):
+        _window(controller, slot)
+    assert slot.delay == 0.25
+    assert controller.stats["adaptive_concurrency/increase/healthy"] >= 3
+
+
+def test_errors_halve_and_latency_removes_one():
+    controller = _controller()
+    slot = SimpleNamespace(concurrency=4, delay=0.25)
+    _window(controller, slot, errors=3)
+    assert (slot.concurrency, slot.delay) == (2, 0.5)
+    assert controller.stats["adaptive_concurrency/decrease/errors"] == 1
+
+    _window(controller, slot, timeouts=5)
+    assert (slot.concurrency, slot.delay) == (1, 1.0)
+    assert controller.stats["adaptive_concurrency/decrease/timeouts"] == 1
+
+    ## Never below the minimum
+    _window(controller, slot, errors=10)
+    assert slot.concurrency == 1
+
+    slot = SimpleNamespace(concurrency=4, delay=0.25)
+    _window(controller, slot, latency=9.0)
+    assert slot.concurrency == 3
+    _within_bounds(controller, slot)
+
+
+def test_throttling_halves_and_honours_retry_after():
+    controller = _controller()
+    slot = SimpleNamespace(concurrency=4, delay=0.5)
+    controller.throttled("example.com", slot)
+    assert (slot.concurrency, slot.delay) == (2, 1.0)
+    controller.throttled("example.com", slot, retry_after=7)
+    assert (slot.concurrency, slot.delay) == (1, 7.0)
+    controller.throttled("example.com", slot, retry_after=120)
+    assert (slot.concurrency, slot.delay) == (1, 10.0)
+    assert controller.stats["adaptive_concurrency/throttled"] == 3
+
+    ## A 429 starts a new window
+    _window(controller, slot, n=9)
+    assert slot.concurrency == 1
+
+
+def test_low_memory_removes_one():
+    controller = _controller(free_mb=512)
+    slot = SimpleNamespace(concurrency=3, delay=0.25)
+    _window(controller, slot)
+    assert slot.concurrency == 2
+    assert controller.stats["adaptive_concurrency/free_memory_mb"] == 512
+    assert controller.stats["adaptive_concurrency/decrease/memory"] == 1
+
+
+def test_settings_never_exceed_concurrent_requests():
+    settings = Settings(
+        {
+            "CONCURRENT_REQUESTS": 3,
+            "ADAPTIVE_CONCURRENCY_MIN": 0,
+            "ADAPTIVE_CONCURRENCY_MAX": 8,
+        }
+    )
+    controller = AdaptiveConcurrency.from_settings(settings)
+    assert (controller.min_concurrency, controller.max_concurrency) == (1, 3)
+
+
+def test_memory_probe_falls_back_to_proc_meminfo(monkeypatch):
+    monkeypatch.setattr(
+        concurrency,
+        "psutil",
+        SimpleNamespace(virtual_memory=lambda: SimpleNamespace(available=2**31)),
+    )
+    assert available_memory_mb() == 2048
+
+    monkeypatch.setattr(concurrency, "psutil", None)
+    meminfo = "MemTotal:  8388608 kB\nMemAvailable:  1048576 kB\n"
+    monkeypatch.setattr(
+        concurrency, "open", lambda *a, **kw: io.StringIO(meminfo), raising=False
+    )
+    assert available_memory_mb() == 1024
+
+    def missing(*args, **kwargs):
+        raise OSError
+
+    monkeypatch.setattr(concurrency, "open", missing, raising=False)
+    assert available_memory_mb() is None
+
+
+@pytest.mark.parametrize("start", [1, 2, 4])
+def test_mixed_windows_stay_within_bounds(start):
+    controller = _controller()
+    slot = SimpleNamespace(concurrency=start, delay=0.25)
+    for step in range(40):
+        if step % 7 == 0:
+            controller.throttled("example.com", slot, retry_after=step)
+        _window(controller, slot, latency=step % 9, errors=step % 3)
+        _within_bounds(controller, slot)
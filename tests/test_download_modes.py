@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+import pytest
+
+from world_athletics.download_modes import (
+    HTTP,
+    PLAYWRIGHT,
+    build_meta,
+    get_download_mode,
+)
+
+
+def test_playwright_meta_includes_the_page():
+    meta = build_meta(PLAYWRIGHT, handle_httpstatus_list=[404])
+    assert meta == {
+        "handle_httpstatus_list": [404],
+        "playwright": True,
+        "playwright_include_page": True,
+    }
+
+
+def test_playwright_meta_keeps_explicit_values():
+    meta = build_meta(PLAYWRIGHT, playwright_include_page=False)
+    assert meta["playwright_include_page"] is False
+
+
+def test_http_meta_drops_playwright_keys():
+    meta = build_meta(
+        HTTP,
+        playwright=True,
+        playwright_include_page=True,
+        playwright_page_methods=[],
+        cb="kept",
+    )
+    assert meta == {"cb": "kept", "playwright": False}
+
+
+def test_download_mode_from_spider_attribute():
+    spider = SimpleNamespace(name="test", download_mode=" HTTP ")
+    assert get_download_mode(spider) == HTTP
+    assert get_download_mode(SimpleNamespace(name="test")) == PLAYWRIGHT
+
+
+def test_unknown_download_mode():
+    with pytest.raises(ValueError):
+        get_download_mode(SimpleNamespace(name="test", download_mode="curl"))
@@ -0,0 +1,88 @@
+import json
+import os
+
+from world_athletics.driver import crawl_command, merge_outputs, plan_jobs
+
+
+def test_plan_jobs_shards_each_spider_and_args():
+    manifest = [
+        ("anchor-collector", ["u1", "u2", "u3"], {}),
+        ("anchor-collector", ["u4"], {"resume": "1"}),
+        ("world_athlete_indoor", ["i1"], {}),
+    ]
+    jobs = plan_jobs(manifest, workers=2)
+    assert [(job["name"], job["urls"]) for job in jobs] == [
+        ("anchor-collector-0", ["u1", "u3"]),
+        ("anchor-collector-1", ["u2"]),
+        ("anchor-collector-0-1", ["u4"]),
+        ("world_athlete_indoor-0", ["i1"]),
+    ]
+    assert jobs[2]["args"] == {"resume": "1"}
+
+
+def test_crawl_command_isolates_job_state():
+    job = {"spider": "anchor-collector", "urls": ["u1", "u2"], "args": {}}
+    command = crawl_command(job, "/runs/r/job", settings=["HTTPCACHE_DIR=/cache"])
+    settings = [command[i + 1] for i, arg in enumerate(command) if arg == "-s"]
+    assert settings == [
+        "CHECKPOINT_DIR=/runs/r/job/checkpoint",
+        "DUPEFILTER_DIR=/runs/r/job/seen",
+        "HTTPCACHE_DIR=/runs/r/job/httpcache",
+        "HTTPCACHE_DIR=/cache",
+    ]
+    assert "start_urls=u1,u2" in command
+
+
+def _write_job(run_dir, name, files):
+    job_dir = run_dir / name
+    os.makedirs(job_dir / "output")
+    (job_dir / "job.json").write_text(json.dumps({"spider": "anchor-collector"}))
+    for path, rows in files.items():
+        target = job_dir / "output" / path
+        os.makedirs(target.parent, exist_ok=True)
+        if path.endswith(".jsonl"):
+            target.write_text("".join(json.dumps(row) + "\n" for row in rows))
+        else:
+            target.write_text(json.dumps(rows))
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        if str(path).endswith(".jsonl"):
+            return [json.loads(line) for line in f]
+        return json.load(f)
+
+
+def test_merge_keeps_championships_apart(tmp_path):
+    budapest = {"championship": "budapest-2023", "athlete": "A"}
+    oregon = {"championship": "oregon-2022", "athlete": "B"}
+    doha = {"championship": "doha-2019", "athlete": "C"}
+    _write_job(
+        tmp_path,
+        "anchor-collector-0",
+        {
+            "budapest-2023/women_100_metres.json": [budapest],
+            "items.jsonl": [budapest, doha],
+        },
+    )
+    _write_job(
+        tmp_path,
+        "anchor-collector-1",
+        {
+            "oregon-2022/women_100_metres.json": [oregon],
+            ## Flat layout of an older run
+            "women_100_metres.json": [doha],
+            "items.jsonl": [oregon],
+        },
+    )
+
+    merged = os.path.join(merge_outputs(str(tmp_path)), "anchor-collector")
+    assert _read(os.path.join(merged, "budapest-2023", "women_100_metres.json")) == [
+        budapest
+    ]
+    assert _read(os.path.join(merged, "oregon-2022", "women_100_metres.json")) == [
+        oregon
+    ]
+    assert _read(os.path.join(merged, "doha-2019", "women_100_metres.json")) == [doha]
+    assert _read(os.path.join(merged, "doha-2019", "items.jsonl")) == [doha]
+    assert not os.path.exists(os.path.join(merged, "women_100_metres.json"))
@@ -0,0 +1,89 @@
+from scrapy import Request
+from scrapy.http import HtmlResponse
+
+from world_athletics.dupefilter import (
+    CanonicalDupeFilter,
+    canonical_url,
+    is_template_url,
+)
+
+BASE = "https://worldathletics.org"
+PAGE = f"{BASE}/competitions/world-athletics-championships/oregon22/timetable"
+
+
+def test_canonical_url_drops_locale_fragment_and_sorts_query():
+    assert canonical_url(f"{BASE}/en/competitions/x?b=2&a=1#resultheader") == (
+        f"{BASE}/competitions/x?a=1&b=2"
+    )
+    assert canonical_url("https://WorldAthletics.org/EN/competitions/x") == (
+        f"{BASE}/competitions/x"
+    )
+    ## A locale-like last segment is part of the path
+    assert canonical_url(f"{BASE}/en") == f"{BASE}/en"
+    assert canonical_url(f"{BASE}/fr/x", locales=("en", "fr")) == f"{BASE}/x"
+
+
+def test_template_urls():
+    assert is_template_url(f"{BASE}/competitions/[competitionGroup]/[urlSlug]")
+    assert is_template_url(f"{BASE}/competitions/%7Bslug%7D/timetable")
+    assert not is_template_url(PAGE)
+    assert canonical_url(f"{BASE}/competitions/{{slug}}") is None
+
+
+def _response(request, status=200):
+    return HtmlResponse(request.url, status=status, request=request, body=b"")
+
+
+def _run(path, *urls, fetched=(), start=()):
+    df = CanonicalDupeFilter(str(path), persist=True)
+    seen = []
+    for url in urls:
+        request = Request(url, meta={"is_start_request": url in start})
+        seen.append(df.request_seen(request))
+        if url in fetched:
+            df.response_received(_response(request, fetched[url]), request, None)
+    df.close("finished")
+    return seen
+
+
+def test_in_run_duplicates_are_filtered():
+    df = CanonicalDupeFilter()
+    assert not df.request_seen(Request(PAGE))
+    assert df.request_seen(Request(PAGE.replace(BASE, BASE + "/en") + "#top"))
+    assert df.request_seen(Request(f"{BASE}/competitions/[urlSlug]"))
+    assert df.file is None
+
+
+def test_nothing_is_written_without_persist(tmp_path):
+    df = CanonicalDupeFilter(str(tmp_path), persist=False)
+    df.request_seen(Request(PAGE))
+    df.close("finished")
+    assert not (tmp_path / "requests.seen").exists()
+
+
+def test_only_fetched_pages_are_skipped_by_later_runs(tmp_path):
+    other = f"{BASE}/competitions/x"
+    failed = f"{BASE}/competitions/y"
+    first = _run(tmp_path, PAGE, other, failed, fetched={PAGE: 200, failed: 500})
+    assert first == [False, False, False]
+    assert len((tmp_path / "requests.seen").read_text().split()) == 1
+
+    ## Scheduled-only and failed pages are requested again
+    assert _run(tmp_path, PAGE, other, failed) == [True, False, False]
+
+
+def test_start_requests_are_never_filtered(tmp_path):
+    _run(tmp_path, PAGE, fetched={PAGE: 200})
+    assert _run(tmp_path, PAGE, start=(PAGE,)) == [False]
+
+
+def test_fetched_fingerprints_survive_a_crash(tmp_path):
+    df = CanonicalDupeFilter(str(tmp_path), persist=True)
+    request = Request(PAGE)
+    df.request_seen(request)
+    df.response_received(_response(request), request, None)
+    ## No close(): the file already holds the fingerprint
+    assert (tmp_path / "requests.seen").read_text().split() == [
+        df.request_fingerprint(request)
+    ]
+    df.close("finished")
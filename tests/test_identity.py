@@ -0,0 +1,31 @@
+from world_athletics.identity import CanonicalIndex, athlete_key, country_key
+
+
+def test_athlete_key_ignores_case_accents_order_and_punctuation():
+    key = athlete_key("Shelly-Ann FRASER-PRYCE")
+    assert key == athlete_key("FRASER-PRYCE Shelly Ann")
+    assert athlete_key("Ánderson PETERS") == athlete_key("anderson peters")
+
+
+def test_country_key_prefers_the_ioc_code():
+    assert country_key("Jamaica JAM") == "JAM"
+    assert country_key("JAM") == "JAM"
+    assert country_key("Côte d'Ivoire") == country_key("cote d ivoire")
+
+
+def test_ids_are_stable_across_spellings_and_runs(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    index = CanonicalIndex(path)
+    first = index.athlete_id("Shelly-Ann FRASER-PRYCE")
+    assert index.athlete_id("FRASER-PRYCE Shelly Ann") == first
+    assert index.athlete_id("Elaine THOMPSON-HERAH") != first
+    assert index.country_id("Jamaica JAM") == index.country_id("JAM")
+    assert index.athlete_id(None) is None
+    assert index.athlete_id("  ") is None
+    index.close()
+
+    ## A second run, or another worker, reads the same IDs back
+    reopened = CanonicalIndex(path)
+    assert reopened.athlete_id("Shelly-Ann Fraser-Pryce") == first
+    assert len(reopened) == 3
+    reopened.close()
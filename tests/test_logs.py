@@ -0,0 +1,50 @@
+import logging
+
+from scrapy.utils import log as scrapy_log
+
+from world_athletics.logs import (
+    FAILED_URLS_LOGGER,
+    RateLimitFilter,
+    _ScrapyHandlerFilter,
+    log_failed_url,
+)
+
+
+def _record(name, msg, level=logging.INFO):
+    return logging.LogRecord(name, level, __file__, 1, msg, (), None)
+
+
+class FakeStats(dict):
+    def inc_value(self, key, count=1, start=0):
+        self[key] = self.get(key, start) + count
+
+
+def test_failed_urls_are_info_and_counted(caplog):
+    stats = FakeStats()
+    with caplog.at_level(logging.INFO, logger=FAILED_URLS_LOGGER):
+        log_failed_url("https://worldathletics.org/x", stats)
+    (record,) = caplog.records
+    assert record.levelno == logging.INFO
+    assert record.getMessage() == "https://worldathletics.org/x"
+    assert stats == {"failed_urls": 1}
+
+
+def test_failed_urls_are_never_rate_limited():
+    limit = RateLimitFilter(rate=1, burst=1, clock=lambda: 0.0)
+    url = "https://worldathletics.org/x"
+    assert all(limit.filter(_record(FAILED_URLS_LOGGER, url)) for _ in range(5))
+    assert limit.filter(_record("other", "row"))
+    assert not limit.filter(_record("other", "row"))
+
+
+def test_console_is_quiet_while_scrapy_prints(monkeypatch):
+    handler = logging.NullHandler()
+    monkeypatch.setattr(scrapy_log, "_scrapy_root_handler", handler)
+    console = _ScrapyHandlerFilter()
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        assert not console.filter(_record("x", "twice"))
+    finally:
+        root.removeHandler(handler)
+    assert console.filter(_record("x", "once"))
@@ -0,0 +1,62 @@
+import pytest
+
+from world_athletics.normalize import (
+    normalize_results,
+    parse_int,
+    parse_mark,
+    parse_mark_info,
+    parse_wind,
+)
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("10.67 CR", 10.67),
+        ("1:44.21", 104.21),
+        ("2:05:30", 7530.0),
+        ("8.45", 8.45),
+        ("8,909", 8909.0),
+        ("6 023", 6023.0),
+        ("6\u00a0023 PB", 6023.0),
+        ("8909", 8909.0),
+        ("10.39(-0.381\n) ", 10.39),
+        ("DNS", None),
+        (None, None),
+    ],
+)
+def test_parse_mark(raw, expected):
+    assert parse_mark(raw) == expected
+
+
+def test_parse_mark_info_keeps_tie_flags():
+    assert parse_mark_info("10.83 =NR").records == ("=NR",)
+    assert parse_mark_info("7.01 =PB SB").records == ("=PB", "SB")
+    assert parse_mark_info("10.67 CR").records == ("CR",)
+
+
+def test_parse_mark_info_status_and_wind():
+    info = parse_mark_info("10.39(-0.381) ")
+    assert (info.value, info.wind, info.status) == (10.39, -0.381, None)
+    assert parse_mark_info("DQ TR16.8").status == "DQ"
+
+
+def test_parse_int_and_wind():
+    assert parse_int("12.") == 12
+    assert parse_int("1.5") is None
+    assert parse_wind("", "10.1(+1.2)") == 1.2
+    assert parse_wind("-0.4", "10.1(+1.2)") == -0.4
+
+
+def test_normalize_results_batch():
+    columns = {
+        "position": ["1", "2", ""],
+        "mark": ["8,909 WL", "8 750 =PB", "DNF"],
+        "wind": ["", "", ""],
+    }
+    numeric = normalize_results(columns)
+    assert numeric["position_value"] == [1, 2, None]
+    assert numeric["mark_value"] == [8909.0, 8750.0, None]
+    assert numeric["records"] == ["WL", "=PB", None]
+    assert numeric["status"] == [None, None, "DNF"]
+    assert numeric["reaction_time_value"] == [None, None, None]
@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+
+from scrapy.http import HtmlResponse, Request
+
+from world_athletics.page_pool import PagePool, managed_page, release_request_page
+
+
+class FakePage:
+    def __init__(self):
+        self.context = SimpleNamespace(browser=None)
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    async def goto(self, url):
+        return None
+
+    async def close(self):
+        self.closed = True
+
+    def remove_listener(self, event, handler):
+        return None
+
+
+def _response(page):
+    request = Request("https://example.com/", meta={"playwright_page": page})
+    return HtmlResponse(request.url, body=b"<html></html>", request=request)
+
+
+def test_managed_page_releases_the_page_once():
+    page = FakePage()
+    spider = SimpleNamespace(page_pool=PagePool(size=4))
+    spider.page_pool.track(page)
+    response = _response(page)
+
+    async def callback():
+        async with managed_page(spider, response) as managed:
+            assert managed is page
+        ## Later exception handling releases the request again
+        await release_request_page(spider, response)
+
+    asyncio.run(callback())
+    assert "playwright_page" not in response.meta
+    assert list(spider.page_pool._idle) == [page]
+    assert spider.page_pool.open_pages == 0
+
+
+def test_managed_page_releases_on_exception():
+    page = FakePage()
+    spider = SimpleNamespace(page_pool=PagePool(size=4))
+    response = _response(page)
+
+    async def callback():
+        async with managed_page(spider, response):
+            raise ValueError("parse failed")
+
+    try:
+        asyncio.run(callback())
+    except ValueError:
+        pass
+    assert list(spider.page_pool._idle) == [page]
+
+
+def test_pool_without_room_closes_the_page():
+    page = FakePage()
+    pool = PagePool(size=0)
+    asyncio.run(pool.release(page))
+    assert page.closed
+    assert len(pool) == 0
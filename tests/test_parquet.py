@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+
+from world_athletics.items import OutdoorResultItem
+from world_athletics.pipelines import ParquetExportPipeline
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def _row(position, athlete, mark, championship="Oregon 2022", **extra):
+    return OutdoorResultItem(
+        anchor_id="1",
+        championship=championship,
+        event_name="100 Metres Men",
+        round_name="Final",
+        result_name="Final",
+        position=position,
+        athlete=athlete,
+        country="USA",
+        mark=mark,
+        wind="+0.4",
+        **extra,
+    )
+
+
+def _export(tmp_path, items, batch_rows=100):
+    pipeline = ParquetExportPipeline(str(tmp_path), batch_rows=batch_rows)
+    spider = SimpleNamespace(name="anchor-collector", run_id="test")
+    pipeline.open_spider(spider)
+    for item in items:
+        pipeline.process_item(item, spider)
+    pipeline.close_spider(spider)
+    return pq.read_table(tmp_path)
+
+
+def test_canonical_ids_stay_integers(tmp_path):
+    table = _export(
+        tmp_path,
+        [
+            _row("1", "Fred KERLEY", "9.86", athlete_id=7, country_id=2),
+            _row("2", "Marvin BRACY", "9.88", athlete_id=8, country_id=None),
+        ],
+    )
+    schema = table.schema
+    assert schema.field("athlete_id").type == pa.int64()
+    assert schema.field("country_id").type == pa.int64()
+    assert table.column("athlete_id").to_pylist() == [7, 8]
+    assert table.column("country_id").to_pylist() == [2, None]
+
+
+def test_normalised_and_text_columns(tmp_path):
+    table = _export(tmp_path, [_row("1", "Fred KERLEY", "9.86 =CR")])
+    schema = table.schema
+    assert schema.field("position").type == pa.int32()
+    assert schema.field("wind").type == pa.float64()
+    assert schema.field("mark_value").type == pa.float64()
+    assert schema.field("athlete").type == pa.string()
+    assert schema.field("anchor_id").type == pa.string()
+    assert table.column("mark_value").to_pylist() == [9.86]
+    assert table.column("records").to_pylist() == ["=CR"]
+
+
+def test_output_reads_back_as_one_dataset(tmp_path):
+    rows = [
+        _row("1", "Fred KERLEY", "9.86", athlete_id=7, country_id=2),
+        _row("2", "Marvin BRACY", "9.88", athlete_id=8, country_id=2),
+        _row("3", "Trayvon BROMELL", "9.88", athlete_id=9, country_id=2),
+        _row("1", "Marcell JACOBS", "9.80", "Tokyo 2020", athlete_id=10),
+    ]
+    ## Two part files for Oregon, one for Tokyo
+    table = _export(tmp_path, rows, batch_rows=2)
+    assert len(list(tmp_path.rglob("*.parquet"))) == 3
+    assert table.num_rows == 4
+    schema = table.schema
+    assert schema.field("athlete_id").type == pa.int64()
+    assert schema.field("position").type == pa.int32()
+    assert schema.field("mark_value").type == pa.float64()
+    assert sorted(table.column("championship").to_pylist()) == [
+        "Oregon 2022",
+        "Oregon 2022",
+        "Oregon 2022",
+        "Tokyo 2020",
+    ]
+    assert set(table.column("round").to_pylist()) == {"Final"}
+
+
+def test_undeclared_fields_are_typed_from_their_values():
+    types = ParquetExportPipeline._value_type
+    assert types([1, None, 3]) is int
+    assert types([1, 2.5]) is float
+    assert types([True, False]) is bool
+    assert types(["1", 2]) is str
+    assert types([None]) is str
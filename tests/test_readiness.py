@@ -0,0 +1,113 @@
+import asyncio
+from collections import defaultdict
+
+from world_athletics.readiness import EMPTY, IDLE, READY, TIMEOUT, ReadinessEngine
+
+
+class FakePage:
+    """Page whose selectors appear when ``show`` is called."""
+
+    def __init__(self):
+        self.listeners = defaultdict(list)
+        self.shown = {}
+
+    def on(self, event, handler):
+        self.listeners[event].append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners[event].remove(handler)
+
+    def emit(self, event, request):
+        for handler in list(self.listeners[event]):
+            handler(request)
+
+    def show(self, selector):
+        self.shown.setdefault(selector, asyncio.Event()).set()
+
+    async def wait_for_selector(self, selector, state=None, timeout=None):
+        shown = self.shown.setdefault(selector, asyncio.Event())
+        await asyncio.wait_for(shown.wait(), timeout / 1000)
+        return selector
+
+
+class FakeRequest:
+    def __init__(self, resource_type):
+        self.resource_type = resource_type
+
+
+def _engine():
+    return ReadinessEngine(default_timeout=0.3, max_timeout=5, quiet=0.2)
+
+
+def test_request_started_by_the_action_extends_the_wait():
+    ## The click starts an XHR that outlives the budget, the table shows up
+    ## once it finishes
+    page = FakePage()
+    xhr = FakeRequest("xhr")
+
+    async def click():
+        page.emit("request", xhr)
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.6, page.emit, "requestfinished", xhr)
+        loop.call_later(0.7, page.show, "table")
+
+    async def run():
+        return await _engine().wait(page, "results", "table", action=click)
+
+    assert asyncio.run(run()) == READY
+    assert not any(page.listeners.values())
+
+
+def test_request_started_during_the_wait_extends_it():
+    page = FakePage()
+    xhr = FakeRequest("fetch")
+    engine = _engine()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        waiting = asyncio.ensure_future(engine.wait(page, "results", "table"))
+        await asyncio.sleep(0)
+        page.emit("request", xhr)
+        loop.call_later(0.5, page.emit, "requestfinished", xhr)
+        loop.call_later(0.55, page.show, "table")
+        return await waiting
+
+    assert asyncio.run(run()) == READY
+
+
+def test_empty_marker():
+    page = FakePage()
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.05, page.show, "text=No results")
+        return await _engine().wait(page, "results", "table", empty=["text=No results"])
+
+    assert asyncio.run(run()) == EMPTY
+
+
+def test_quiet_page_without_the_selector_is_idle_after_the_budget():
+    async def run():
+        return await _engine().wait(FakePage(), "results", "table")
+
+    assert asyncio.run(run()) == IDLE
+
+
+def test_page_still_loading_at_max_timeout():
+    page = FakePage()
+    engine = ReadinessEngine(default_timeout=0.1, max_timeout=0.3, quiet=0.1)
+
+    async def click():
+        page.emit("request", FakeRequest("document"))
+
+    async def run():
+        return await engine.wait(page, "results", "table", action=click)
+
+    assert asyncio.run(run()) == TIMEOUT
+
+
+def test_budget_is_learned_from_ready_times():
+    engine = ReadinessEngine(default_timeout=15, min_timeout=2, max_timeout=30)
+    assert engine.budget("results") == 15
+    for seconds in (1.0, 1.5, 2.0, 2.5, 3.0):
+        engine._record("results", READY, seconds)
+    assert engine.budget("results") == 6.0
@@ -0,0 +1,80 @@
+from world_athletics.resource_blocking import ResourceBlocker
+
+SITE = "https://worldathletics.org"
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type, navigation=False):
+        self.url = url
+        self.resource_type = resource_type
+        self.navigation = navigation
+
+    def is_navigation_request(self):
+        return self.navigation
+
+
+class FakeStats(dict):
+    def inc_value(self, key, count=1, start=0):
+        self[key] = self.get(key, start) + count
+
+
+def _blocker(**kwargs):
+    kwargs.setdefault("resource_types", ["image", "font"])
+    kwargs.setdefault("deny_domains", ["googletagmanager.com", ".doubleclick.net"])
+    return ResourceBlocker(stats=FakeStats(), **kwargs)
+
+
+def test_types_and_denied_domains_are_blocked():
+    blocker = _blocker()
+    assert blocker.should_block(f"{SITE}/logo.png", "image") == "type"
+    assert blocker.should_block(f"{SITE}/font.woff2", "font") == "type"
+    assert blocker.should_block(f"{SITE}/_next/app.js", "script") is None
+    assert blocker.should_block(f"{SITE}/api/graphql", "fetch") is None
+    assert (
+        blocker.should_block("https://www.googletagmanager.com/gtm.js", "script")
+        == "domain"
+    )
+    assert blocker.should_block("https://ad.doubleclick.net/x", "xhr") == "domain"
+    ## Only the domain and its subdomains
+    assert blocker.should_block("https://notdoubleclick.net/x", "xhr") is None
+
+
+def test_allow_list_blocks_every_other_host():
+    blocker = _blocker(allow_domains=["worldathletics.org"])
+    assert blocker.should_block(f"{SITE}/api/graphql", "fetch") is None
+    assert (
+        blocker.should_block("https://media.worldathletics.org/x.js", "script") is None
+    )
+    assert blocker.should_block("https://cdn.example.com/x.js", "script") == "domain"
+
+
+def test_navigation_is_never_blocked():
+    blocker = _blocker(
+        resource_types=["document", "image"],
+        deny_domains=["worldathletics.org"],
+        allow_domains=["example.com"],
+    )
+    page = f"{SITE}/competitions/world-athletics-championships"
+    assert blocker.should_block(page, "document") is None
+    assert blocker.should_block(f"{SITE}/x.png", "image", is_navigation=True) is None
+    assert blocker(FakeRequest(page, "document", navigation=True)) is False
+    assert blocker.stats == {"resource_blocking/allowed": 1}
+
+
+def test_stats_keys_stay_bounded():
+    blocker = _blocker(allow_domains=["worldathletics.org"])
+    for i in range(50):
+        blocker(FakeRequest(f"https://tracker{i}.example.com/t.js", "script"))
+        blocker(FakeRequest(f"https://ads{i}.doubleclick.net/a.js", "script"))
+        blocker(FakeRequest(f"https://cdn{i}.example.com/a.png", "image"))
+    assert blocker(FakeRequest(f"{SITE}/api/graphql", "fetch")) is False
+    assert blocker.stats == {
+        "resource_blocking/blocked": 150,
+        "resource_blocking/blocked/domain": 100,
+        "resource_blocking/blocked/type": 50,
+        "resource_blocking/blocked/type/script": 100,
+        "resource_blocking/blocked/type/image": 50,
+        "resource_blocking/blocked/domain/not_allowed": 50,
+        "resource_blocking/blocked/domain/doubleclick.net": 50,
+        "resource_blocking/allowed": 1,
+    }
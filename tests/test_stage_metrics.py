@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from scrapy.spiders import Spider
+
+from world_athletics.metrics import StageMetrics
+from world_athletics.middlewares import StageMetricsSpiderMiddleware
+
+
+class FakeStats(dict):
+    def get_value(self, key, default=None):
+        return self.get(key, default)
+
+    def set_value(self, key, value):
+        self[key] = value
+
+    def inc_value(self, key, count=1, start=0):
+        self[key] = self.get(key, start) + count
+
+
+def _middleware(tmp_path, engine=None):
+    crawler = SimpleNamespace(engine=engine, stats=FakeStats())
+    path = str(tmp_path / "metrics.prom")
+    return StageMetricsSpiderMiddleware(crawler, StageMetrics(), 15, path=path)
+
+
+def test_queue_depth_comes_from_the_scheduler_stats(tmp_path):
+    mw = _middleware(tmp_path)
+    stats = mw.crawler.stats
+    stats.set_value("scheduler/enqueued", 10)
+    stats.set_value("scheduler/dequeued", 4)
+    mw.sample(Spider("x"))
+    assert mw.metrics.gauges["queue_depth"].value == 6
+
+
+def test_sampling_survives_a_missing_engine_or_scheduler(tmp_path):
+    mw = _middleware(tmp_path)
+    mw.sample(Spider("x"))
+    assert "queue_depth" not in mw.metrics.gauges
+    assert "downloads_in_flight" not in mw.metrics.gauges
+
+    engine = SimpleNamespace(downloader=SimpleNamespace(active={1, 2}))
+    mw = _middleware(tmp_path, engine)
+    mw.sample(Spider("x"))
+    assert mw.metrics.gauges["downloads_in_flight"].value == 2
@@ -0,0 +1,69 @@
+from parsel import Selector
+
+from world_athletics.tables import JOINED, VALUE, Column, TableExtractor
+
+HEADER_TABLE = """
+<table>
+  <thead><tr><th>Pos</th><th>Athlete</th><th>Country</th><th>Mark</th></tr></thead>
+  <tbody>
+    <tr><td>1</td><td><a>Jane <b>DOE</b></a></td><td> USA </td><td>10.67 CR</td></tr>
+    <tr><td>2</td><td><a>Ann ROE</a></td><td>JAM</td></tr>
+  </tbody>
+</table>
+"""
+
+DATA_TH_TABLE = """
+<table>
+  <tbody>
+    <tr>
+      <td data-th="RESULTS"><span>7.01</span> <span>PB</span></td>
+      <td data-th="POS">3</td>
+    </tr>
+  </tbody>
+</table>
+"""
+
+
+def _table(html):
+    return Selector(text=html).xpath("//table")[0]
+
+
+def test_columns_found_by_header_label():
+    extractor = TableExtractor(
+        [
+            Column("position", header="POS"),
+            Column("athlete", header="athlete", mode=JOINED),
+            Column("country", header="Country", mode=JOINED),
+            Column("mark", header="MARK", default=""),
+        ]
+    )
+    assert extractor.extract(_table(HEADER_TABLE)) == {
+        "position": ["1", "2"],
+        "athlete": ["Jane DOE", "Ann ROE"],
+        "country": ["USA", "JAM"],
+        "mark": ["10.67 CR", ""],
+    }
+
+
+def test_index_is_used_without_a_matching_header():
+    extractor = TableExtractor(
+        [Column("position", header="Place", index=1), Column("missing", index=9)]
+    )
+    assert list(extractor.rows(_table(HEADER_TABLE))) == [
+        {"position": "1", "missing": None},
+        {"position": "2", "missing": None},
+    ]
+
+
+def test_headers_from_data_th_and_paths():
+    extractor = TableExtractor(
+        [
+            Column("position", header="POS", path="text()"),
+            Column("mark", header="RESULTS", path=".//span/text()", mode=JOINED),
+            Column("first", header="RESULTS", path="normalize-space(.)", mode=VALUE),
+        ],
+        header_attr="data-th",
+    )
+    assert list(extractor.rows(_table(DATA_TH_TABLE))) == [
+        {"position": "3", "mark": "7.01 PB", "first": "7.01 PB"}
+    ]
@@ -0,0 +1,28 @@
+from twisted.internet.task import Clock
+
+from world_athletics.writers import JsonLinesWriter, read_jsonl
+
+
+def test_slow_rows_are_flushed_by_the_timer(tmp_path):
+    path = str(tmp_path / "100m.jsonl")
+    clock = Clock()
+    writer = JsonLinesWriter(buffer_rows=500, flush_interval=30, fsync=False)
+    writer.start(clock)
+    writer.write(path, {"athlete": "Fred KERLEY"})
+    assert list(read_jsonl(path)) == []
+
+    ## No further row arrives, the timer still flushes the buffer
+    clock.advance(30)
+    assert list(read_jsonl(path)) == [{"athlete": "Fred KERLEY"}]
+
+    writer.close()
+    assert not clock.getDelayedCalls()
+
+
+def test_full_buffer_is_flushed_at_once(tmp_path):
+    path = str(tmp_path / "100m.jsonl")
+    writer = JsonLinesWriter(buffer_rows=2, flush_interval=30, fsync=False)
+    writer.write(path, {"position": "1"})
+    writer.write(path, {"position": "2"})
+    assert len(list(read_jsonl(path))) == 2
+    writer.close()
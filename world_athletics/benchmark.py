@@ -0,0 +1,241 @@
+## Offline parse benchmark
+#
+# Replays spider callbacks against saved HTML fixtures, without network or a
+# browser, and reports rows/sec, us per row and peak memory per callback. When
+# a reference JSON is given, the yielded rows are checked against it.
+#
+#   python -m world_athletics.benchmark
+#   python -m world_athletics.benchmark --manifest benchmarks.json --repeat 20
+#
+# A manifest is a JSON list of entries like:
+#
+#   {
+#     "callback": "world_athlete_indoor.parse_rounds",
+#     "fixture": "fixtures/indoor_400m_heats.html",
+#     "reference": "fixtures/indoor_400m_heats.json",
+#     "url": "https://worldathletics.org/results/...",
+#     "cb_kwargs": {"round_name": "Heats", ...},
+#     "spider_attrs": {}
+#   }
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from itemadapter import ItemAdapter, is_item
+from scrapy import Request
+from scrapy.http import HtmlResponse
+
+from world_athletics.spiders.anchor_collector import AnchorCollectorSpider
+from world_athletics.spiders.asian_athletics import AsianAthleticsSpider
+from world_athletics.spiders.world_athlete_indoor import WorldAthleteIndoorSpider
+
+CALLBACKS = {
+    "asian_athletics.parse": (AsianAthleticsSpider, "parse"),
+    "anchor-collector.parse_results": (AnchorCollectorSpider, "parse_results"),
+    "world_athlete_indoor.parse_rounds": (WorldAthleteIndoorSpider, "parse_rounds"),
+}
+
+DEFAULT_MANIFEST = [
+    {
+        "callback": "asian_athletics.parse",
+        "fixture": fixture,
+        "reference": "items.json",
+        "url": AsianAthleticsSpider.start_urls[0],
+    }
+    for fixture in ("render.html", "rendered.html", "rendered1.html")
+]
+
+
+class ReplayLocator:
+    # Stands in for a Playwright locator, every element "exists" and is active
+
+    def locator(self, *args, **kwargs):
+        return self
+
+    async def count(self):
+        return 1
+
+    async def evaluate(self, *args, **kwargs):
+        return True
+
+    async def click(self, *args, **kwargs):
+        return None
+
+
+class ReplayPage:
+    # Stands in for a Playwright page, the DOM is the saved fixture
+
+    def __init__(self, html):
+        self.html = html
+        self.closed = False
+
+    async def content(self):
+        return self.html
+
+    async def click(self, *args, **kwargs):
+        return None
+
+    async def wait_for_selector(self, selector, timeout=None, **kwargs):
+        ## Fixtures are fully rendered: selectors match at once, text markers
+        ## such as "no results" never do
+        if selector.startswith("text="):
+            await asyncio.sleep((timeout or 0) / 1000)
+            raise TimeoutError(selector)
+        return None
+
+    def locator(self, *args, **kwargs):
+        return ReplayLocator()
+
+    def on(self, *args, **kwargs):
+        return None
+
+    def remove_listener(self, *args, **kwargs):
+        return None
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+def load_reference(path):
+    """
+    Load reference rows, also accepting truncated feed exports with one
+    object per line.
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    rows = []
+    for line in text.splitlines():
+        line = line.strip().rstrip(",")
+        if line.startswith("{") and line.endswith("}"):
+            rows.append(json.loads(line))
+    return rows
+
+
+def _normalize(value):
+    ## Saved pages and reference rows may come from different serialisations,
+    ## whitespace inside cells is not significant
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def compare(rows, reference):
+    """
+    Count rows equal to the reference row at the same position, on the keys
+    of the reference row.
+    """
+    matched = 0
+    for row, ref in zip(rows, reference):
+        if all(_normalize(row.get(k)) == _normalize(v) for k, v in ref.items()):
+            matched += 1
+    return {
+        "rows": len(rows),
+        "reference_rows": len(reference),
+        "matched": matched,
+        "ok": matched == len(reference) == len(rows),
+    }
+
+
+def build_response(entry, html):
+    url = entry.get("url") or "https://example.com/"
+    meta = {}
+    if entry["callback"] != "asian_athletics.parse":
+        meta["playwright_page"] = ReplayPage(html)
+    request = Request(url, meta=meta, cb_kwargs=entry.get("cb_kwargs") or {})
+    return HtmlResponse(url=url, body=html, encoding="utf-8", request=request)
+
+
+async def run_callback(entry, html):
+    spider_cls, method_name = CALLBACKS[entry["callback"]]
+    spider = spider_cls()
+    for key, value in (entry.get("spider_attrs") or {}).items():
+        setattr(spider, key, value)
+
+    response = build_response(entry, html)
+    callback = getattr(spider, method_name)
+    rows = []
+    async for output in callback(response, **response.request.cb_kwargs):
+        if is_item(output):
+            rows.append(ItemAdapter(output).asdict())
+    return rows
+
+
+def bench_entry(entry, repeat):
+    with open(entry["fixture"], encoding="utf-8") as f:
+        html = f.read()
+
+    rows = asyncio.run(run_callback(entry, html))
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        asyncio.run(run_callback(entry, html))
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    asyncio.run(run_callback(entry, html))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    result = {
+        "callback": entry["callback"],
+        "fixture": entry["fixture"],
+        "rows": len(rows),
+        "best_s": best,
+        "rows_per_s": len(rows) / best if best else 0.0,
+        "us_per_row": best * 1e6 / len(rows) if rows else 0.0,
+        "peak_mem_kb": peak / 1024,
+    }
+    if entry.get("reference"):
+        result["check"] = compare(rows, load_reference(entry["reference"]))
+    return result
+
+
+def format_result(result):
+    line = (
+        f"{result['callback']:<36} {result['fixture']:<24} "
+        f"rows={result['rows']:<6} {result['rows_per_s']:>10.0f} rows/s "
+        f"{result['us_per_row']:>8.1f} us/row  peak={result['peak_mem_kb']:.0f} KiB"
+    )
+    check = result.get("check")
+    if check:
+        status = "OK" if check["ok"] else "MISMATCH"
+        line += f"  ref={check['matched']}/{check['reference_rows']} {status}"
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline parse benchmark")
+    parser.add_argument("--manifest", help="JSON list of benchmark entries")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args(argv)
+
+    manifest = DEFAULT_MANIFEST
+    if args.manifest:
+        with open(args.manifest, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    results = [bench_entry(entry, args.repeat) for entry in manifest]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(format_result(result))
+    return results
+
+
+if __name__ == "__main__":
+    main()
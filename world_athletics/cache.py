@@ -0,0 +1,172 @@
+## On-disk cache of rendered pages and extracted rows
+#
+# RenderCacheStorage is a drop-in HTTPCACHE_STORAGE that keeps the rendered
+# HTML returned by scrapy-playwright, with an expiration picked per URL:
+# RENDER_CACHE_TTLS patterns first, then pages of past seasons never expire
+# and pages of the current season expire after RENDER_CACHE_LIVE_TTL.
+#
+# RowCache stores the rows extracted from a page next to it, tagged with the
+# fingerprint of the page body, so callbacks that need clicks (result tabs)
+# can be skipped entirely when the page has not changed.
+
+from datetime import datetime
+import hashlib
+import json
+import os
+import re
+from time import time
+
+from itemadapter import ItemAdapter
+from scrapy.extensions.httpcache import FilesystemCacheStorage
+from scrapy.utils.project import data_path
+
+from world_athletics.checkpoint import child_meta
+
+_SEASON_RE = re.compile(r"[-/](19\d\d|20\d\d)(?=[-/]|$)")
+
+
+def content_fingerprint(body):
+    return hashlib.sha1(body).hexdigest()
+
+
+class CacheTTL:
+    """
+    Expiration in seconds for a URL, 0 meaning never expire. Explicit
+    (pattern, seconds) pairs win, otherwise the season found in the URL
+    decides between forever (past) and live_ttl (current or unknown).
+    """
+
+    def __init__(self, patterns=(), live_ttl=900, default_ttl=0):
+        self.patterns = [(re.compile(p), int(ttl)) for p, ttl in patterns]
+        self.live_ttl = live_ttl
+        self.default_ttl = default_ttl
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            patterns=settings.getlist("RENDER_CACHE_TTLS"),
+            live_ttl=settings.getint("RENDER_CACHE_LIVE_TTL", 900),
+            default_ttl=settings.getint("HTTPCACHE_EXPIRATION_SECS"),
+        )
+
+    def ttl(self, url):
+        for pattern, ttl in self.patterns:
+            if pattern.search(url):
+                return ttl
+
+        seasons = [int(year) for year in _SEASON_RE.findall(url)]
+        if not seasons:
+            return self.default_ttl
+        if max(seasons) < datetime.now().year:
+            return 0
+        return self.live_ttl
+
+
+class RenderCacheStorage(FilesystemCacheStorage):
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.ttl = CacheTTL.from_settings(settings)
+
+    def store_response(self, spider, request, response):
+        super().store_response(spider, request, response)
+        self._inc_stat(spider, "render_cache/stored")
+
+    def retrieve_response(self, spider, request):
+        ## Forced refresh: treat as a miss, the new response is stored again
+        if request.meta.get("render_cache_refresh"):
+            self._inc_stat(spider, "render_cache/refresh")
+            return None
+        response = super().retrieve_response(spider, request)
+        self._inc_stat(spider, "render_cache/hit" if response else "render_cache/miss")
+        return response
+
+    @staticmethod
+    def _inc_stat(spider, key):
+        spider.crawler.stats.inc_value(key)
+
+    def _read_meta(self, spider, request):
+        metapath = os.path.join(self._get_request_path(spider, request), "pickled_meta")
+        if not os.path.exists(metapath):
+            return None
+
+        ttl = self.ttl.ttl(request.url)
+        if 0 < ttl < time() - os.stat(metapath).st_mtime:
+            self._inc_stat(spider, "render_cache/expired")
+            return None
+
+        ## Use the default reader, without its global expiration check
+        expiration_secs, self.expiration_secs = self.expiration_secs, 0
+        try:
+            return super()._read_meta(spider, request)
+        finally:
+            self.expiration_secs = expiration_secs
+
+
+class RowCache:
+    def __init__(self, cachedir, fingerprinter, stats=None):
+        self.cachedir = cachedir
+        self.fingerprinter = fingerprinter
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Return a RowCache, or None when HTTPCACHE_ENABLED is off."""
+        settings = crawler.settings
+        if not settings.getbool("HTTPCACHE_ENABLED"):
+            return None
+        return cls(
+            cachedir=os.path.join(data_path(settings["HTTPCACHE_DIR"]), "rows"),
+            fingerprinter=crawler.request_fingerprinter,
+            stats=crawler.stats,
+        )
+
+    def _path(self, spider, request):
+        key = self.fingerprinter.fingerprint(request).hex()
+        return os.path.join(self.cachedir, spider.name, key[0:2], f"{key}.json")
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(key)
+
+    def get(self, spider, response):
+        """Return the cached rows for an unchanged page, else None."""
+        path = self._path(spider, response.request)
+        if not os.path.exists(path):
+            self._inc_stat("row_cache/miss")
+            return None
+
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+        if entry.get("fingerprint") != content_fingerprint(response.body):
+            self._inc_stat("row_cache/changed")
+            return None
+
+        self._inc_stat("row_cache/hit")
+        return entry["rows"]
+
+    def set(self, spider, response, rows):
+        path = self._path(spider, response.request)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "url": response.url,
+            "fingerprint": content_fingerprint(response.body),
+            "rows": [ItemAdapter(row).asdict() for row in rows],
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._inc_stat("row_cache/stored")
+
+
+def uncached_request(response):
+    """
+    Copy of the response's request that is rendered again instead of being
+    served from the cache (the new render replaces the cached one).
+    """
+    request = response.request
+    meta = child_meta(
+        {k: v for k, v in request.meta.items() if k != "playwright_page"}, "refresh"
+    )
+    meta["render_cache_refresh"] = True
+    return request.replace(meta=meta, dont_filter=True)
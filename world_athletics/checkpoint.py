@@ -0,0 +1,275 @@
+## Crawl checkpoint and resume
+#
+# Every request a spider schedules is appended to a frontier journal
+# (logs/<spider>/checkpoint/frontier.jsonl) with its callback, cb_kwargs and
+# the serialisable part of its meta. When a callback has consumed its response
+# completely the request is journaled as done, failed downloads and callbacks
+# are journaled as failed.
+#
+# Journal lines are buffered and written every CHECKPOINT_FLUSH_INTERVAL
+# seconds, when CHECKPOINT_BUFFER lines are waiting and when the spider closes.
+# A crash only loses the end of the journal, and a request is journaled done
+# after the requests it yielded, so no done request loses its children.
+#
+# Started with ``-a resume=1`` a spider skips its start requests and schedules
+# again every journaled request that is not done (failed, in flight or never
+# downloaded), with its original cb_kwargs, and never schedules again a
+# request that an earlier run already completed. A run that does not resume
+# moves the journal of the previous run aside (frontier.<time>.jsonl) instead
+# of overwriting it.
+#
+# Requests are journaled by fingerprint. A copy of a request sent again with
+# dont_filter (the rendered discovery fallback, the refresh of a cached page)
+# has the fingerprint of its parent, so it carries a CHECKPOINT_KEY tag in its
+# meta (child_meta) and is journaled as its own entry.
+
+from datetime import datetime
+import json
+import logging
+import os
+
+import scrapy
+from scrapy_playwright.page import PageMethod
+
+logger = logging.getLogger(__name__)
+
+SCHEDULED = "scheduled"
+DONE = "done"
+FAILED = "failed"
+
+## Meta key telling apart requests that share a fingerprint
+CHECKPOINT_KEY = "checkpoint_key"
+
+## Meta keys holding live objects or per-download state, never journaled
+TRANSIENT_META = {
+    "playwright_page",
+    "playwright_page_event_handlers",
+    "playwright_context",
+    "download_slot",
+    "download_latency",
+    "download_timeout",
+    "stage_timings",
+}
+
+_FALSE_VALUES = ("", "0", "false", "no", "off")
+
+
+def is_resuming(spider):
+    """True when the spider was started with ``-a resume=1``."""
+    value = getattr(spider, "resume", None)
+    if value is None:
+        return spider.settings.getbool("CHECKPOINT_RESUME", False)
+    return str(value).strip().lower() not in _FALSE_VALUES
+
+
+def child_meta(meta, tag):
+    """Meta of a copy of a request, journaled apart from the original."""
+    meta = dict(meta)
+    parent = meta.get(CHECKPOINT_KEY)
+    meta[CHECKPOINT_KEY] = f"{parent}/{tag}" if parent else tag
+    return meta
+
+
+def _encode_meta(meta):
+    encoded = {}
+    for key, value in meta.items():
+        if key in TRANSIENT_META or key.startswith("_"):
+            continue
+        if key == "playwright_page_methods":
+            if not all(isinstance(m, PageMethod) for m in value):
+                continue
+            value = [
+                {"method": m.method, "args": list(m.args), "kwargs": m.kwargs}
+                for m in value
+            ]
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        encoded[key] = value
+    return encoded
+
+
+def _decode_meta(meta):
+    meta = dict(meta)
+    if "playwright_page_methods" in meta:
+        meta["playwright_page_methods"] = [
+            PageMethod(m["method"], *m["args"], **m["kwargs"])
+            for m in meta["playwright_page_methods"]
+        ]
+    return meta
+
+
+def _method_name(spider, method):
+    name = getattr(method, "__name__", None)
+    if name and getattr(spider, name, None) == method:
+        return name
+    return None
+
+
+def rotate(path):
+    """Move a journal aside as <name>.<mtime>.jsonl, return the new path."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    stamp = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y%m%d_%H%M%S")
+    root, ext = os.path.splitext(path)
+    rotated = f"{root}.{stamp}{ext}"
+    n = 1
+    while os.path.exists(rotated):
+        rotated = f"{root}.{stamp}_{n}{ext}"
+        n += 1
+    os.replace(path, rotated)
+    return rotated
+
+
+class CrawlCheckpoint:
+    def __init__(self, path, fingerprinter, resume=False, buffer_size=1000, stats=None):
+        self.path = path
+        self.fingerprinter = fingerprinter
+        self.resume = resume
+        self.buffer_size = buffer_size
+        self.stats = stats
+        self.requests = {}
+        self.done = set()
+        self.failed = set()
+        self._buffer = []
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if resume and os.path.exists(path):
+            self._load()
+        elif not resume:
+            rotated = rotate(path)
+            if rotated is not None:
+                logger.info(
+                    "Not resuming, journal of the previous run moved to %s", rotated
+                )
+        self._file = open(path, "a", encoding="utf-8")
+
+    @classmethod
+    def from_crawler(cls, crawler, spider):
+        settings = crawler.settings
+        directory = settings.get("CHECKPOINT_DIR") or os.path.join(
+            getattr(spider, "base_log_dir", f"logs/{spider.name}"), "checkpoint"
+        )
+        return cls(
+            path=os.path.join(directory, "frontier.jsonl"),
+            fingerprinter=crawler.request_fingerprinter,
+            resume=is_resuming(spider),
+            buffer_size=settings.getint("CHECKPOINT_BUFFER", 1000),
+            stats=crawler.stats,
+        )
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    ## Last line of a crashed run may be cut short
+                    continue
+                key = entry["key"]
+                if entry["event"] == SCHEDULED:
+                    self.requests.setdefault(key, entry["request"])
+                elif entry["event"] == DONE:
+                    self.done.add(key)
+                    self.failed.discard(key)
+                elif entry["event"] == FAILED:
+                    self.failed.add(key)
+        logger.info(
+            "Checkpoint %s: %d requests, %d done, %d failed",
+            self.path,
+            len(self.requests),
+            len(self.done),
+            len(self.failed),
+        )
+
+    def key(self, request):
+        key = self.fingerprinter.fingerprint(request).hex()
+        tag = request.meta.get(CHECKPOINT_KEY)
+        return f"{key}:{tag}" if tag else key
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(key)
+
+    def _write(self, event, key, **fields):
+        self._buffer.append(
+            json.dumps({"event": event, "key": key, **fields}, ensure_ascii=False)
+        )
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered journal lines."""
+        if not self._buffer:
+            return
+        self._file.write("\n".join(self._buffer) + "\n")
+        self._file.flush()
+        self._buffer.clear()
+
+    def is_done(self, request):
+        return self.key(request) in self.done
+
+    def scheduled(self, spider, request):
+        callback = _method_name(spider, request.callback)
+        if request.callback is not None and callback is None:
+            ## Not a spider method, it could not be scheduled again
+            return
+        key = self.key(request)
+        entry = {
+            "url": request.url,
+            "method": request.method,
+            "callback": callback,
+            "errback": _method_name(spider, request.errback),
+            "cb_kwargs": request.cb_kwargs,
+            "meta": _encode_meta(request.meta),
+            "priority": request.priority,
+            "dont_filter": request.dont_filter,
+        }
+        try:
+            self._write(SCHEDULED, key, request=entry)
+        except (TypeError, ValueError):
+            logger.warning("Cannot checkpoint %s, cb_kwargs are not JSON", request)
+            return
+        self.requests.setdefault(key, entry)
+        self._inc_stat("checkpoint/scheduled")
+
+    def mark_done(self, request):
+        key = self.key(request)
+        self.done.add(key)
+        self.failed.discard(key)
+        self._write(DONE, key, url=request.url, cb_kwargs=request.cb_kwargs)
+        self._inc_stat("checkpoint/done")
+
+    def mark_failed(self, request):
+        key = self.key(request)
+        if key in self.done:
+            return
+        self.failed.add(key)
+        self._write(FAILED, key, url=request.url)
+        self._inc_stat("checkpoint/failed")
+
+    def pending(self, spider):
+        """Rebuild the journaled requests that are not done, in order."""
+        for key, entry in self.requests.items():
+            if key in self.done:
+                continue
+            callback = entry.get("callback")
+            errback = entry.get("errback")
+            yield scrapy.Request(
+                entry["url"],
+                method=entry.get("method", "GET"),
+                callback=getattr(spider, callback) if callback else None,
+                errback=getattr(spider, errback) if errback else None,
+                cb_kwargs=entry.get("cb_kwargs") or {},
+                meta=_decode_meta(entry.get("meta") or {}),
+                priority=entry.get("priority", 0),
+                dont_filter=entry.get("dont_filter", False),
+            )
+
+    def close(self):
+        self.flush()
+        self._file.close()
@@ -0,0 +1,208 @@
+## Adaptive per-domain concurrency
+#
+# AdaptiveConcurrency tunes the concurrency and delay of each downloader slot
+# (one per domain) from what the crawl observes, additive increase /
+# multiplicative decrease style:
+#
+# - a 429 (or 503) halves the slot concurrency and doubles its delay at once,
+#   honouring Retry-After as the minimum delay
+# - every ``window`` downloads the error / timeout rate and the render latency
+#   (EWMA) are checked: too many errors halve the concurrency, a latency above
+#   the target or low free memory on the box remove one, otherwise one is
+#   added and the delay shrinks
+#
+# Concurrency always stays within [min_concurrency, max_concurrency] and the
+# delay within [min_delay, max_delay]. Every decision is exported as stats.
+
+import logging
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STATUSES = (429, 503)
+
+
+def available_memory_mb():
+    """Free memory of the box in MiB (psutil or /proc/meminfo), else None."""
+    if psutil is not None:
+        return psutil.virtual_memory().available / 2**20
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class SlotStats:
+    __slots__ = ("samples", "errors", "timeouts", "latency")
+
+    def __init__(self):
+        self.samples = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.latency = None
+
+    def reset(self):
+        self.samples = self.errors = self.timeouts = 0
+
+
+class AdaptiveConcurrency:
+    def __init__(
+        self,
+        min_concurrency=1,
+        max_concurrency=8,
+        min_delay=0.0,
+        max_delay=30.0,
+        target_latency=8.0,
+        max_error_rate=0.1,
+        window=20,
+        min_free_memory_mb=1024,
+        memory_probe=available_memory_mb,
+        stats=None,
+    ):
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.min_free_memory_mb = min_free_memory_mb
+        self.memory_probe = memory_probe
+        self.stats = stats
+        self._slots = {}
+
+    @classmethod
+    def from_settings(cls, settings, stats=None):
+        ## Never above the global cap of the downloader
+        max_concurrency = min(
+            settings.getint("ADAPTIVE_CONCURRENCY_MAX", 8),
+            settings.getint("CONCURRENT_REQUESTS"),
+        )
+        return cls(
+            min_concurrency=settings.getint("ADAPTIVE_CONCURRENCY_MIN", 1),
+            max_concurrency=max_concurrency,
+            min_delay=settings.getfloat("ADAPTIVE_CONCURRENCY_MIN_DELAY", 0.0),
+            max_delay=settings.getfloat("ADAPTIVE_CONCURRENCY_MAX_DELAY", 30.0),
+            target_latency=settings.getfloat(
+                "ADAPTIVE_CONCURRENCY_TARGET_LATENCY", 8.0
+            ),
+            max_error_rate=settings.getfloat(
+                "ADAPTIVE_CONCURRENCY_MAX_ERROR_RATE", 0.1
+            ),
+            window=settings.getint("ADAPTIVE_CONCURRENCY_WINDOW", 20),
+            min_free_memory_mb=settings.getint(
+                "ADAPTIVE_CONCURRENCY_MIN_FREE_MEMORY_MB", 1024
+            ),
+            stats=stats,
+        )
+
+    def _slot_stats(self, key):
+        slot_stats = self._slots.get(key)
+        if slot_stats is None:
+            slot_stats = self._slots[key] = SlotStats()
+        return slot_stats
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(key)
+
+    def _export(self, key, slot):
+        if self.stats is None:
+            return
+        self.stats.set_value(
+            f"adaptive_concurrency/{key}/concurrency", slot.concurrency
+        )
+        self.stats.set_value(
+            f"adaptive_concurrency/{key}/delay_ms", int(slot.delay * 1000)
+        )
+        self.stats.max_value("adaptive_concurrency/max_concurrency", slot.concurrency)
+
+    def _set(self, key, slot, concurrency, delay, reason):
+        concurrency = min(max(concurrency, self.min_concurrency), self.max_concurrency)
+        delay = min(max(delay, self.min_delay), self.max_delay)
+        if concurrency == slot.concurrency and delay == slot.delay:
+            return
+        direction = "increase" if concurrency > slot.concurrency else "decrease"
+        if concurrency == slot.concurrency:
+            direction = "decrease" if delay > slot.delay else "increase"
+        logger.debug(
+            "Slot %s: concurrency %d -> %d, delay %.2fs -> %.2fs (%s)",
+            key,
+            slot.concurrency,
+            concurrency,
+            slot.delay,
+            delay,
+            reason,
+        )
+        slot.concurrency = concurrency
+        slot.delay = delay
+        self._inc_stat(f"adaptive_concurrency/{direction}")
+        self._inc_stat(f"adaptive_concurrency/{direction}/{reason}")
+        self._export(key, slot)
+
+    def throttled(self, key, slot, retry_after=None):
+        """The site asked to slow down (429 / 503)."""
+        self._inc_stat("adaptive_concurrency/throttled")
+        delay = max(slot.delay * 2, self.min_delay or 1.0, retry_after or 0.0)
+        self._set(key, slot, slot.concurrency // 2, delay, "throttled")
+        self._slot_stats(key).reset()
+
+    def observe(self, key, slot, latency=None, error=False, timeout=False):
+        """Record one finished download of the slot and adjust it if due."""
+        slot_stats = self._slot_stats(key)
+        slot_stats.samples += 1
+        slot_stats.errors += error or timeout
+        slot_stats.timeouts += timeout
+        if latency is not None:
+            if slot_stats.latency is None:
+                slot_stats.latency = latency
+            else:
+                slot_stats.latency = 0.8 * slot_stats.latency + 0.2 * latency
+
+        if slot_stats.samples >= self.window:
+            self._adjust(key, slot, slot_stats)
+            slot_stats.reset()
+
+    def _adjust(self, key, slot, slot_stats):
+        error_rate = slot_stats.errors / slot_stats.samples
+        if self.stats is not None:
+            self.stats.set_value(
+                f"adaptive_concurrency/{key}/latency_ms",
+                int((slot_stats.latency or 0) * 1000),
+            )
+            self.stats.set_value(
+                f"adaptive_concurrency/{key}/error_rate", round(error_rate, 3)
+            )
+
+        if error_rate > self.max_error_rate:
+            reason = (
+                "timeouts" if slot_stats.timeouts * 2 >= slot_stats.errors else "errors"
+            )
+            self._set(
+                key, slot, slot.concurrency // 2, max(slot.delay * 2, 0.5), reason
+            )
+            return
+
+        if slot_stats.latency is not None and slot_stats.latency > self.target_latency:
+            self._set(key, slot, slot.concurrency - 1, slot.delay, "latency")
+            return
+
+        free_mb = self.memory_probe() if self.memory_probe else None
+        if free_mb is not None:
+            if self.stats is not None:
+                self.stats.set_value(
+                    "adaptive_concurrency/free_memory_mb", int(free_mb)
+                )
+            if free_mb < self.min_free_memory_mb:
+                self._set(key, slot, slot.concurrency - 1, slot.delay, "memory")
+                return
+
+        self._set(key, slot, slot.concurrency + 1, slot.delay * 0.75, "healthy")
@@ -0,0 +1,217 @@
+## Result URL discovery without rendering navigation pages
+#
+# With discovery on (``-a discovery=1`` or DISCOVERY_ENABLED) the navigation
+# levels of the crawl tree (timetable, discipline, round and event pages) are
+# downloaded as plain HTML and only the leaf result pages get a browser:
+#
+# - links are taken from the unrendered HTML, hrefs first and then any
+#   /results/... path found in inline scripts / JSON
+# - sitemaps (DISCOVERY_SITEMAP_URLS, robots.txt or sitemap XML) give the
+#   event pages of the crawled competitions directly
+# - an event page without round links gets its round URLs built from the
+#   URL pattern, /results/<group>/<year>/<slug>/<sex>/<discipline>/<round>/<tab>
+#   for each of DISCOVERY_ROUNDS, validated with a HEAD request (GET when
+#   HEAD is refused)
+#
+# A navigation page where none of this finds anything is rendered after all
+# (render_request), so discovery never loses pages compared to a full render.
+#
+# Stats: discovery/sitemap_urls, discovery/probes, discovery/probe_hits and
+# discovery/render_fallback.
+
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+import scrapy
+from scrapy.utils.gz import gunzip, gzip_magic_number
+from scrapy.utils.sitemap import Sitemap, sitemap_urls_from_robots
+
+from world_athletics.checkpoint import child_meta
+from world_athletics.download_modes import HTTP, PLAYWRIGHT, build_meta
+from world_athletics.dupefilter import canonical_url
+
+RESULT_PATH_RE = re.compile(
+    r"^/results/(?P<group>[^/]+)/(?P<year>\d{4})/(?P<slug>[^/]+)"
+    r"/(?P<sex>[^/]+)/(?P<discipline>[^/]+)"
+    r"(?:/(?P<round>[^/]+))?(?:/(?P<tab>[^/]+))?/?$"
+)
+_RESULT_LINK_RE = re.compile(
+    r"""(?:https?://[^/"'\s<>]+)?/(?:en/)?results/[^"'\s<>?#\\]+"""
+)
+
+DEFAULT_ROUNDS = ["heats", "semi-final", "final"]
+
+_FALSE_VALUES = ("", "0", "false", "no", "off")
+
+
+def is_discovering(spider):
+    """True when the spider was started with ``-a discovery=1``."""
+    value = getattr(spider, "discovery", None)
+    if value is None:
+        return spider.settings.getbool("DISCOVERY_ENABLED", False)
+    return str(value).strip().lower() not in _FALSE_VALUES
+
+
+def _inc_stat(spider, key, count=1):
+    crawler = getattr(spider, "crawler", None)
+    if crawler is not None:
+        crawler.stats.inc_value(key, count)
+
+
+def navigation_meta(spider, **meta):
+    """Meta of a navigation request: plain HTTP when discovering."""
+    return build_meta(HTTP if is_discovering(spider) else PLAYWRIGHT, **meta)
+
+
+def render_request(spider, response, callback=None):
+    """
+    Playwright copy of a navigation request that was downloaded as plain
+    HTML, or None when the response already was rendered.
+    """
+    request = response.request
+    if request.meta.get("playwright") or request.meta.get("discovery_rendered"):
+        return None
+    _inc_stat(spider, "discovery/render_fallback")
+    meta = child_meta(request.meta, "rendered")
+    meta.update(playwright=True, playwright_include_page=True, discovery_rendered=True)
+    return request.replace(
+        meta=meta, callback=callback or request.callback, dont_filter=True
+    )
+
+
+def parse_result_path(url):
+    """The parts of a /results/... URL as a dict, or None."""
+    canonical = canonical_url(url)
+    if canonical is None:
+        return None
+    match = RESULT_PATH_RE.match(urlsplit(canonical).path)
+    return match.groupdict() if match else None
+
+
+def event_url(url):
+    """Event page (.../<sex>/<discipline>) of a /results/... URL, or None."""
+    parts = parse_result_path(url)
+    if parts is None:
+        return None
+    scheme, netloc = urlsplit(url)[:2]
+    path = "/results/{group}/{year}/{slug}/{sex}/{discipline}".format(**parts)
+    return urlunsplit((scheme, netloc, path, "", ""))
+
+
+def round_url(event, round_slug, tab="result"):
+    return f"{event.rstrip('/')}/{round_slug}/{tab}"
+
+
+def url_tab(url):
+    """Tab of a /results/... round URL ('result', 'summary'), or None."""
+    parts = parse_result_path(url)
+    return parts["tab"] if parts else None
+
+
+def tab_url(url, tab):
+    """URL of a tab of the round of a /results/... URL, or None."""
+    parts = parse_result_path(url)
+    if parts is None or parts["round"] is None:
+        return None
+    return round_url(event_url(url), parts["round"], tab)
+
+
+def round_title(round_slug):
+    """'semi-final' -> 'Semi-Final', as the round tabs name them."""
+    return "-".join(word.capitalize() for word in round_slug.split("-"))
+
+
+def result_links(response):
+    """
+    Canonical /results/... URLs linked from an unrendered page: hrefs and
+    paths found anywhere in its source (inline scripts, JSON state).
+    """
+    seen = set()
+    candidates = response.xpath("//a/@href").getall()
+    candidates += _RESULT_LINK_RE.findall(response.text)
+    for href in candidates:
+        url = canonical_url(response.urljoin(href))
+        if url is None or url in seen or parse_result_path(url) is None:
+            continue
+        seen.add(url)
+        yield url
+
+
+def sitemap_locations(response):
+    """
+    Yield (is_sitemap, url) for the entries of a robots.txt, sitemap index
+    or sitemap; is_sitemap is True for nested sitemaps.
+    """
+    if response.url.endswith("/robots.txt"):
+        for url in sitemap_urls_from_robots(response.text, base_url=response.url):
+            yield True, url
+        return
+
+    body = response.body
+    if gzip_magic_number(response):
+        body = gunzip(body)
+    sitemap = Sitemap(body)
+    for entry in sitemap:
+        yield sitemap.type == "sitemapindex", entry["loc"]
+
+
+class RoundProber:
+    """
+    Tracks the HEAD probes of the round URLs built for each event page, to
+    know when an event got no round at all.
+    """
+
+    def __init__(self, rounds=DEFAULT_ROUNDS, tab="result"):
+        self.rounds = list(rounds)
+        self.tab = tab
+        self._pending = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            rounds=settings.getlist("DISCOVERY_ROUNDS", DEFAULT_ROUNDS),
+            tab=settings.get("DISCOVERY_RESULT_TAB", "result"),
+        )
+
+    def requests(self, spider, event, callback, errback, cb_kwargs):
+        """HEAD request per candidate round URL of an event page."""
+        self._pending[event] = [len(self.rounds), 0]
+        for round_slug in self.rounds:
+            _inc_stat(spider, "discovery/probes")
+            yield scrapy.Request(
+                round_url(event, round_slug, self.tab),
+                method="HEAD",
+                callback=callback,
+                errback=errback,
+                meta=build_meta(
+                    HTTP,
+                    ## A missing round may redirect to the event page
+                    dont_redirect=True,
+                    handle_httpstatus_list=[301, 302, 303, 307, 308, 404, 405],
+                    discovery_event=event,
+                    discovery_round=round_slug,
+                ),
+                cb_kwargs=cb_kwargs,
+            )
+
+    @staticmethod
+    def found(response):
+        return 200 <= response.status < 300
+
+    def finished(self, spider, request, found):
+        """
+        Record the outcome of a probe. True when it was the last probe of its
+        event and no round was found.
+        """
+        event = request.meta.get("discovery_event")
+        pending = self._pending.get(event)
+        if pending is None:
+            return False
+        pending[0] -= 1
+        if found:
+            pending[1] += 1
+            _inc_stat(spider, "discovery/probe_hits")
+        if pending[0] > 0:
+            return False
+        del self._pending[event]
+        return pending[1] == 0
@@ -0,0 +1,41 @@
+## Download modes for spider requests
+#
+# scrapy-playwright only renders requests whose meta has a truthy "playwright"
+# key, everything else goes through Scrapy's plain HTTP handler. A spider picks
+# its default mode with the ``download_mode`` attribute (can be overridden with
+# ``-a download_mode=playwright``) and a single request can still opt in by
+# passing ``mode=PLAYWRIGHT`` explicitly.
+
+HTTP = "http"
+PLAYWRIGHT = "playwright"
+
+DOWNLOAD_MODES = (HTTP, PLAYWRIGHT)
+
+
+def get_download_mode(spider, default=PLAYWRIGHT):
+    mode = getattr(spider, "download_mode", default) or default
+    mode = str(mode).lower().strip()
+    if mode not in DOWNLOAD_MODES:
+        raise ValueError(
+            f"Unknown download_mode {mode!r} for spider {spider.name}, "
+            f"expected one of {DOWNLOAD_MODES}"
+        )
+    return mode
+
+
+def build_meta(mode, **meta):
+    """
+    Return request meta for the given download mode.
+
+    In playwright mode the page is included so callbacks can interact with it,
+    in http mode every playwright_* key is dropped so no browser page is
+    created for the request.
+    """
+    if mode == PLAYWRIGHT:
+        meta.setdefault("playwright", True)
+        meta.setdefault("playwright_include_page", True)
+        return meta
+
+    meta = {k: v for k, v in meta.items() if not k.startswith("playwright")}
+    meta["playwright"] = False
+    return meta
@@ -0,0 +1,295 @@
+## Multi-championship crawl driver
+#
+# Shards a manifest of competitions / editions across worker processes, each
+# a separate `scrapy crawl` with its own Playwright browser, output directory
+# and log directory, then merges the outputs of all workers.
+#
+#   python -m world_athletics.driver championships.json --workers 8
+#   python -m world_athletics.driver --merge-only runs/20250301_101500
+#
+# A manifest is a JSON list of entries like:
+#
+#   {
+#     "spider": "anchor-collector",
+#     "url": "https://worldathletics.org/competitions/.../timetable/bydiscipline",
+#     "args": {"resume": "1"}
+#   }
+#
+# ("urls" may list several URLs). Entries with the same spider and args are
+# split into up to --workers shards and at most --workers crawls run at once.
+#
+# Layout of a run:
+#
+#   runs/<run_id>/<spider>-<n>/output      -a output_dir, pipeline files
+#   runs/<run_id>/<spider>-<n>/logs        -a log_dir, spider logs
+#   runs/<run_id>/<spider>-<n>/checkpoint  CHECKPOINT_DIR
+#   runs/<run_id>/<spider>-<n>/seen        DUPEFILTER_DIR
+#   runs/<run_id>/<spider>-<n>/httpcache   HTTPCACHE_DIR
+#   runs/<run_id>/<spider>-<n>/crawl.log
+#   runs/<run_id>/merged/<spider>/...      merged outputs
+#
+# so no two workers write the same journal, fingerprints file or cache entry
+# (--set values still win). The canonical index (CANONICAL_INDEX_PATH) stays
+# shared on purpose: IDs must agree across workers and SQLite serialises its
+# inserts.
+#
+# Rows are merged per championship: a row of championship C found in
+# <output>/<path> goes to merged/<spider>/C/<path> (<path> as is when it
+# already starts with C/), rows without one are merged per path.
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+
+from world_athletics.pipelines import WorldAthleteIndoorResultPipeline
+from world_athletics.writers import read_jsonl
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_manifest(path):
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    for entry in entries:
+        urls = entry.get("urls") or [entry["url"]]
+        yield entry["spider"], urls, entry.get("args") or {}
+
+
+def plan_jobs(manifest, workers):
+    """
+    Group manifest URLs per (spider, args) and split each group into up to
+    ``workers`` shards. Return a list of job dicts.
+    """
+    groups = {}
+    for spider, urls, args in manifest:
+        key = (spider, json.dumps(args, sort_keys=True))
+        groups.setdefault(key, []).extend(urls)
+
+    jobs = []
+    for (spider, args), urls in groups.items():
+        n_shards = max(1, min(workers, len(urls)))
+        for shard in range(n_shards):
+            jobs.append(
+                {
+                    "name": f"{spider}-{shard}",
+                    "spider": spider,
+                    "urls": urls[shard::n_shards],
+                    "args": json.loads(args),
+                }
+            )
+    ## Same spider with different args gets distinct job names
+    seen = {}
+    for job in jobs:
+        count = seen.get(job["name"], 0)
+        seen[job["name"]] = count + 1
+        if count:
+            job["name"] = f"{job['name']}-{count}"
+    return jobs
+
+
+def job_settings(job_dir):
+    """Settings keeping the per-crawl state of a job inside its directory."""
+    return [
+        "CHECKPOINT_DIR=" + os.path.join(job_dir, "checkpoint"),
+        "DUPEFILTER_DIR=" + os.path.join(job_dir, "seen"),
+        "HTTPCACHE_DIR=" + os.path.join(job_dir, "httpcache"),
+    ]
+
+
+def crawl_command(job, job_dir, settings=(), feed=False):
+    command = [
+        sys.executable,
+        "-m",
+        "scrapy",
+        "crawl",
+        job["spider"],
+        "-a",
+        "start_urls=" + ",".join(job["urls"]),
+        "-a",
+        "output_dir=" + os.path.join(job_dir, "output"),
+        "-a",
+        "log_dir=" + os.path.join(job_dir, "logs"),
+    ]
+    for key, value in job["args"].items():
+        command += ["-a", f"{key}={value}"]
+    ## Later -s values win, the user's settings come last
+    for setting in job_settings(job_dir) + list(settings):
+        command += ["-s", setting]
+    if feed:
+        command += ["-O", os.path.join(job_dir, "output", "items.jsonl")]
+    return command
+
+
+def run_job(job, run_dir, settings=(), feed=False):
+    job_dir = os.path.join(run_dir, job["name"])
+    os.makedirs(job_dir, exist_ok=True)
+    with open(os.path.join(job_dir, "job.json"), "w", encoding="utf-8") as f:
+        json.dump(job, f, indent=2)
+
+    command = crawl_command(job, job_dir, settings, feed)
+    logger.info("Starting %s (%d URLs)", job["name"], len(job["urls"]))
+    with open(os.path.join(job_dir, "crawl.log"), "w", encoding="utf-8") as log:
+        returncode = subprocess.call(
+            command, cwd=PROJECT_DIR, stdout=log, stderr=subprocess.STDOUT
+        )
+    if returncode:
+        logger.error("%s exited with %d", job["name"], returncode)
+    else:
+        logger.info("%s finished", job["name"])
+    return returncode
+
+
+def championship_of(row):
+    """Championship a result row belongs to, as the pipelines name it."""
+    if not isinstance(row, dict):
+        return None
+    if row.get("championship"):
+        return row["championship"]
+    if row.get("competition_name") and row.get("competition_description"):
+        safe_name = WorldAthleteIndoorResultPipeline._safe_name
+        return "_".join(
+            [
+                safe_name(row["competition_name"]),
+                safe_name(row["competition_description"]),
+            ]
+        )
+    return None
+
+
+def _row_path(row, relative):
+    championship = championship_of(row)
+    if championship is None or relative.split(os.sep)[0] == championship:
+        return relative
+    return os.path.join(championship, relative)
+
+
+def _read_rows(source):
+    if source.endswith(".jsonl"):
+        return list(read_jsonl(source))
+    with open(source, encoding="utf-8") as f:
+        rows = json.load(f)
+    return rows if isinstance(rows, list) else None
+
+
+def _append_rows(target, rows):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if target.endswith(".jsonl"):
+        with open(target, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return
+
+    if os.path.exists(target):
+        with open(target, encoding="utf-8") as f:
+            rows = json.load(f) + rows
+    with open(target, "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+def _merge_file(source, relative, merged_dir, job_name):
+    rows = None
+    if source.endswith((".json", ".jsonl")):
+        rows = _read_rows(source)
+    if rows is not None:
+        groups = {}
+        for row in rows:
+            groups.setdefault(_row_path(row, relative), []).append(row)
+        for path, group in groups.items():
+            _append_rows(os.path.join(merged_dir, path), group)
+        return
+
+    ## Other files (Parquet parts, ...) are copied, prefixed on name clashes
+    target = os.path.join(merged_dir, relative)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.exists(target):
+        directory, name = os.path.split(target)
+        target = os.path.join(directory, f"{job_name}-{name}")
+    shutil.copyfile(source, target)
+
+
+def merge_outputs(run_dir):
+    """
+    Merge the output directories of all jobs of a run into
+    <run_dir>/merged/<spider>: rows of JSON lists and JSON Lines files are
+    merged per championship and any other file is copied.
+    """
+    merged_dir = os.path.join(run_dir, "merged")
+    if os.path.exists(merged_dir):
+        shutil.rmtree(merged_dir)
+
+    for job_name in sorted(os.listdir(run_dir)):
+        job_file = os.path.join(run_dir, job_name, "job.json")
+        output_dir = os.path.join(run_dir, job_name, "output")
+        if not os.path.exists(job_file) or not os.path.isdir(output_dir):
+            continue
+        with open(job_file, encoding="utf-8") as f:
+            spider = json.load(f)["spider"]
+
+        for root, _, files in os.walk(output_dir):
+            for name in sorted(files):
+                source = os.path.join(root, name)
+                _merge_file(
+                    source,
+                    os.path.relpath(source, output_dir),
+                    os.path.join(merged_dir, spider),
+                    job_name,
+                )
+    return merged_dir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded multi-championship crawl")
+    parser.add_argument("manifest", nargs="?", help="JSON list of crawl entries")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--run-dir", default=None, help="defaults to runs/<run_id>")
+    parser.add_argument(
+        "--set", action="append", default=[], metavar="NAME=VALUE", dest="settings"
+    )
+    parser.add_argument(
+        "--feed", action="store_true", help="also export items to items.jsonl"
+    )
+    parser.add_argument("--merge-only", metavar="RUN_DIR")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+    )
+
+    if args.merge_only:
+        logger.info("Merged into %s", merge_outputs(args.merge_only))
+        return 0
+    if not args.manifest:
+        parser.error("a manifest is required unless --merge-only is given")
+
+    run_dir = args.run_dir or os.path.join(
+        "runs", datetime.now().strftime("%Y%m%d_%H%M%S")
+    )
+    run_dir = os.path.abspath(run_dir)
+    jobs = plan_jobs(load_manifest(args.manifest), args.workers)
+    logger.info("%d jobs, %d workers, run dir %s", len(jobs), args.workers, run_dir)
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        returncodes = list(
+            executor.map(
+                lambda job: run_job(job, run_dir, args.settings, args.feed), jobs
+            )
+        )
+
+    logger.info("Merged into %s", merge_outputs(run_dir))
+    failed = [job["name"] for job, code in zip(jobs, returncodes) if code]
+    if failed:
+        logger.error("Failed jobs: %s", ", ".join(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
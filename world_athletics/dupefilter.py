@@ -0,0 +1,157 @@
+## Crawl-wide duplicate filter on canonical URLs
+#
+# The same page is linked as /en/competitions/... and /competitions/...,
+# with fragments (#resultheader) and, from unrendered templates, as
+# .../[competitionGroup]/[urlSlug]. Every such request carries Playwright
+# meta, so a duplicate costs a full render. CanonicalDupeFilter fingerprints
+# the canonical URL instead:
+#
+# - locale prefixes (URL_LOCALE_PREFIXES) and fragments are dropped, the query
+#   is sorted (w3lib canonicalize_url)
+# - URLs with [placeholder] / {placeholder} segments are never requested
+#
+# With DUPEFILTER_PERSIST the fingerprints of pages that got a response
+# (status below 400) are appended to <DUPEFILTER_DIR>/requests.seen (default
+# data/seen/<spider>) and the next run skips them. Requests that were only
+# scheduled, or failed, are left for the next run. Start requests are never
+# filtered, so a persisted run does not drop its own entry point. Without
+# DUPEFILTER_PERSIST, and on a resumed run (-a resume=1, the checkpoint
+# decides what is left to do), the file is neither read nor written.
+#
+# Stats: dupefilter/canonicalized (URL rewritten for the fingerprint),
+# dupefilter/templates, dupefilter/renders_saved (filtered Playwright
+# requests) and dupefilter/previous_runs (filtered by an earlier run).
+
+import os
+import re
+from urllib.parse import unquote, urlsplit, urlunsplit
+
+from scrapy import signals
+from scrapy.dupefilters import RFPDupeFilter
+from w3lib.url import canonicalize_url
+
+from world_athletics.checkpoint import is_resuming
+
+_TEMPLATE_RE = re.compile(r"\[[^\]/]*\]|\{[^}/]*\}")
+
+
+def is_template_url(url):
+    """True for URLs with unrendered [placeholder] or {placeholder} parts."""
+    return _TEMPLATE_RE.search(unquote(url)) is not None
+
+
+def canonical_url(url, locales=("en",)):
+    """
+    URL without locale prefix and fragment, with a sorted query, or None for
+    a template URL.
+    """
+    if is_template_url(url):
+        return None
+    scheme, netloc, path, query, _ = urlsplit(url)
+    segments = path.split("/")
+    if len(segments) > 2 and segments[1].lower() in locales:
+        path = "/" + "/".join(segments[2:])
+    return canonicalize_url(urlunsplit((scheme, netloc.lower(), path, query, "")))
+
+
+class CanonicalDupeFilter(RFPDupeFilter):
+    def __init__(
+        self,
+        path=None,
+        debug=False,
+        *,
+        fingerprinter=None,
+        locales=("en",),
+        persist=False,
+        stats=None,
+    ):
+        self.locales = tuple(locale.lower() for locale in locales)
+        self.stats = stats
+        self.previous = set()
+        super().__init__(None, debug, fingerprinter=fingerprinter)
+
+        if path and persist:
+            os.makedirs(path, exist_ok=True)
+            self.file = open(
+                os.path.join(path, "requests.seen"), "a+", encoding="utf-8"
+            )
+            self.file.seek(0)
+            self.previous.update(line.rstrip() for line in self.file)
+            self.fingerprints.update(self.previous)
+        self.recorded = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        spider = crawler.spider
+        path = settings.get("DUPEFILTER_DIR") or os.path.join(
+            "data", "seen", spider.name
+        )
+        df = cls(
+            path,
+            settings.getbool("DUPEFILTER_DEBUG"),
+            fingerprinter=crawler.request_fingerprinter,
+            locales=settings.getlist("URL_LOCALE_PREFIXES", ["en"]),
+            persist=(
+                settings.getbool("DUPEFILTER_PERSIST") and not is_resuming(spider)
+            ),
+            stats=crawler.stats,
+        )
+        if df.file:
+            crawler.signals.connect(
+                df.response_received, signal=signals.response_received
+            )
+        return df
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(key)
+
+    def _canonical(self, request):
+        ## The request with its canonical URL, None for a template URL
+        canonical = canonical_url(request.url, self.locales)
+        if canonical is None:
+            return None
+        if canonical == canonicalize_url(request.url):
+            return request
+        return request.replace(url=canonical)
+
+    def request_seen(self, request):
+        canonical = self._canonical(request)
+        if canonical is None:
+            self._inc_stat("dupefilter/templates")
+            self.logger.debug("Dropping template URL %s", request.url)
+            return True
+        if canonical is not request:
+            self._inc_stat("dupefilter/canonicalized")
+
+        fingerprint = self.request_fingerprint(canonical)
+        if fingerprint not in self.fingerprints:
+            self.fingerprints.add(fingerprint)
+            return False
+        if request.meta.get("is_start_request"):
+            return False
+
+        if fingerprint in self.previous:
+            self._inc_stat("dupefilter/previous_runs")
+        if request.meta.get("playwright"):
+            self._inc_stat("dupefilter/renders_saved")
+        return True
+
+    def response_received(self, response, request, spider):
+        ## Only pages that were actually fetched are skipped by later runs
+        if response.status >= 400:
+            return
+        canonical = self._canonical(request)
+        if canonical is None:
+            return
+        fingerprint = self.request_fingerprint(canonical)
+        if fingerprint not in self.previous and fingerprint not in self.recorded:
+            self.recorded.add(fingerprint)
+            self.file.write(fingerprint + "\n")
+            ## On disk at once, a crashed run keeps what it fetched
+            self.file.flush()
+
+    def close(self, reason):
+        if self.file:
+            self.file.close()
@@ -0,0 +1,19 @@
+## Project download handler
+#
+# Thin wrapper around scrapy-playwright's handler so project level features
+# (resource blocking, ...) can be configured from settings.py.
+
+from scrapy_playwright.handler import ScrapyPlaywrightDownloadHandler
+
+from world_athletics.resource_blocking import ResourceBlocker
+
+
+class WorldAthleticsPlaywrightDownloadHandler(ScrapyPlaywrightDownloadHandler):
+    def __init__(self, crawler):
+        super().__init__(crawler)
+
+        ## PLAYWRIGHT_ABORT_REQUEST still wins if it is set explicitly
+        if self.abort_request is None and crawler.settings.getbool(
+            "RESOURCE_BLOCKING_ENABLED"
+        ):
+            self.abort_request = ResourceBlocker.from_crawler(crawler)
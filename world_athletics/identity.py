@@ -0,0 +1,128 @@
+## Canonical athlete and country IDs
+#
+# The spiders write athlete names and countries in different shapes
+# ("Shelly-Ann FRASER-PRYCE", "Ali Al Balushi", "JAM", "Jamaica JAM"). A raw
+# string is reduced to a key (accents, case, punctuation and token order
+# dropped, the IOC code for countries) and every key gets a stable integer ID
+# kept in a SQLite file shared by all spiders and runs.
+#
+# Lookups are two dict hits (raw -> key -> ID). Only a key never seen before
+# touches the database, inside a write transaction, so worker processes
+# sharing the file agree on the IDs.
+
+import logging
+import os
+import re
+import sqlite3
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+ATHLETE = "athlete"
+COUNTRY = "country"
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_COUNTRY_CODE_RE = re.compile(r"\b[A-Z]{3}\b")
+
+
+def _fold(value):
+    value = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in value if not unicodedata.combining(c)).casefold()
+
+
+def athlete_key(value):
+    """'Shelly-Ann FRASER-PRYCE' and 'FRASER-PRYCE Shelly Ann' give one key."""
+    return " ".join(sorted(_TOKEN_RE.findall(_fold(value))))
+
+
+def country_key(value):
+    """The IOC code when there is one ('Jamaica JAM' -> 'JAM'), else the name."""
+    match = _COUNTRY_CODE_RE.search(value)
+    if match is not None:
+        return match.group()
+    return " ".join(_TOKEN_RE.findall(_fold(value)))
+
+
+KEY_FUNCTIONS = {ATHLETE: athlete_key, COUNTRY: country_key}
+
+
+class CanonicalIndex:
+    def __init__(self, path, stats=None):
+        self.path = path
+        self.stats = stats
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS canonical ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " name TEXT,"
+            " UNIQUE (kind, key))"
+        )
+        self._ids = {kind: {} for kind in KEY_FUNCTIONS}
+        self._keys = {kind: {} for kind in KEY_FUNCTIONS}
+        for kind, key, id_ in self._db.execute("SELECT kind, key, id FROM canonical"):
+            if kind in self._ids:
+                self._ids[kind][key] = id_
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            path=crawler.settings.get(
+                "CANONICAL_INDEX_PATH", "data/canonical_index.sqlite3"
+            ),
+            stats=crawler.stats,
+        )
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(key)
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._ids.values())
+
+    def lookup(self, kind, raw):
+        """Canonical ID of a raw string, created on first sight, or None."""
+        if raw is None:
+            return None
+        key = self._keys[kind].get(raw)
+        if key is None:
+            key = self._keys[kind][raw] = KEY_FUNCTIONS[kind](raw)
+        if not key:
+            return None
+
+        id_ = self._ids[kind].get(key)
+        if id_ is None:
+            id_ = self._ids[kind][key] = self._insert(kind, key, raw)
+            self._inc_stat(f"canonical_index/{kind}/new")
+        return id_
+
+    def _insert(self, kind, key, name):
+        ## Another worker may have added the key since we loaded the table
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._db.execute(
+                "INSERT OR IGNORE INTO canonical (kind, key, name) VALUES (?, ?, ?)",
+                (kind, key, name.strip()),
+            )
+            (id_,) = self._db.execute(
+                "SELECT id FROM canonical WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+        return id_
+
+    def athlete_id(self, raw):
+        return self.lookup(ATHLETE, raw)
+
+    def country_id(self, raw):
+        return self.lookup(COUNTRY, raw)
+
+    def close(self):
+        self._db.close()
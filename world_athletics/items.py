@@ -2,11 +2,128 @@
 #
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
+#
+# Rows are slotted dataclasses: no per-row __dict__, and pipelines read them
+# through ItemAdapter (or attribute access) without copying them into dicts.
+# Fields keep the strings as scraped, the *_value properties parse them on
+# access (see world_athletics.normalize). athlete_id / country_id are set by
+# CanonicalIndexPipeline (see world_athletics.identity).
+
+from dataclasses import dataclass
+from typing import Optional
 
 import scrapy
 
+from world_athletics.normalize import (
+    cached_parse_float,
+    cached_parse_int,
+    parse_mark_info,
+)
+
 
 class WorldAthleticsItem(scrapy.Item):
     # define the fields for your item here like:
     # name = scrapy.Field()
     pass
+
+
+class ParsedResult:
+    # Numeric views of the raw result strings, shared by the result items.
+    # Parsers are memoised per distinct string.
+
+    __slots__ = ()
+
+    @property
+    def position_value(self):
+        return cached_parse_int(self.position)
+
+    @property
+    def mark_value(self):
+        return parse_mark_info(self.mark).value
+
+    @property
+    def wind_value(self):
+        wind = getattr(self, "wind", None)
+        if wind not in (None, ""):
+            return cached_parse_float(wind)
+        return parse_mark_info(self.mark).wind
+
+    @property
+    def reaction_time_value(self):
+        return cached_parse_float(getattr(self, "reaction_time", None))
+
+    @property
+    def record_flags(self):
+        return parse_mark_info(self.mark).records
+
+    @property
+    def mark_status(self):
+        return parse_mark_info(self.mark).status
+
+
+@dataclass(slots=True)
+class AnchorItem:
+    anchor_id: str
+    anchor_text: Optional[str]
+    anchor_link: str
+
+
+@dataclass(slots=True)
+class OutdoorResultItem(ParsedResult):
+    """Result row of a worldathletics.org championship (anchor-collector)."""
+
+    anchor_id: str
+    championship: Optional[str]
+    event_name: Optional[str]
+    round_name: Optional[str]
+    result_name: Optional[str]
+    position: Optional[str] = None
+    rank: Optional[str] = None
+    heat: Optional[str] = None
+    bib: Optional[str] = None
+    country: Optional[str] = None
+    athlete: Optional[str] = None
+    mark: Optional[str] = None
+    details: Optional[str] = None
+    reaction_time: Optional[str] = None
+    wind: Optional[str] = None
+    athlete_id: Optional[int] = None
+    country_id: Optional[int] = None
+
+
+@dataclass(slots=True)
+class IndoorResultItem(ParsedResult):
+    """Result row of a World Athletics Indoor Championships round."""
+
+    anchor_id: str
+    competition_name: Optional[str]
+    competition_description: Optional[str]
+    event_name: Optional[str]
+    round_name: Optional[str]
+    position: Optional[str] = None
+    rank: Optional[str] = None
+    heat: Optional[str] = None
+    athlete: Optional[str] = None
+    country: Optional[str] = None
+    mark: Optional[str] = None
+    athlete_id: Optional[int] = None
+    country_id: Optional[int] = None
+
+
+@dataclass(slots=True)
+class AsianResultItem(ParsedResult):
+    """
+    Result row of asianathletics.com. The wind is part of the mark, the
+    spider fills wind, records and status from it.
+    """
+
+    event_details: Optional[str]
+    position: Optional[str] = None
+    name: Optional[str] = None
+    country: Optional[str] = None
+    mark: Optional[str] = None
+    wind: Optional[float] = None
+    records: Optional[str] = None
+    status: Optional[str] = None
+    athlete_id: Optional[int] = None
+    country_id: Optional[int] = None
@@ -0,0 +1,186 @@
+## Non-blocking spider logging
+#
+# Records are put on a queue by a QueueHandler on the root logger and
+# written by a QueueListener thread to the console and to
+#
+#   <log_dir>/<spider>/info_log/info_<run_id>.log
+#   <log_dir>/<spider>/error_log/error_<run_id>.log
+#   <log_dir>/<spider>/fail_log/failed_urls_<run_id>.txt   (log_failed_url)
+#
+# so no file or console I/O runs on the reactor thread driving Playwright.
+#
+# Records below WARNING are rate limited per logger and message template
+# (LOG_RATE_LIMIT per second, bursts of LOG_RATE_BURST): per-row messages
+# ("Round Name :- %s") are sampled, the next record that gets through says
+# how many were suppressed. Warnings, errors and failed URLs always get
+# through.
+
+import atexit
+from datetime import datetime
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import os
+import queue
+import time
+
+from scrapy import signals
+from scrapy.utils.log import LogCounterHandler, get_scrapy_root_handler
+
+FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+FAILED_URLS_LOGGER = "world_athletics.failed_urls"
+
+_listener = None
+_handlers = []
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per (logger, level, message template) below WARNING."""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._buckets = {}
+
+    def filter(self, record):
+        if self.rate <= 0 or record.levelno >= logging.WARNING:
+            return True
+        if record.name == FAILED_URLS_LOGGER:
+            return True
+
+        key = (record.name, record.levelno, record.msg)
+        now = self.clock()
+        tokens, updated, suppressed = self._buckets.get(key, (self.burst, now, 0))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now, suppressed + 1)
+            return False
+
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        self._buckets[key] = (tokens - 1, now, 0)
+        return True
+
+
+class _ScrapyHandlerFilter(logging.Filter):
+    # Drops console records while Scrapy's own root handler still prints
+    # them, i.e. until spider_opened removes it
+    def filter(self, record):
+        handler = get_scrapy_root_handler()
+        return handler is None or handler not in logging.getLogger().handlers
+
+
+class _LoggerFilter(logging.Filter):
+    # Passes the records of one logger only (exclude=False) or all others
+    def __init__(self, name, exclude=False):
+        super().__init__()
+        self.logger_name = name
+        self.exclude = exclude
+
+    def filter(self, record):
+        return (record.name == self.logger_name) != self.exclude
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    for handler in _handlers:
+        handler.close()
+    _handlers.clear()
+
+
+atexit.register(_stop_listener)
+
+
+def setup_logging(spider, crawler):
+    """
+    Set the spider's run_id and log directories and route all logging
+    through the queue listener. Replaces the handlers of an earlier call.
+    """
+    global _listener
+
+    settings = crawler.settings
+    spider.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    spider.base_log_dir = f"{spider.log_dir}/{spider.name}"
+    spider.error_log_dir = f"{spider.base_log_dir}/error_log"
+    spider.info_log_dir = f"{spider.base_log_dir}/info_log"
+    spider.fail_log_dir = f"{spider.base_log_dir}/fail_log"
+    os.makedirs(spider.error_log_dir, exist_ok=True)
+    os.makedirs(spider.info_log_dir, exist_ok=True)
+    os.makedirs(spider.fail_log_dir, exist_ok=True)
+
+    _stop_listener()
+    formatter = logging.Formatter(FORMAT)
+    others = _LoggerFilter(FAILED_URLS_LOGGER, exclude=True)
+
+    console = logging.StreamHandler()
+    console.setLevel(logging.INFO)
+    info_file = logging.FileHandler(
+        f"{spider.info_log_dir}/info_{spider.run_id}.log", encoding="utf-8"
+    )
+    info_file.setLevel(logging.INFO)
+    error_file = logging.FileHandler(
+        f"{spider.error_log_dir}/error_{spider.run_id}.log", encoding="utf-8"
+    )
+    error_file.setLevel(logging.ERROR)
+    for handler in (console, info_file, error_file):
+        handler.setFormatter(formatter)
+        handler.addFilter(others)
+
+    console.addFilter(_ScrapyHandlerFilter())
+
+    failed_urls = logging.FileHandler(
+        f"{spider.fail_log_dir}/failed_urls_{spider.run_id}.txt",
+        encoding="utf-8",
+        delay=True,
+    )
+    failed_urls.addFilter(_LoggerFilter(FAILED_URLS_LOGGER))
+    _handlers.extend([console, info_file, error_file, failed_urls])
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(
+        RateLimitFilter(
+            rate=settings.getfloat("LOG_RATE_LIMIT", 5),
+            burst=settings.getint("LOG_RATE_BURST", 20),
+        )
+    )
+
+    ## Scrapy's log_count/* stats keep working, its console handler goes
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if not isinstance(handler, LogCounterHandler):
+            root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    level = settings.get("LOG_LEVEL", "INFO")
+    root.setLevel(level)
+
+    def drop_scrapy_handler(spider):
+        ## Scrapy installs its root handler again once the spider is created
+        root.removeHandler(get_scrapy_root_handler())
+        root.setLevel(level)
+
+    crawler.signals.connect(
+        drop_scrapy_handler, signal=signals.spider_opened, weak=False
+    )
+
+    failed_logger = logging.getLogger(FAILED_URLS_LOGGER)
+    failed_logger.setLevel(logging.INFO)
+
+    _listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+    spider.logger.info("Logging initialized for spider: %s", spider.name)
+
+
+def log_failed_url(url, stats=None):
+    """
+    Append a URL to the failed URLs file of the run, off the reactor thread.
+    Logged at INFO so log_count/WARNING only counts real warnings, failures
+    are counted in the failed_urls stat instead.
+    """
+    logging.getLogger(FAILED_URLS_LOGGER).info(url)
+    if stats is not None:
+        stats.inc_value("failed_urls")
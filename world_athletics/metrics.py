@@ -0,0 +1,206 @@
+## Per-stage crawl metrics
+#
+# Every callback is a stage of the crawl tree (parse -> parse_round ->
+# parse_tabs -> parse_results, parse_anchors -> parse_competition_rounds ->
+# parse_rounds). For each response StageMetricsSpiderMiddleware records, per
+# stage, the time spent in:
+#
+# - navigation   download of the page (download_latency)
+# - content      page.content() serialisations (RenderSnapshot)
+# - click_wait   clicks and readiness waits, wrapped in timed()
+# - release      handing the page back to the pool (managed_page)
+# - parse        the rest of the callback's own time
+#
+# plus rows and requests yielded. Open pages, queue depth and in-flight
+# downloads are sampled every STAGE_METRICS_INTERVAL seconds.
+#
+# Histograms go to the Scrapy stats (stage_metrics/<stage>/<phase>/...) and
+# to a Prometheus text file (node_exporter textfile collector format).
+
+from bisect import bisect_left
+from contextlib import contextmanager
+import os
+import time
+
+STAGE_TIMINGS = "stage_timings"
+
+NAVIGATION = "navigation"
+CONTENT = "content"
+CLICK_WAIT = "click_wait"
+RELEASE = "release"
+PARSE = "parse"
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def add_timing(request_or_response, phase, seconds):
+    """Add seconds to a phase of the request's stage timings."""
+    try:
+        timings = request_or_response.meta.setdefault(STAGE_TIMINGS, {})
+    except AttributeError:
+        ## Response without a request (offline replays)
+        return
+    timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(request_or_response, phase):
+    """Time the block (which may await) into a phase of the stage timings."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(request_or_response, phase, time.perf_counter() - start)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self):
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            yield bound, seen
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+        self.max = 0
+
+    def set(self, value):
+        self.value = value
+        self.max = max(self.max, value)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _bound(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class StageMetrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS, stats=None, labels=None):
+        self.buckets = buckets
+        self.stats = stats
+        self.labels = labels or {}
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, stage, phase, seconds):
+        histogram = self.histograms.get((stage, phase))
+        if histogram is None:
+            histogram = self.histograms[(stage, phase)] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    def count(self, stage, name, value=1):
+        key = (stage, name)
+        self.counters[key] = self.counters.get(key, 0) + value
+        if self.stats is not None:
+            self.stats.inc_value(f"stage_metrics/{stage}/{name}", value)
+
+    def gauge(self, name, value):
+        gauge = self.gauges.get(name)
+        if gauge is None:
+            gauge = self.gauges[name] = Gauge()
+        gauge.set(value)
+
+    def export_stats(self):
+        if self.stats is None:
+            return
+        for (stage, phase), histogram in self.histograms.items():
+            prefix = f"stage_metrics/{stage}/{phase}"
+            self.stats.set_value(f"{prefix}/count", histogram.count)
+            self.stats.set_value(f"{prefix}/seconds", round(histogram.sum, 3))
+            self.stats.set_value(f"{prefix}/p50", round(histogram.quantile(0.5), 3))
+            self.stats.set_value(f"{prefix}/p95", round(histogram.quantile(0.95), 3))
+            self.stats.set_value(f"{prefix}/max", round(histogram.max, 3))
+        for name, gauge in self.gauges.items():
+            self.stats.set_value(f"stage_metrics/{name}", gauge.value)
+            self.stats.set_value(f"stage_metrics/{name}/max", gauge.max)
+
+    def _sample(self, metric, value, **labels):
+        labels = {**self.labels, **labels}
+        if not labels:
+            return f"{metric} {value}"
+        text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+        return f"{metric}{{{text}}} {value}"
+
+    def prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP world_athletics_stage_seconds Time per callback stage and phase.",
+            "# TYPE world_athletics_stage_seconds histogram",
+        ]
+        metric = "world_athletics_stage_seconds"
+        for (stage, phase), histogram in sorted(self.histograms.items()):
+            for bound, count in histogram.cumulative():
+                lines.append(
+                    self._sample(
+                        f"{metric}_bucket",
+                        count,
+                        stage=stage,
+                        phase=phase,
+                        le=_bound(bound),
+                    )
+                )
+            lines.append(
+                self._sample(f"{metric}_sum", histogram.sum, stage=stage, phase=phase)
+            )
+            lines.append(
+                self._sample(
+                    f"{metric}_count", histogram.count, stage=stage, phase=phase
+                )
+            )
+
+        for name in sorted({name for _, name in self.counters}):
+            metric = f"world_athletics_stage_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (stage, counter), value in sorted(self.counters.items()):
+                if counter == name:
+                    lines.append(self._sample(metric, value, stage=stage))
+
+        for name, gauge in sorted(self.gauges.items()):
+            for metric, value in (
+                (f"world_athletics_{name}", gauge.value),
+                (f"world_athletics_{name}_max", gauge.max),
+            ):
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(self._sample(metric, value))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the Prometheus file, atomically so a scraper never reads half."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
@@ -3,11 +3,29 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
+import os
+import time
+
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet import task
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from world_athletics.checkpoint import CrawlCheckpoint
+from world_athletics.concurrency import THROTTLE_STATUSES, AdaptiveConcurrency
+from world_athletics.metrics import (
+    DEFAULT_BUCKETS,
+    NAVIGATION,
+    PARSE,
+    STAGE_TIMINGS,
+    StageMetrics,
+)
+from world_athletics.page_pool import PagePool, release_request_page
+
 
 class WorldAthleticsSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -98,3 +116,354 @@ class WorldAthleticsDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class PagePoolMiddleware:
+    # Hands idle Playwright pages from the shared PagePool to requests that
+    # include a page, so callbacks can reuse pages instead of closing them.
+    # Pages reaching a callback are tracked until released and pages of failed
+    # downloads go straight back to the pool.
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        size = settings.getint("PLAYWRIGHT_PAGE_POOL_SIZE") or settings.getint(
+            "CONCURRENT_REQUESTS"
+        )
+        pool = PagePool(
+            size=size,
+            max_uses=settings.getint("PLAYWRIGHT_PAGE_POOL_MAX_USES", 50),
+            stats=crawler.stats,
+        )
+        s = cls(pool)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_request(self, request, spider):
+        meta = request.meta
+        if (
+            meta.get("playwright")
+            and meta.get("playwright_include_page")
+            and "playwright_page" not in meta
+            and "playwright_context" not in meta
+        ):
+            page = self.pool.acquire()
+            if page is not None:
+                meta["playwright_page"] = page
+        return None
+
+    async def process_response(self, request, response, spider):
+        ## Responses served from the HTTP cache never used the attached page
+        if "cached" in response.flags:
+            await release_request_page(spider, request)
+            return response
+
+        page = request.meta.get("playwright_page")
+        if page is not None:
+            self.pool.track(page)
+        return response
+
+    async def process_exception(self, request, exception, spider):
+        await release_request_page(spider, request)
+        return None
+
+    def spider_opened(self, spider):
+        spider.page_pool = self.pool
+
+    async def spider_closed(self, spider):
+        await self.pool.close()
+
+
+class AdaptiveConcurrencyMiddleware:
+    # Feeds the latency, status and failures of every download to
+    # AdaptiveConcurrency, which tunes the downloader slot of the request.
+    # Sits next to the downloader so 429s are seen before RetryMiddleware.
+
+    def __init__(self, crawler, controller):
+        self.crawler = crawler
+        self.controller = controller
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("ADAPTIVE_CONCURRENCY_ENABLED"):
+            raise NotConfigured
+        controller = AdaptiveConcurrency.from_settings(
+            crawler.settings, stats=crawler.stats
+        )
+        return cls(crawler, controller)
+
+    def _slot(self, request):
+        key = request.meta.get("download_slot")
+        if key is None or self.crawler.engine is None:
+            return None, None
+        return key, self.crawler.engine.downloader.slots.get(key)
+
+    @staticmethod
+    def _retry_after(response):
+        value = response.headers.get(b"Retry-After")
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+    def process_response(self, request, response, spider):
+        if "cached" in response.flags:
+            return response
+        key, slot = self._slot(request)
+        if slot is None:
+            return response
+
+        if response.status in THROTTLE_STATUSES:
+            self.controller.throttled(key, slot, self._retry_after(response))
+        else:
+            self.controller.observe(
+                key,
+                slot,
+                latency=request.meta.get("download_latency"),
+                error=response.status >= 500,
+            )
+        return response
+
+    def process_exception(self, request, exception, spider):
+        key, slot = self._slot(request)
+        if slot is not None:
+            timeout = "timeout" in type(exception).__name__.lower()
+            self.controller.observe(key, slot, error=not timeout, timeout=timeout)
+        return None
+
+
+class PageReleaseSpiderMiddleware:
+    # Releases the page of a response whose callback never ran or raised,
+    # e.g. responses dropped by HttpErrorMiddleware.
+
+    def process_spider_exception(self, response, exception, spider):
+        # process_spider_exception cannot be async, schedule the release
+        deferred_from_coro(release_request_page(spider, response))
+        return None
+
+
+class CheckpointSpiderMiddleware:
+    # Journals the crawl frontier (see world_athletics.checkpoint): requests
+    # leaving the spider are recorded as scheduled, a response whose callback
+    # output was fully consumed marks its request done. On resume the start
+    # requests are replaced by the pending requests of the journal and
+    # requests completed by an earlier run are dropped.
+
+    def __init__(self, crawler, flush_interval=5):
+        self.crawler = crawler
+        self.flush_interval = flush_interval
+        self.checkpoint = None
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("CHECKPOINT_ENABLED", True):
+            raise NotConfigured
+        s = cls(
+            crawler, flush_interval=settings.getfloat("CHECKPOINT_FLUSH_INTERVAL", 5)
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def _checkpoint(self, spider):
+        if self.checkpoint is None:
+            self.checkpoint = CrawlCheckpoint.from_crawler(self.crawler, spider)
+            spider.checkpoint = self.checkpoint
+        return self.checkpoint
+
+    def _filter(self, spider, result):
+        checkpoint = self._checkpoint(spider)
+        if isinstance(result, Request):
+            if not result.dont_filter and checkpoint.is_done(result):
+                self.crawler.stats.inc_value("checkpoint/skipped_done")
+                return None
+            checkpoint.scheduled(spider, result)
+        return result
+
+    def _mark_done(self, spider, response):
+        if isinstance(response, Response) and response.request is not None:
+            self._checkpoint(spider).mark_done(response.request)
+
+    async def process_start(self, start):
+        spider = self.crawler.spider
+        checkpoint = self._checkpoint(spider)
+        if checkpoint.resume and checkpoint.requests:
+            count = 0
+            for request in checkpoint.pending(spider):
+                count += 1
+                self.crawler.stats.inc_value("checkpoint/resumed")
+                yield request
+            spider.logger.info("Resumed %d pending requests from checkpoint", count)
+            return
+
+        async for item_or_request in start:
+            item_or_request = self._filter(spider, item_or_request)
+            if item_or_request is not None:
+                yield item_or_request
+
+    def process_spider_output(self, response, result, spider):
+        for item_or_request in result:
+            item_or_request = self._filter(spider, item_or_request)
+            if item_or_request is not None:
+                yield item_or_request
+        self._mark_done(spider, response)
+
+    async def process_spider_output_async(self, response, result, spider):
+        async for item_or_request in result:
+            item_or_request = self._filter(spider, item_or_request)
+            if item_or_request is not None:
+                yield item_or_request
+        self._mark_done(spider, response)
+
+    def process_spider_exception(self, response, exception, spider):
+        if isinstance(response, Response) and response.request is not None:
+            self._checkpoint(spider).mark_failed(response.request)
+        return None
+
+    def spider_opened(self, spider):
+        checkpoint = self._checkpoint(spider)
+        self.task = task.LoopingCall(checkpoint.flush)
+        self.task.start(self.flush_interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+
+
+class StageMetricsSpiderMiddleware:
+    # Records per callback stage the navigation time, the timings collected
+    # while the callback ran (see world_athletics.metrics), the rest of its
+    # own time as parse time and the rows / requests it yielded. Sits next to
+    # the spider so the time of the other middlewares is not counted.
+
+    def __init__(self, crawler, metrics, interval, path=None):
+        self.crawler = crawler
+        self.metrics = metrics
+        self.interval = interval
+        self.path = path
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("STAGE_METRICS_ENABLED", True):
+            raise NotConfigured
+        buckets = [float(b) for b in settings.getlist("STAGE_METRICS_BUCKETS")]
+        metrics = StageMetrics(buckets or DEFAULT_BUCKETS, stats=crawler.stats)
+        s = cls(
+            crawler,
+            metrics,
+            interval=settings.getfloat("STAGE_METRICS_INTERVAL", 15),
+            path=settings.get("STAGE_METRICS_PATH"),
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    @staticmethod
+    def _stage(response):
+        callback = getattr(response.request, "callback", None)
+        return getattr(callback, "__name__", "parse")
+
+    def _start(self, response):
+        if not isinstance(response, Response) or response.request is None:
+            return None
+        ## Timings of an earlier attempt (retries copy meta) are dropped
+        response.meta[STAGE_TIMINGS] = {}
+        return self._stage(response)
+
+    def _count(self, stage, item_or_request):
+        if stage is not None:
+            name = "requests" if isinstance(item_or_request, Request) else "rows"
+            self.metrics.count(stage, name)
+
+    def _finish(self, stage, response, elapsed):
+        if stage is None:
+            return
+        latency = response.meta.get("download_latency")
+        if latency is not None and "cached" not in response.flags:
+            self.metrics.observe(stage, NAVIGATION, latency)
+        timings = response.meta.pop(STAGE_TIMINGS, {})
+        for phase, seconds in timings.items():
+            self.metrics.observe(stage, phase, seconds)
+        self.metrics.observe(stage, PARSE, max(0.0, elapsed - sum(timings.values())))
+
+    def process_spider_output(self, response, result, spider):
+        stage = self._start(response)
+        elapsed = 0.0
+        iterator = iter(result)
+        while True:
+            start = time.perf_counter()
+            try:
+                item_or_request = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                break
+            elapsed += time.perf_counter() - start
+            self._count(stage, item_or_request)
+            yield item_or_request
+        self._finish(stage, response, elapsed)
+
+    async def process_spider_output_async(self, response, result, spider):
+        stage = self._start(response)
+        elapsed = 0.0
+        iterator = result.__aiter__()
+        while True:
+            start = time.perf_counter()
+            try:
+                item_or_request = await iterator.__anext__()
+            except StopAsyncIteration:
+                elapsed += time.perf_counter() - start
+                break
+            elapsed += time.perf_counter() - start
+            self._count(stage, item_or_request)
+            yield item_or_request
+        self._finish(stage, response, elapsed)
+
+    def _queue_depth(self):
+        ## From the scheduler stats: the engine keeps its scheduler on a
+        ## private slot, which an upgrade may rename
+        stats = self.crawler.stats
+        enqueued = stats.get_value("scheduler/enqueued") if stats else None
+        if enqueued is None:
+            return None
+        return max(0, enqueued - stats.get_value("scheduler/dequeued", 0))
+
+    def sample(self, spider):
+        depth = self._queue_depth()
+        if depth is not None:
+            self.metrics.gauge("queue_depth", depth)
+        downloader = getattr(self.crawler.engine, "downloader", None)
+        active = getattr(downloader, "active", None)
+        if active is not None:
+            self.metrics.gauge("downloads_in_flight", len(active))
+        pool = getattr(spider, "page_pool", None)
+        if pool is not None:
+            self.metrics.gauge("open_pages", pool.open_pages)
+        self.export(spider)
+
+    def export(self, spider):
+        self.metrics.export_stats()
+        self.metrics.write(self.path)
+
+    def spider_opened(self, spider):
+        if self.path is None:
+            base_log_dir = getattr(spider, "base_log_dir", f"logs/{spider.name}")
+            self.path = os.path.join(base_log_dir, "metrics.prom")
+        self.metrics.labels = {"spider": spider.name}
+        spider.stage_metrics = self.metrics
+        self.task = task.LoopingCall(self.sample, spider)
+        self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        self.export(spider)
@@ -0,0 +1,169 @@
+## Parse raw result strings into numbers
+#
+# Marks come out of the pages as strings such as "10.67 CR", "1:44.21",
+# "2:05:30", "8,909" / "6 023" (points with a thousands separator) or
+# "10.39(-0.381) " (Asian results embed the wind in the mark).
+
+from functools import lru_cache
+import re
+from typing import NamedTuple, Optional
+
+_NUMBER_RE = re.compile(r"[-+]?\d+(?:\.\d+)?")
+_MARK_RE = re.compile(r"^\s*(\d+(?::\d+){0,2}(?:\.\d+)?)")
+## Points written with a thousands separator, "8,909", "6 023"
+_POINTS_RE = re.compile(r"^\s*(\d{1,3})[,\s](\d{3})(?![\d.:,])")
+_EMBEDDED_WIND_RE = re.compile(r"\(\s*([-+]?\d+(?:\.\d+)?)\s*\)?")
+
+
+def parse_int(value):
+    """Leading integer of a string like "1", "12." or "3 q", else None."""
+    if value is None:
+        return None
+    match = _NUMBER_RE.search(str(value))
+    if match is None or "." in match.group():
+        return None
+    return int(match.group())
+
+
+def parse_float(value):
+    if value is None:
+        return None
+    match = _NUMBER_RE.search(str(value))
+    if match is None:
+        return None
+    return float(match.group())
+
+
+def parse_mark(value):
+    """
+    Mark as a number: seconds for times (h:mm:ss.xx, m:ss.xx, ss.xx), metres
+    for distances and points for combined events.
+    """
+    if value is None:
+        return None
+    points = _POINTS_RE.match(str(value))
+    if points is not None:
+        return float(points.group(1) + points.group(2))
+    match = _MARK_RE.match(str(value))
+    if match is None:
+        return None
+
+    seconds = 0.0
+    for part in match.group(1).split(":"):
+        seconds = seconds * 60 + float(part)
+    ## 1:44.21 is 104.21, not 104.21000000000001
+    return round(seconds, 3)
+
+
+def parse_wind(value, mark=None):
+    """Wind from its own column, or from "(+1.2)" inside the mark."""
+    wind = parse_float(value) if value not in (None, "") else None
+    if wind is None and mark:
+        match = _EMBEDDED_WIND_RE.search(str(mark))
+        if match is not None:
+            wind = float(match.group(1))
+    return wind
+
+
+## Batch normalisation
+#
+# normalize_results() turns the columns of a whole table (or pipeline batch)
+# into numeric columns. Every distinct string is parsed once per batch and
+# the parsers are memoised across batches, marks repeat a lot ("DNS", "10.95",
+# "SB" heats) so most rows cost a dict lookup.
+
+RECORD_FLAGS = (
+    "WR",
+    "WL",
+    "AR",
+    "AL",
+    "CR",
+    "GR",
+    "MR",
+    "NR",
+    "NL",
+    "PB",
+    "SB",
+    "WU20R",
+    "WU20L",
+    "WU18R",
+    "WU18L",
+)
+STATUSES = ("DNF", "DNS", "DQ", "DSQ", "NM", "NH", "NT")
+
+## Ties keep their "=", "=PB"
+_FLAG_RE = re.compile(
+    r"(?<![A-Za-z0-9=])(=?(?:%s))(?![A-Za-z0-9])"
+    % "|".join(sorted(RECORD_FLAGS, key=len, reverse=True))
+)
+_STATUS_RE = re.compile(r"^\s*(%s)\b" % "|".join(STATUSES))
+
+CACHE_SIZE = 65536
+
+
+class MarkInfo(NamedTuple):
+    value: Optional[float]
+    wind: Optional[float]
+    records: tuple
+    status: Optional[str]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_mark_info(value):
+    """
+    Everything in a mark string: "10.67 CR" -> (10.67, None, ("CR",), None),
+    "10.83 =NR" -> (10.83, None, ("=NR",), None), "10.39(-0.381) " ->
+    (10.39, -0.381, (), None), "DNS" -> status "DNS".
+    """
+    if value is None:
+        return MarkInfo(None, None, (), None)
+    text = str(value)
+    status = _STATUS_RE.match(text)
+    return MarkInfo(
+        value=parse_mark(text),
+        wind=parse_wind(None, text),
+        records=tuple(dict.fromkeys(_FLAG_RE.findall(text))),
+        status=status.group(1) if status else None,
+    )
+
+
+cached_parse_int = lru_cache(maxsize=CACHE_SIZE)(parse_int)
+cached_parse_float = lru_cache(maxsize=CACHE_SIZE)(parse_float)
+
+
+def map_unique(func, values):
+    """func applied to each value, computed once per distinct value."""
+    results = {value: func(value) for value in dict.fromkeys(values)}
+    return [results[value] for value in values]
+
+
+def normalize_results(columns, size=None):
+    """
+    Numeric columns of a batch given as ``{field: [value per row]}``:
+    position_value, rank_value, mark_value, wind_value, reaction_time_value,
+    records (comma separated flags) and status. The wind column wins over a
+    wind embedded in the mark. Missing input columns give None.
+    """
+    if size is None:
+        size = max((len(values) for values in columns.values()), default=0)
+    empty = [None] * size
+
+    infos = map_unique(parse_mark_info, columns.get("mark", empty))
+    winds = map_unique(cached_parse_float, _blank_to_none(columns.get("wind", empty)))
+    return {
+        "position_value": map_unique(cached_parse_int, columns.get("position", empty)),
+        "rank_value": map_unique(cached_parse_int, columns.get("rank", empty)),
+        "mark_value": [info.value for info in infos],
+        "wind_value": [
+            wind if wind is not None else info.wind for wind, info in zip(winds, infos)
+        ],
+        "reaction_time_value": map_unique(
+            cached_parse_float, columns.get("reaction_time", empty)
+        ),
+        "records": [",".join(info.records) or None for info in infos],
+        "status": [info.status for info in infos],
+    }
+
+
+def _blank_to_none(values):
+    return [None if value == "" else value for value in values]
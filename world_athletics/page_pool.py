@@ -0,0 +1,167 @@
+## Reusable pool of Playwright pages
+#
+# Callbacks hand their page back with ``release_page`` instead of closing it and
+# PagePoolMiddleware attaches an idle page to the next request that asks for
+# one. scrapy-playwright navigates an existing ``playwright_page`` instead of
+# opening a new page, so only the first requests pay for page creation.
+#
+# Pages handed to callbacks are tracked as checked out until they are
+# released, ``managed_page`` guarantees that on every return and exception
+# path and anything still checked out when the spider closes is reported and
+# closed.
+
+from collections import deque
+from contextlib import asynccontextmanager
+import logging
+
+from world_athletics.metrics import RELEASE, timed
+
+logger = logging.getLogger(__name__)
+
+
+class PagePool:
+    def __init__(self, size, max_uses=50, stats=None):
+        self.size = size
+        self.max_uses = max_uses
+        self.stats = stats
+        self._idle = deque()
+        self._uses = {}
+        self._checked_out = set()
+        self._max_checked_out = 0
+
+    def __len__(self):
+        return len(self._idle)
+
+    def _inc_stat(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(f"page_pool/{key}", count)
+
+    def _update_open_stats(self):
+        open_pages = len(self._checked_out)
+        self._max_checked_out = max(self._max_checked_out, open_pages)
+        if self.stats is not None:
+            self.stats.set_value("page_pool/open_pages", open_pages)
+            self.stats.set_value("page_pool/max_open_pages", self._max_checked_out)
+
+    @property
+    def open_pages(self):
+        return len(self._checked_out)
+
+    def track(self, page):
+        """Mark a page as handed to a callback until it is released."""
+        self._checked_out.add(page)
+        self._update_open_stats()
+
+    def _is_alive(self, page):
+        if page.is_closed():
+            return False
+        browser = page.context.browser
+        return browser is None or browser.is_connected()
+
+    def acquire(self):
+        """
+        Return an idle page or None when the pool is empty, in which case
+        scrapy-playwright creates a new page for the request.
+        """
+        while self._idle:
+            page = self._idle.popleft()
+            if self._is_alive(page):
+                self._inc_stat("reused")
+                return page
+            self._uses.pop(page, None)
+            self._inc_stat("dropped_unhealthy")
+        return None
+
+    async def release(self, page):
+        if page is None:
+            return
+        self._checked_out.discard(page)
+        self._update_open_stats()
+        uses = self._uses.pop(page, 0) + 1
+
+        if not self._is_alive(page):
+            self._inc_stat("dropped_unhealthy")
+            return
+
+        if uses >= self.max_uses or len(self._idle) >= self.size:
+            self._inc_stat("recycled" if uses >= self.max_uses else "overflow_closed")
+            await self._close(page)
+            return
+
+        ## Health check and drop the old DOM so idle pages stay small
+        try:
+            await page.goto("about:blank")
+        except Exception as e:
+            logger.debug("Dropping unhealthy page from pool: %s", e)
+            self._inc_stat("dropped_unhealthy")
+            await self._close(page)
+            return
+
+        self._uses[page] = uses
+        self._idle.append(page)
+        self._inc_stat("released")
+
+    async def _close(self, page):
+        try:
+            await page.close()
+        except Exception as e:
+            logger.debug("Error while closing pooled page: %s", e)
+
+    async def close(self):
+        if self._checked_out:
+            logger.warning(
+                "%d Playwright page(s) were never released, closing them",
+                len(self._checked_out),
+            )
+            self._inc_stat("leaked", len(self._checked_out))
+        for page in list(self._checked_out):
+            await self._close(page)
+        self._checked_out.clear()
+        self._update_open_stats()
+
+        while self._idle:
+            await self._close(self._idle.popleft())
+        self._uses.clear()
+
+
+async def release_page(spider, page):
+    """Give the page back to the spider's pool, or close it if there is none."""
+    pool = getattr(spider, "page_pool", None)
+    if pool is None:
+        await page.close()
+        return
+    await pool.release(page)
+
+
+async def release_request_page(spider, request):
+    """
+    Release the page attached to a request or response, if any.
+
+    The page is removed from meta so a retried copy of the request does not
+    carry a page that went back to the pool. Safe to call more than once.
+    """
+    page = request.meta.pop("playwright_page", None)
+    if page is None:
+        return
+
+    ## Handlers from playwright_page_event_handlers must not outlive the request
+    handlers = request.meta.get("playwright_page_event_handlers") or {}
+    for event, handler in handlers.items():
+        if callable(handler):
+            page.remove_listener(event, handler)
+
+    await release_page(spider, page)
+
+
+@asynccontextmanager
+async def managed_page(spider, response):
+    """
+    Yield the response's Playwright page and always release it afterwards,
+    including early returns and exceptions inside the callback.
+    """
+    page = response.meta.get("playwright_page")
+    try:
+        yield page
+    finally:
+        with timed(response, RELEASE):
+            await release_request_page(spider, response)
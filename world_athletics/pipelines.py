@@ -7,7 +7,6 @@
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
-
 # class WorldAthleticsPipeline:
 #     def process_item(self, item, spider):
 #         return item
@@ -16,27 +15,109 @@ from itemadapter import ItemAdapter
 from collections import defaultdict
 import json
 import os
+import re
+import typing
+
+from scrapy.exceptions import NotConfigured
+
+from world_athletics.checkpoint import is_resuming
+from world_athletics.identity import CanonicalIndex
+from world_athletics.normalize import normalize_results
+from world_athletics.writers import JsonLinesWriter, compact_jsonl
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+## Arrow type per Python type of a non-text column
+ARROW_TYPES = {
+    int: lambda: pa.int64(),
+    float: lambda: pa.float64(),
+    bool: lambda: pa.bool_(),
+}
+_DECLARED_TYPES = {}
+
+
+class CanonicalIndexPipeline:
+    """
+    Set athlete_id and country_id on result items from the shared canonical
+    index (CANONICAL_INDEX_PATH), before the output pipelines write them.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CANONICAL_INDEX_ENABLED", True):
+            raise NotConfigured
+        return cls(CanonicalIndex.from_crawler(crawler))
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        fields = adapter.field_names()
+        ## Asian results call the athlete "name"
+        name_field = "athlete" if "athlete" in fields else "name"
+        if name_field not in fields:
+            return item
+
+        adapter["athlete_id"] = self.index.athlete_id(adapter.get(name_field))
+        adapter["country_id"] = self.index.country_id(adapter.get("country"))
+        return item
+
+    def close_spider(self, spider):
+        self.index.close()
 
 
 class AnchorGroupingPipeline:
+    """
+    Stream rows to one <championship>/<event>.jsonl file per championship and
+    event as they arrive and, at close, compact each file into <event>.json
+    (STREAMING_COMPACT_ON_CLOSE). The layout is the same whatever the number
+    of start URLs, so shards of a sharded crawl merge cleanly. Single-URL runs
+    used to write a flat <event>.json instead, without the championship folder.
+    """
 
     def open_spider(self, spider):
         self.output_dir = getattr(spider, "output_dir", "results")
-        self.data = defaultdict(list)
         os.makedirs(self.output_dir, exist_ok=True)
 
+        settings = spider.settings
+        self.compact_on_close = settings.getbool("STREAMING_COMPACT_ON_CLOSE", True)
+        ## A resumed crawl adds its rows to those of the interrupted run
+        self.writer = JsonLinesWriter.from_settings(
+            settings, append=is_resuming(spider)
+        )
+        self.writer.start()
+        self.paths = {}
+
+    def _path(self, championship, event_name):
+        key = (championship, event_name)
+        path = self.paths.get(key)
+        if path is None:
+            safe_name = event_name.replace(" ", "_").lower()
+            directory = os.path.join(
+                self.output_dir, championship or "unknown_championship"
+            )
+            path = os.path.join(directory, f"{safe_name}.jsonl")
+            self.paths[key] = path
+        return path
+
     def process_item(self, item, spider):
-        event_name = item.get("event_name", "unknown_event")
-        self.data[event_name].append(dict(item))
+        adapter = ItemAdapter(item)
+        event_name = adapter.get("event_name", "unknown_event")
+        path = self._path(adapter.get("championship"), event_name)
+        self.writer.write(path, item)
         return item
 
     def close_spider(self, spider):
-        for event_name, records in self.data.items():
-            safe_name = event_name.replace(" ", "_").lower()
-            path = os.path.join(self.output_dir, f"{safe_name}.json")
-
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(records, f, ensure_ascii=False, indent=2)
+        self.writer.close()
+        if not self.compact_on_close:
+            return
+        for path in self.writer.paths:
+            compact_jsonl(path, path[: -len(".jsonl")] + ".json")
 
 
 class WorldAthleteIndoorAnchorPipeline:
@@ -47,48 +128,263 @@ class WorldAthleteIndoorAnchorPipeline:
 
         ## Createa file path to store anchors
         self.file_path = os.path.join(self.output_dir, "anchors.json")
-        self.file = open(self.file_path, "w", encoding="utf-8")
 
         self.items = []
+        ## A resumed crawl keeps the anchors found by the interrupted run
+        if is_resuming(spider) and os.path.exists(self.file_path):
+            with open(self.file_path, encoding="utf-8") as f:
+                self.items = json.load(f)
+
+        self.file = open(self.file_path, "w", encoding="utf-8")
 
     def process_item(self, item, spider):
-        if "anchor_link" not in item:
+        if "anchor_link" not in ItemAdapter(item).field_names():
             return item
 
-        self.items.append(dict(item))
+        self.items.append(item)
         return item
 
     def close_spider(self, spider):
-        json.dump(self.items, self.file, ensure_ascii=False, indent=2)
+        json.dump(
+            [ItemAdapter(item).asdict() for item in self.items],
+            self.file,
+            ensure_ascii=False,
+            indent=2,
+        )
         self.file.close()
 
 
 class WorldAthleteIndoorResultPipeline:
+    """
+    Stream result rows to <competition>_<description>/<event>.jsonl, keyed per
+    item by (competition, description, event) so rows of concurrent
+    competitions never mix. Open file handles are capped by
+    STREAMING_MAX_OPEN_FILES (LRU) and files are compacted into <event>.json
+    at close.
+    """
+
     def open_spider(self, spider):
         self.output_dir = getattr(spider, "output_dir", "results")
-        self.data = defaultdict(list)
         os.makedirs(self.output_dir, exist_ok=True)
 
+        settings = spider.settings
+        self.compact_on_close = settings.getbool("STREAMING_COMPACT_ON_CLOSE", True)
+        ## A resumed crawl adds its rows to those of the interrupted run
+        self.writer = JsonLinesWriter.from_settings(
+            settings, append=is_resuming(spider)
+        )
+        self.writer.start()
+        self.paths = {}
+
+    @staticmethod
+    def _safe_name(value):
+        return value.replace(" ", "_").lower()
+
+    def _path(self, key):
+        path = self.paths.get(key)
+        if path is None:
+            competition_name, competition_description, event_name = key
+            folder_name = "_".join(
+                [
+                    self._safe_name(competition_name),
+                    self._safe_name(competition_description),
+                ]
+            )
+            path = os.path.join(
+                self.output_dir, folder_name, f"{self._safe_name(event_name)}.jsonl"
+            )
+            self.paths[key] = path
+        return path
+
     def process_item(self, item, spider):
-        competition_name = (
-            item.get("competition_name", "new_competition").replace(" ", "_").lower()
+        adapter = ItemAdapter(item)
+        ## Anchors are written by WorldAthleteIndoorAnchorPipeline
+        if "anchor_link" in adapter.field_names():
+            return item
+
+        key = (
+            adapter.get("competition_name", "new_competition"),
+            adapter.get("competition_description", "new_competition"),
+            adapter.get("event_name", "unknown_event"),
         )
-        competition_description = (
-            item.get("competition_description", "new_competition")
-            .replace(" ", "_")
-            .lower()
+        self.writer.write(self._path(key), item)
+        return item
+
+    def close_spider(self, spider):
+        self.writer.close()
+        if not self.compact_on_close:
+            return
+        for path in self.writer.paths:
+            compact_jsonl(path, path[: -len(".jsonl")] + ".json")
+
+
+class ParquetExportPipeline:
+    """
+    Batch result rows into typed Arrow record batches and write them as
+    Parquet, partitioned hive style by championship / event / round so Spark
+    can prune partitions. position/rank, mark, wind and reaction_time are
+    normalised to numeric columns (plus records and status taken from the
+    mark) per batch. Other fields keep the type the item declares (int IDs
+    from CanonicalIndexPipeline stay int64), or the type of their values for
+    items without annotations, and text fields are written as strings.
+
+    Columns named like a partition key are left out of the part files, a
+    dataset reader adds them back from the directory names (it cannot merge
+    a file column with the partition column of the same name).
+    """
+
+    PARTITION_KEYS = ("championship", "event", "round")
+    INT_FIELDS = ("position", "rank")
+    FLOAT_FIELDS = ("wind", "reaction_time")
+    TEXT_FIELDS = ("records", "status")
+
+    def __init__(self, output_dir, batch_rows, stats=None):
+        self.output_dir = output_dir
+        self.batch_rows = batch_rows
+        self.stats = stats
+        self.batches = defaultdict(list)
+        self.part_numbers = defaultdict(int)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if pa is None:
+            raise NotConfigured("ParquetExportPipeline requires pyarrow")
+        settings = crawler.settings
+        return cls(
+            output_dir=settings.get("PARQUET_OUTPUT_DIR"),
+            batch_rows=settings.getint("PARQUET_BATCH_ROWS", 10000),
+            stats=crawler.stats,
         )
-        folder_name = "_".join([competition_name, competition_description])
 
-        event_name = item.get("event_name", "unknown_event")
-        self.folder_path = os.path.join(self.output_dir, folder_name)
-        os.makedirs(self.folder_path, exist_ok=True)
-        self.data[event_name].append(dict(item))
+    def open_spider(self, spider):
+        if not self.output_dir:
+            self.output_dir = os.path.join(
+                getattr(spider, "output_dir", "results"), "parquet"
+            )
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.run_id = getattr(spider, "run_id", None) or spider.name
+
+    @staticmethod
+    def _partition_value(value):
+        value = str(value or "unknown").strip() or "unknown"
+        return re.sub(r"[/\\=]+", "_", value)
+
+    def _partition(self, item, spider):
+        championship = (
+            item.get("championship") or item.get("competition_name") or spider.name
+        )
+        event = item.get("event_name") or item.get("event_details")
+        round_name = item.get("round_name")
+        return tuple(
+            self._partition_value(v) for v in (championship, event, round_name)
+        )
+
+    @staticmethod
+    def _declared_types(item):
+        """{field: int / float / bool / str} from the item's annotations."""
+        cls = type(item)
+        types = _DECLARED_TYPES.get(cls)
+        if types is None:
+            try:
+                hints = typing.get_type_hints(cls)
+            except Exception:
+                hints = {}
+            types = {}
+            for name, hint in hints.items():
+                args = [a for a in typing.get_args(hint) if a is not type(None)]
+                if typing.get_origin(hint) is typing.Union and len(args) == 1:
+                    hint = args[0]
+                if hint in (int, float, bool, str):
+                    types[name] = hint
+            _DECLARED_TYPES[cls] = types
+        return types
+
+    @staticmethod
+    def _value_type(values):
+        """int, float or bool when every value is one, else str."""
+        kinds = {type(v) for v in values if v is not None}
+        if kinds == {bool}:
+            return bool
+        if kinds == {int}:
+            return int
+        if kinds and kinds <= {int, float}:
+            return float
+        return str
+
+    def _columns(self, items):
+        """Normalised columns of a batch of items, in field order, and the
+        Python type of every column that is not normalised."""
+        adapters = [ItemAdapter(item) for item in items]
+        names = dict.fromkeys(n for a in adapters for n in a.field_names())
+        columns = {name: [a.get(name) for a in adapters] for name in names}
+        numeric = normalize_results(columns, size=len(adapters))
+
+        declared = self._declared_types(items[0])
+        types = {}
+        for name, values in columns.items():
+            kind = declared.get(name) or self._value_type(values)
+            if kind is str:
+                values = [None if v is None else str(v) for v in values]
+            elif kind is not bool:
+                values = [None if v is None else kind(v) for v in values]
+            columns[name] = values
+            types[name] = kind
+        for field in self.INT_FIELDS:
+            if field in columns:
+                columns[field] = numeric[f"{field}_value"]
+        columns["reaction_time"] = numeric["reaction_time_value"]
+        columns["wind"] = numeric["wind_value"]
+        columns["mark_value"] = numeric["mark_value"]
+        columns["records"] = numeric["records"]
+        columns["status"] = numeric["status"]
+        return columns, types
+
+    def process_item(self, item, spider):
+        ## Items are kept as they are, columns are built once per batch
+        partition = self._partition(ItemAdapter(item), spider)
+        self.batches[partition].append(item)
+        if len(self.batches[partition]) >= self.batch_rows:
+            self._write(partition)
         return item
 
+    def _schema(self, names, types):
+        fields = []
+        for name in names:
+            kind = types.get(name, str)
+            if name in self.INT_FIELDS:
+                fields.append(pa.field(name, pa.int32()))
+            elif name in self.FLOAT_FIELDS or name == "mark_value":
+                fields.append(pa.field(name, pa.float64()))
+            elif name in self.TEXT_FIELDS or kind is str:
+                fields.append(pa.field(name, pa.string()))
+            else:
+                fields.append(pa.field(name, ARROW_TYPES[kind]()))
+        return pa.schema(fields)
+
+    def _write(self, partition):
+        items = self.batches.pop(partition, None)
+        if not items:
+            return
+        columns, types = self._columns(items)
+        for key in self.PARTITION_KEYS:
+            columns.pop(key, None)
+        schema = self._schema(columns, types)
+        batch = pa.RecordBatch.from_pydict(columns, schema=schema)
+
+        directory = os.path.join(
+            self.output_dir,
+            *(f"{key}={value}" for key, value in zip(self.PARTITION_KEYS, partition)),
+        )
+        os.makedirs(directory, exist_ok=True)
+        part = self.part_numbers[partition]
+        self.part_numbers[partition] += 1
+        path = os.path.join(directory, f"part-{self.run_id}-{part:05d}.parquet")
+        pq.write_table(pa.Table.from_batches([batch]), path)
+
+        if self.stats is not None:
+            self.stats.inc_value("parquet/files")
+            self.stats.inc_value("parquet/rows", len(items))
+
     def close_spider(self, spider):
-        for event_name, records in self.data.items():
-            safe_name = event_name.replace(" ", "_").lower()
-            path = os.path.join(self.folder_path, f"{safe_name}.json")
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(records, f, ensure_ascii=False, indent=2)
+        for partition in list(self.batches):
+            self._write(partition)
@@ -0,0 +1,241 @@
+## Event-driven page readiness
+#
+# ReadinessEngine.wait() runs an optional action (a click, ...) and races the
+# signals that tell a rendered page is done:
+#
+# - READY: one of the expected selectors is in the DOM
+# - EMPTY: a known "no results" marker is visible
+#
+# and returns as soon as one of them resolves, so an empty round costs the
+# time its marker takes to show instead of a full selector timeout.
+#
+# Network activity only ever extends a wait: the XHR / fetch / document
+# requests of the page are tracked from before the action, and when the
+# budget of the page type runs out while some are in flight (or settled less
+# than ``quiet`` seconds ago) the wait goes on, up to max_timeout. A wait that
+# ends without a signal returns IDLE when the network had settled and TIMEOUT
+# when it had not, both meaning the page never showed what was expected.
+#
+# Budgets are learned per page type ("indoor.results", "anchor.summary", ...)
+# from the time READY took on earlier pages (twice the 95th percentile,
+# within [min_timeout, max_timeout]) and kept in a JSON file between runs.
+
+import asyncio
+from collections import defaultdict, deque
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+READY = "ready"
+EMPTY = "empty"
+IDLE = "idle"
+TIMEOUT = "timeout"
+
+NETWORK_RESOURCE_TYPES = ("xhr", "fetch", "document")
+
+
+class NetworkTracker:
+    """
+    XHR / fetch / document requests of a page in flight since attach(), so
+    the requests started by an action are seen even when they outlive it.
+    """
+
+    def __init__(self, page, resource_types=NETWORK_RESOURCE_TYPES, clock=None):
+        self.page = page
+        self.resource_types = resource_types
+        self.clock = clock or time.monotonic
+        self.inflight = set()
+        self.last_change = self.clock()
+
+    def _on_request(self, request):
+        if request.resource_type in self.resource_types:
+            self.inflight.add(request)
+            self.last_change = self.clock()
+
+    def _on_finished(self, request):
+        if request in self.inflight:
+            self.inflight.discard(request)
+            self.last_change = self.clock()
+
+    def attach(self):
+        self.page.on("request", self._on_request)
+        self.page.on("requestfinished", self._on_finished)
+        self.page.on("requestfailed", self._on_finished)
+        return self
+
+    def detach(self):
+        self.page.remove_listener("request", self._on_request)
+        self.page.remove_listener("requestfinished", self._on_finished)
+        self.page.remove_listener("requestfailed", self._on_finished)
+
+    def settled(self, quiet):
+        """True when nothing was in flight for ``quiet`` seconds."""
+        return not self.inflight and self.clock() - self.last_change >= quiet
+
+
+class ReadinessEngine:
+    def __init__(
+        self,
+        default_timeout=15.0,
+        min_timeout=2.0,
+        max_timeout=30.0,
+        quiet=1.0,
+        history=50,
+        path=None,
+        stats=None,
+    ):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.quiet = quiet
+        self.path = path
+        self.stats = stats
+        self._durations = defaultdict(lambda: deque(maxlen=history))
+        if path and os.path.exists(path):
+            self._load()
+
+    @classmethod
+    def from_crawler(cls, crawler, spider):
+        settings = crawler.settings
+        log_dir = getattr(spider, "base_log_dir", None) or f"logs/{spider.name}"
+        return cls(
+            default_timeout=settings.getfloat("READINESS_DEFAULT_TIMEOUT", 15.0),
+            min_timeout=settings.getfloat("READINESS_MIN_TIMEOUT", 2.0),
+            max_timeout=settings.getfloat("READINESS_MAX_TIMEOUT", 30.0),
+            quiet=settings.getfloat("READINESS_NETWORK_QUIET", 1.0),
+            path=os.path.join(log_dir, "readiness.json"),
+            stats=crawler.stats,
+        )
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                history = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring readiness history %s: %s", self.path, e)
+            return
+        for page_type, durations in history.items():
+            self._durations[page_type].extend(durations)
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        history = {k: [round(d, 3) for d in v] for k, v in self._durations.items()}
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2)
+
+    def budget(self, page_type):
+        """Seconds to wait for a page of this type."""
+        durations = sorted(self._durations.get(page_type, ()))
+        if len(durations) < 5:
+            return self.default_timeout
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        return min(max(p95 * 2, self.min_timeout), self.max_timeout)
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(key)
+
+    def _record(self, page_type, outcome, elapsed):
+        if outcome == READY:
+            self._durations[page_type].append(elapsed)
+        self._inc_stat(f"readiness/{page_type}/{outcome}")
+        if self.stats is not None:
+            self.stats.set_value(
+                f"readiness/{page_type}/budget_ms", int(self.budget(page_type) * 1000)
+            )
+
+    @staticmethod
+    async def _first_selector(page, selectors, timeout, state):
+        tasks = [
+            asyncio.ensure_future(
+                page.wait_for_selector(s, state=state, timeout=timeout * 1000)
+            )
+            for s in selectors
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                try:
+                    return await task
+                except Exception:
+                    continue
+            raise TimeoutError(f"None of {selectors} found")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def wait(
+        self, page, page_type, ready, empty=(), network_idle=True, action=None
+    ):
+        """
+        Run ``action`` (an async callable, e.g. a click) and wait until the
+        page shows one of the ``ready`` selectors or one of the ``empty``
+        markers. Returns READY or EMPTY, else IDLE / TIMEOUT once the budget
+        (extended while requests are in flight, with ``network_idle``) is
+        spent.
+        """
+        if isinstance(ready, str):
+            ready = [ready]
+        tracker = NetworkTracker(page).attach() if network_idle else None
+        try:
+            if action is not None:
+                await action()
+            return await self._race(page, page_type, ready, empty, tracker)
+        finally:
+            if tracker is not None:
+                tracker.detach()
+
+    async def _race(self, page, page_type, ready, empty, tracker):
+        budget = self.budget(page_type)
+        limit = max(budget, self.max_timeout)
+        started = time.monotonic()
+        deadline = started + budget
+
+        racers = {
+            asyncio.ensure_future(
+                self._first_selector(page, ready, limit, state="attached")
+            ): READY
+        }
+        if empty:
+            racers[
+                asyncio.ensure_future(
+                    self._first_selector(page, list(empty), limit, state="visible")
+                )
+            ] = EMPTY
+
+        outcome = None
+        pending = set(racers)
+        try:
+            while pending and outcome is None:
+                now = time.monotonic()
+                if now >= deadline:
+                    if tracker is None or tracker.settled(self.quiet):
+                        break
+                    if now >= started + limit:
+                        break
+                    ## Still loading, give the page another quiet period
+                    deadline = min(started + limit, now + self.quiet)
+                    self._inc_stat(f"readiness/{page_type}/extended")
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=deadline - now,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        outcome = racers[task]
+                        break
+        finally:
+            for task in racers:
+                task.cancel()
+            await asyncio.gather(*racers, return_exceptions=True)
+
+        if outcome is None:
+            settled = tracker is not None and tracker.settled(self.quiet)
+            outcome = IDLE if settled else TIMEOUT
+        self._record(page_type, outcome, time.monotonic() - started)
+        return outcome
@@ -0,0 +1,83 @@
+## Abort Playwright sub-requests the spiders never need
+#
+# Used as scrapy-playwright's abort_request callable. Images, fonts, analytics
+# and ad scripts are aborted before they hit the network, the navigation
+# request itself is never blocked.
+
+from urllib.parse import urlparse
+
+
+def _matching_domain(host, domains):
+    for d in domains:
+        if host == d or host.endswith("." + d):
+            return d
+    return None
+
+
+class ResourceBlocker:
+    def __init__(
+        self,
+        resource_types=(),
+        deny_domains=(),
+        allow_domains=(),
+        stats=None,
+    ):
+        self.resource_types = frozenset(resource_types)
+        self.deny_domains = tuple(d.lower().lstrip(".") for d in deny_domains)
+        self.allow_domains = tuple(d.lower().lstrip(".") for d in allow_domains)
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            resource_types=settings.getlist("RESOURCE_BLOCKING_TYPES"),
+            deny_domains=settings.getlist("RESOURCE_BLOCKING_DENY_DOMAINS"),
+            allow_domains=settings.getlist("RESOURCE_BLOCKING_ALLOW_DOMAINS"),
+            stats=crawler.stats,
+        )
+
+    def should_block(self, url, resource_type, is_navigation=False):
+        """
+        Return the reason a request is blocked ("type" or "domain") or None.
+
+        When RESOURCE_BLOCKING_ALLOW_DOMAINS is set, every host outside of it
+        is blocked as well.
+        """
+        if is_navigation or resource_type == "document":
+            return None
+
+        host = (urlparse(url).hostname or "").lower()
+
+        if resource_type in self.resource_types:
+            return "type"
+        if _matching_domain(host, self.deny_domains) is not None:
+            return "domain"
+        if self.allow_domains and _matching_domain(host, self.allow_domains) is None:
+            return "domain"
+        return None
+
+    def __call__(self, playwright_request):
+        reason = self.should_block(
+            playwright_request.url,
+            playwright_request.resource_type,
+            is_navigation=playwright_request.is_navigation_request(),
+        )
+        if reason is None:
+            self._inc_stat("resource_blocking/allowed")
+            return False
+
+        self._inc_stat("resource_blocking/blocked")
+        self._inc_stat(f"resource_blocking/blocked/{reason}")
+        self._inc_stat(
+            f"resource_blocking/blocked/type/{playwright_request.resource_type}"
+        )
+        if reason == "domain":
+            host = (urlparse(playwright_request.url).hostname or "").lower()
+            domain = _matching_domain(host, self.deny_domains) or "not_allowed"
+            self._inc_stat(f"resource_blocking/blocked/domain/{domain}")
+        return True
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(key)
@@ -8,7 +8,6 @@
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
 BOT_NAME = "world_athletics"
-LOG_LEVEL = "ERROR"
 
 SPIDER_MODULES = ["world_athletics.spiders"]
 NEWSPIDER_MODULE = "world_athletics.spiders"
@@ -28,6 +27,20 @@ CONCURRENT_REQUESTS_PER_DOMAIN = 2
 DOWNLOAD_DELAY = 1
 RANDOMIZE_DOWNLOAD_DELAY = True
 
+## Per-domain concurrency and delay tuned at run time, starting from the values
+## above: one more page while renders are fast and healthy, less on slow
+## renders, errors / timeouts, 429s or low free memory. Hard caps below,
+## ADAPTIVE_CONCURRENCY_MAX never exceeds CONCURRENT_REQUESTS.
+ADAPTIVE_CONCURRENCY_ENABLED = True
+ADAPTIVE_CONCURRENCY_MIN = 1
+ADAPTIVE_CONCURRENCY_MAX = 8
+ADAPTIVE_CONCURRENCY_MIN_DELAY = 0.25
+ADAPTIVE_CONCURRENCY_MAX_DELAY = 30
+ADAPTIVE_CONCURRENCY_TARGET_LATENCY = 8
+ADAPTIVE_CONCURRENCY_MAX_ERROR_RATE = 0.1
+ADAPTIVE_CONCURRENCY_WINDOW = 20
+ADAPTIVE_CONCURRENCY_MIN_FREE_MEMORY_MB = 1024
+
 # Disable cookies (enabled by default)
 # COOKIES_ENABLED = False
 
@@ -42,15 +55,29 @@ RANDOMIZE_DOWNLOAD_DELAY = True
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-# SPIDER_MIDDLEWARES = {
-#    "world_athletics.middlewares.WorldAthleticsSpiderMiddleware": 543,
-# }
+SPIDER_MIDDLEWARES = {
+    # "world_athletics.middlewares.WorldAthleticsSpiderMiddleware": 543,
+    "world_athletics.middlewares.PageReleaseSpiderMiddleware": 100,
+    ## Outside HttpErrorMiddleware (50), sees the requests that really leave
+    "world_athletics.middlewares.CheckpointSpiderMiddleware": 45,
+    "world_athletics.middlewares.StageMetricsSpiderMiddleware": 950,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-# DOWNLOADER_MIDDLEWARES = {
-#    "world_athletics.middlewares.WorldAthleticsDownloaderMiddleware": 543,
-# }
+DOWNLOADER_MIDDLEWARES = {
+    # "world_athletics.middlewares.WorldAthleticsDownloaderMiddleware": 543,
+    "world_athletics.middlewares.PagePoolMiddleware": 600,
+    "world_athletics.middlewares.AdaptiveConcurrencyMiddleware": 950,
+}
+
+## Per-stage metrics (StageMetricsSpiderMiddleware): histogram buckets in
+## seconds, sampling interval of open pages / queue depth and the Prometheus
+## text file, <log_dir>/<spider>/metrics.prom by default
+STAGE_METRICS_ENABLED = True
+STAGE_METRICS_INTERVAL = 15
+STAGE_METRICS_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+# STAGE_METRICS_PATH = "metrics/world_athletics.prom"
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -60,10 +87,34 @@ RANDOMIZE_DOWNLOAD_DELAY = True
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+## AnchorGroupingPipeline writes <output_dir>/<championship>/<event>.json for
+## every run. Single-URL runs used to write a flat <output_dir>/<event>.json,
+## readers of those paths have to add the championship (edition slug of the
+## start URL) folder
 ITEM_PIPELINES = {
     # "world_athletics.pipelines.AnchorGroupingPipeline": 300,
 }
 
+## Streaming output: rows buffered before a flush, max seconds between
+## flushes, fsync after each flush and compaction of the .jsonl files into the
+## grouped .json layout when the spider closes
+STREAMING_BUFFER_ROWS = 500
+STREAMING_FLUSH_INTERVAL = 30
+STREAMING_FSYNC = True
+STREAMING_COMPACT_ON_CLOSE = True
+## Output files kept open between flushes (least recently used one is closed
+## first), 0 opens and closes the file on every flush
+STREAMING_MAX_OPEN_FILES = 64
+
+## CanonicalIndexPipeline: athlete / country IDs shared by all spiders and runs
+CANONICAL_INDEX_ENABLED = True
+CANONICAL_INDEX_PATH = "data/canonical_index.sqlite3"
+
+## ParquetExportPipeline (needs pyarrow): rows per partition written as one
+## part file, output defaults to <spider output_dir>/parquet
+# PARQUET_OUTPUT_DIR = "parquet"
+PARQUET_BATCH_ROWS = 10000
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 # AUTOTHROTTLE_ENABLED = True
@@ -83,7 +134,16 @@ ITEM_PIPELINES = {
 # HTTPCACHE_EXPIRATION_SECS = 0
 # HTTPCACHE_DIR = "httpcache"
 # HTTPCACHE_IGNORE_HTTP_CODES = []
-# HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+HTTPCACHE_STORAGE = "world_athletics.cache.RenderCacheStorage"
+
+## Render cache expiration per URL class (used with HTTPCACHE_ENABLED):
+## (regex, seconds) pairs checked first, 0 = never expire. Otherwise pages of
+## past seasons never expire and pages of the current season expire after
+## RENDER_CACHE_LIVE_TTL seconds.
+RENDER_CACHE_TTLS = [
+    # (r"world-athletics-championships-budapest-2023", 0),
+]
+RENDER_CACHE_LIVE_TTL = 900
 
 # Set settings whose default value is deprecated to a future-proof value
 FEED_EXPORT_ENCODING = "utf-8"
@@ -91,8 +151,8 @@ FEED_EXPORT_ENCODING = "utf-8"
 
 ## Playwright setting
 DOWNLOAD_HANDLERS = {
-    "http": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
-    "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
+    "http": "world_athletics.handlers.WorldAthleticsPlaywrightDownloadHandler",
+    "https": "world_athletics.handlers.WorldAthleticsPlaywrightDownloadHandler",
 }
 # settings.py
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
@@ -109,5 +169,81 @@ PLAYWRIGHT_LAUNCH_OPTIONS = {
     # ],
 }
 
+## Idle pages kept for reuse (defaults to CONCURRENT_REQUESTS) and the number
+## of navigations after which a page is closed and replaced by a fresh one
+# PLAYWRIGHT_PAGE_POOL_SIZE = 16
+PLAYWRIGHT_PAGE_POOL_MAX_USES = 50
+
+## Sub-requests aborted inside rendered pages (launch args such as
+## --disable-images do not stop the network fetch). The navigation request is
+## never blocked. If RESOURCE_BLOCKING_ALLOW_DOMAINS is not empty, every other
+## host is blocked too.
+RESOURCE_BLOCKING_ENABLED = True
+RESOURCE_BLOCKING_TYPES = ["image", "media", "font"]
+RESOURCE_BLOCKING_DENY_DOMAINS = [
+    "googletagmanager.com",
+    "google-analytics.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "onesignal.com",
+    "gtranslate.com",
+    "fonts.googleapis.com",
+    "fonts.gstatic.com",
+    "facebook.net",
+    "hotjar.com",
+]
+RESOURCE_BLOCKING_ALLOW_DOMAINS = []
+
+## Readiness waits (world_athletics.readiness): budget per page type before any
+## history exists and bounds of the learned budgets. A wait whose budget runs
+## out while the page still loads goes on until READINESS_NETWORK_QUIET seconds
+## of network silence, READINESS_MAX_TIMEOUT at most
+READINESS_DEFAULT_TIMEOUT = 15
+READINESS_MIN_TIMEOUT = 2
+READINESS_MAX_TIMEOUT = 30
+READINESS_NETWORK_QUIET = 1.0
+
+## Logging goes through a queue to a listener thread (world_athletics.logs),
+## messages below WARNING are rate limited per message template: LOG_RATE_LIMIT
+## per second after a burst of LOG_RATE_BURST, 0 disables the limit
+LOG_RATE_LIMIT = 5
+LOG_RATE_BURST = 20
+
+## Duplicate requests are filtered on canonical URLs (locale prefix and
+## fragment dropped, template URLs never requested), see
+## world_athletics.dupefilter. DUPEFILTER_PERSIST = True keeps the pages
+## fetched in data/seen/<spider> (DUPEFILTER_DIR) and skips them in later
+## runs
+DUPEFILTER_CLASS = "world_athletics.dupefilter.CanonicalDupeFilter"
+URL_LOCALE_PREFIXES = ["en"]
+DUPEFILTER_PERSIST = False
+# DUPEFILTER_DIR = "data/seen"
+
+## Discovery (-a discovery=1 or DISCOVERY_ENABLED): navigation pages are
+## downloaded as plain HTML and only result pages are rendered, see
+## world_athletics.discovery. Sitemaps (or robots.txt) to read result URLs
+## from, rounds probed with HEAD requests when an event page lists none and
+## the result tab of the probed URLs
+DISCOVERY_ENABLED = False
+DISCOVERY_SITEMAP_URLS = []
+# DISCOVERY_SITEMAP_URLS = ["https://worldathletics.org/robots.txt"]
+DISCOVERY_ROUNDS = ["heats", "semi-final", "final"]
+DISCOVERY_RESULT_TAB = "result"
+
+## Result tabs: round pages are requested at their tab URL (.../summary or
+## .../result) and parsed as downloaded when they already show the tab and
+## its table, clicking the tab is the fallback
+DIRECT_TAB_URLS = True
+
+## Frontier journal used to resume a crashed crawl with `-a resume=1`
+## (CHECKPOINT_RESUME = True resumes every run), journal directory defaults to
+## logs/<spider>/checkpoint. Lines are buffered and written every
+## CHECKPOINT_FLUSH_INTERVAL seconds or once CHECKPOINT_BUFFER are waiting
+CHECKPOINT_ENABLED = True
+CHECKPOINT_RESUME = False
+CHECKPOINT_FLUSH_INTERVAL = 5
+CHECKPOINT_BUFFER = 1000
+# CHECKPOINT_DIR = "logs/checkpoint"
+
 LOG_LEVEL = "INFO"
 LOG_ENABLED = True
@@ -0,0 +1,56 @@
+## Render snapshots
+#
+# page.content() serialises the whole DOM across the CDP bridge, multi-MB on
+# result pages. A RenderSnapshot hands callbacks the DOM as a response and
+# serialises it at most once per DOM state:
+#
+# - until the DOM changes, the downloaded response already is the rendered
+#   page (scrapy-playwright serialised it after navigation), nothing is done
+# - after changed() (a click, a wait that brought new content) the next
+#   response() call serialises the page once and later calls reuse it
+#
+# render_snapshot/initial counts snapshots served by the download response,
+# render_snapshot/reused the ones served from an earlier serialisation and
+# render_snapshot/serialized (+ _bytes) the real page.content() calls, whose
+# time goes to the "content" stage timing (see world_athletics.metrics).
+
+from world_athletics.metrics import CONTENT, timed
+
+
+class RenderSnapshot:
+    def __init__(self, page, response, stats=None):
+        self.page = page
+        self.stats = stats
+        self._response = response
+        self._initial = True
+        self._stale = False
+
+    @classmethod
+    def for_spider(cls, spider, page, response):
+        crawler = getattr(spider, "crawler", None)
+        return cls(page, response, stats=getattr(crawler, "stats", None))
+
+    def _inc_stat(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
+
+    def changed(self):
+        """The DOM of the page changed, the next response() serialises it."""
+        if self.page is not None:
+            self._stale = True
+
+    async def response(self):
+        """Response whose body is the current DOM of the page."""
+        if not self._stale:
+            self._inc_stat(
+                "render_snapshot/initial" if self._initial else "render_snapshot/reused"
+            )
+            return self._response
+
+        with timed(self._response, CONTENT):
+            html = await self.page.content()
+        self._response = self._response.replace(body=html)
+        self._initial = self._stale = False
+        self._inc_stat("render_snapshot/serialized")
+        self._inc_stat("render_snapshot/serialized_bytes", len(self._response.body))
+        return self._response
@@ -1,10 +1,73 @@
-from datetime import datetime
 import scrapy
-from datetime import datetime
-import logging
-import logging.config
-import os
-from datetime import datetime
+from scrapy import signals
+from urllib.parse import urlparse
+
+from world_athletics.cache import RowCache, uncached_request
+from world_athletics.discovery import navigation_meta, render_request
+from world_athletics.dupefilter import canonical_url
+from world_athletics.items import OutdoorResultItem
+from world_athletics.logs import log_failed_url, setup_logging
+from world_athletics.metrics import CLICK_WAIT, timed
+from world_athletics.page_pool import managed_page, release_request_page
+from world_athletics.readiness import READY, ReadinessEngine
+from world_athletics.snapshot import RenderSnapshot
+from world_athletics.tables import Column, TableExtractor
+
+
+def championship_from_url(url):
+    """
+    Edition slug of a competition URL, e.g.
+    world-athletics-championships-budapest-2023-7138987 for
+    /competitions/world-athletics-championships/<edition>/timetable/bydiscipline
+    """
+    parts = urlparse(url).path.strip("/").split("/")
+    if "competitions" in parts:
+        i = parts.index("competitions")
+        if len(parts) > i + 2:
+            return parts[i + 2]
+    return url.split("/")[-3]
+
+
+SUMMARY_TABLE = TableExtractor(
+    [
+        Column(name, index=i)
+        for i, name in enumerate(
+            [
+                "position",
+                "rank",
+                "heat",
+                "bib",
+                "country",
+                "athlete",
+                "mark",
+                "details",
+                "reaction_time",
+                "wind",
+            ],
+            start=1,
+        )
+    ],
+    row_path=".//tr",
+)
+
+FINAL_TABLE = TableExtractor(
+    [
+        Column("position", index=1),
+        Column("bib", index=2),
+        Column("country", index=3),
+        Column("athlete", index=4),
+        Column("mark", index=5),
+        Column("reaction_time", index=6),
+    ],
+    row_path=".//tr",
+)
+
+
+RESULT_TABLE_XPATH = '//table[contains(@class,"Table_table__2zsdR")]'
+ACTIVE_TAB_XPATH = (
+    "//div[@role='button'][contains(@class,'ResultsLOC_unitTabActive__1e8HU')]"
+    "[contains(., '{label}')]"
+)
 
 
 class AnchorCollectorSpider(scrapy.Spider):
@@ -15,6 +78,12 @@ class AnchorCollectorSpider(scrapy.Spider):
     ]
 
     output_dir = "results_for_world_athletics_championships"
+    log_dir = "logs"
+
+    row_cache = None
+    readiness = None
+    url_locales = ("en",)
+    direct_tabs = True
 
     run_id: str
     base_log_dir: str
@@ -30,6 +99,7 @@ class AnchorCollectorSpider(scrapy.Spider):
 
     custom_settings = {
         "ITEM_PIPELINES": {
+            "world_athletics.pipelines.CanonicalIndexPipeline": 200,
             "world_athletics.pipelines.AnchorGroupingPipeline": 300,
         },
     }
@@ -37,112 +107,99 @@ class AnchorCollectorSpider(scrapy.Spider):
     @classmethod
     def from_crawler(cls, crawler, *args, **kwargs):
         spider = super().from_crawler(crawler, *args, **kwargs)
+        ## Comma separated start URLs given with -a start_urls=...
+        if isinstance(spider.start_urls, str):
+            spider.start_urls = spider.start_urls.split(",")
 
-        spider.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-        spider.base_log_dir = f"logs/{spider.name}"
-        spider.error_log_dir = f"{spider.base_log_dir}/error_log"
-        spider.info_log_dir = f"{spider.base_log_dir}/info_log"
-        spider.fail_log_dir = f"{spider.base_log_dir}/fail_log"
-        os.makedirs(spider.error_log_dir, exist_ok=True)
-        os.makedirs(spider.info_log_dir, exist_ok=True)
-        os.makedirs(spider.fail_log_dir, exist_ok=True)
-
-        logging.config.dictConfig(
-            {
-                "version": 1,
-                "disable_existing_loggers": False,
-                "formatters": {
-                    "standard": {
-                        "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-                    }
-                },
-                "handlers": {
-                    "info_file": {
-                        "class": "logging.FileHandler",
-                        "filename": f"{spider.info_log_dir}/info_{spider.run_id}.log",
-                        "formatter": "standard",
-                        "level": "INFO",
-                    },
-                    "error_file": {
-                        "class": "logging.FileHandler",
-                        "filename": f"{spider.error_log_dir}/error_{spider.run_id}.log",
-                        "formatter": "standard",
-                        "level": "ERROR",
-                    },
-                    "console": {
-                        "class": "logging.StreamHandler",
-                        "formatter": "standard",
-                        "level": "INFO",
-                    },
-                },
-                "root": {
-                    "handlers": ["console", "info_file", "error_file"],
-                    "level": "INFO",
-                },
-            }
+        setup_logging(spider, crawler)
+        spider.url_locales = tuple(
+            crawler.settings.getlist("URL_LOCALE_PREFIXES", ["en"])
         )
-
-        spider.logger.info("Logging initialized for spider: %s", spider.name)
+        spider.direct_tabs = crawler.settings.getbool("DIRECT_TAB_URLS", True)
+        spider.row_cache = RowCache.from_crawler(crawler)
+        spider.readiness = ReadinessEngine.from_crawler(crawler, spider)
+        crawler.signals.connect(spider.readiness.save, signal=signals.spider_closed)
         return spider
 
-    def errback_log(self, failure):
+    def _inc_stat(self, key):
+        ## Callbacks also run without a crawler (world_athletics.benchmark)
+        crawler = getattr(self, "crawler", None)
+        if crawler is not None:
+            crawler.stats.inc_value(key)
+
+    async def errback_log(self, failure):
         request = failure.request
-        with open(f"{self.fail_log_dir}/failed_urls_{self.run_id}.txt", "a") as f:
-            f.write(request.url + "\n")
+        await release_request_page(self, request)
+        checkpoint = getattr(self, "checkpoint", None)
+        if checkpoint is not None:
+            checkpoint.mark_failed(request)
+        log_failed_url(request.url, self.crawler.stats)
 
         self.logger.error(
-            f"Request failed: {request.url}",
+            "Request failed: %s",
+            request.url,
             exc_info=failure.value,
         )
 
     def start_requests(self):
         # GET request
         for url in self.start_urls:
-            self.championship_name = url.split("/")[-3]
+            ## Every request carries its championship, start URLs of different
+            ## championships can be crawled concurrently
             req = scrapy.Request(
                 url=url,
                 callback=self.parse,
-                meta={"playwright": True, "playwright_include_page": True},
+                errback=self.errback_log,
+                ## Plain HTML first when discovering, see world_athletics.discovery
+                meta=navigation_meta(self),
+                cb_kwargs={"championship": championship_from_url(url)},
             )
             yield req
 
-    async def parse(self, response, **kwargs):
-        page = response.meta["playwright_page"]
-        await page.content()
-        ## Get list of all anchors
-        all_anchors_list = response.xpath("//body//table//tr//a")
-
-        seen = set()
-        # open("anchors_list.txt", "w", encoding="utf-8").write(all_anchors_list)
-        # print(all_anchors_list)
-        ## Iterate through the anchors
-        for anchor in all_anchors_list:
-            href = anchor.xpath("@href").get()
-
-            if not href:
-                continue
-
-            anchor_url = response.urljoin(href)
-
-            if anchor_url in seen:
-                continue
-
-            seen.add(anchor_url)
-            # open("anchors_list.txt", "a", encoding="utf-8").write(anchor_url)
-            # print(anchor_url)
-            yield response.follow(
-                url=anchor_url,
-                callback=self.parse_round,
-                meta={
-                    "playwright": True,
-                    "playwright_include_page": True,
-                    "handle_httpstatus_list": [404],
-                },
-                cb_kwargs={"anchor_id": anchor_url},
-            )
-        await page.close()
+    async def parse(self, response, championship=None, **kwargs):
+        if championship is None:
+            championship = championship_from_url(response.url)
+        async with managed_page(self, response) as page:
+            ## Anchors are in the page as downloaded, no need to serialise it again
+            response = await RenderSnapshot.for_spider(self, page, response).response()
+            ## Get list of all anchors
+            all_anchors_list = response.xpath("//body//table//tr//a")
+
+            seen = set()
+            # open("anchors_list.txt", "w", encoding="utf-8").write(all_anchors_list)
+            # print(all_anchors_list)
+            ## Iterate through the anchors
+            for anchor in all_anchors_list:
+                href = anchor.xpath("@href").get()
+
+                if not href:
+                    continue
+
+                anchor_url = response.urljoin(href)
+
+                ## /en/ and fragment variants are one page, templates none
+                key = canonical_url(anchor_url, self.url_locales)
+                if key is None or key in seen:
+                    continue
+
+                seen.add(key)
+                # open("anchors_list.txt", "a", encoding="utf-8").write(anchor_url)
+                # print(anchor_url)
+                yield response.follow(
+                    url=anchor_url,
+                    callback=self.parse_round,
+                    errback=self.errback_log,
+                    meta=navigation_meta(self, handle_httpstatus_list=[404]),
+                    cb_kwargs={"anchor_id": anchor_url, "championship": championship},
+                )
 
-    async def parse_round(self, response, anchor_id):
+            if not seen and page is None:
+                ## No anchors in the unrendered timetable
+                fallback = render_request(self, response)
+                if fallback is not None:
+                    yield fallback
+
+    async def parse_round(self, response, anchor_id, championship=None):
         """
         Docstring for parse_round
         Prepare event_name,round_name along with result url
@@ -151,38 +208,85 @@ class AnchorCollectorSpider(scrapy.Spider):
         :param response: Description
         """
         if response.status == 404:
-            self.logger.warning(f"404 error for {response.url}")
-        page = response.meta["playwright_page"]
-
-        html = await page.content()
-        # print("Writing to the file")
-        # open("rendered.html", "w", encoding="utf-8").write(html)
+            self.logger.warning("404 error for %s", response.url)
+        async with managed_page(self, response) as page:
+            response = await RenderSnapshot.for_spider(self, page, response).response()
+            # print("Writing to the file")
+            # open("rendered.html", "w", encoding="utf-8").write(html)
+
+            event_name = (
+                response.css('[data-name="timetable-day-title"]')
+                .xpath("h1/text()")
+                .get()
+            )
+            self.logger.info("Event Name :- %s", event_name)
+            # self.event_name = event_name
+
+            if event_name is None and page is None:
+                ## Timetable of the discipline not in the unrendered page
+                fallback = render_request(self, response)
+                if fallback is not None:
+                    yield fallback
+                return
+
+            if event_name is not None:
+                rows_list = response.css('[data-name="timetable-body"]').xpath("//tr")
+                # self.logger.info(f"{rows_list}")
+                # open("round_list.txt", "a", encoding="utf-8").write(rows_list)
+
+                ## Iterate through responses of rows_list
+                for round_response in rows_list[1:]:
+                    round_name = round_response.xpath("./td[1]/span/text()").get()
+                    # self.round_name = round_name
+                    href = round_response.xpath("./td[6]/a/@href").get()
+                    # self.logger.info(href)
+                    round_url_href = response.urljoin(href)
+
+                    self.logger.info("Round Name :- %s", round_name)
+                    # self.logger.info(f"Round URL :- {round_url_href}")
+
+                    yield response.follow(
+                        url=round_url_href,
+                        callback=self.parse_tabs,
+                        errback=self.errback_log,
+                        meta=navigation_meta(self, handle_httpstatus_list=[404]),
+                        cb_kwargs={
+                            "event_name": event_name,
+                            "round_name": round_name,
+                            "anchor_id": anchor_id,
+                            "championship": championship,
+                        },
+                    )
+
+    async def parse_tabs(
+        self, response, event_name, round_name, anchor_id, championship=None
+    ):
+        if response.status == 404:
+            self.logger.warning("404 error for %s", response.url)
 
-        event_name = (
-            response.css('[data-name="timetable-day-title"]').xpath("h1/text()").get()
-        )
-        self.logger.info(f"Event Name :- {event_name}")
-        # self.event_name = event_name
+        async with managed_page(self, response) as page:
+            response = await RenderSnapshot.for_spider(self, page, response).response()
 
-        if event_name is not None:
-            rows_list = response.css('[data-name="timetable-body"]').xpath("//tr")
-            # self.logger.info(f"{rows_list}")
-            # open("round_list.txt", "a", encoding="utf-8").write(rows_list)
+            round_sections = response.xpath("(//section)[1]//ul//li")
+            if not round_sections and page is None:
+                fallback = render_request(self, response)
+                if fallback is not None:
+                    yield fallback
+                return
 
-            ## Iterate through responses of rows_list
-            for round_response in rows_list[1:]:
-                round_name = round_response.xpath("./td[1]/span/text()").get()
-                # self.round_name = round_name
-                href = round_response.xpath("./td[6]/a/@href").get()
-                # self.logger.info(href)
-                round_url_href = response.urljoin(href)
+            for round in round_sections:
+                result_name = round.xpath("./a//text()").get()
+                href = round.xpath("./a/@href").get()
+                result_href = response.urljoin(href)
+                # self.result_name = result_name
 
-                self.logger.info(f"Round Name :- {round_name}")
-                # self.logger.info(f"Round URL :- {round_url_href}")
+                self.logger.info("Extracting for Result name :- %s", result_name)
+                # self.logger.info(f"Result URL : {result_href}")
 
                 yield response.follow(
-                    url=round_url_href,
-                    callback=self.parse_tabs,
+                    url=result_href,
+                    callback=self.parse_results,
+                    errback=self.errback_log,
                     meta={
                         "playwright": True,
                         "playwright_include_page": True,
@@ -191,137 +295,147 @@ class AnchorCollectorSpider(scrapy.Spider):
                     cb_kwargs={
                         "event_name": event_name,
                         "round_name": round_name,
+                        "result_name": result_name,
                         "anchor_id": anchor_id,
+                        "championship": championship,
                     },
                 )
-        await page.close()
-
-    async def parse_tabs(self, response, event_name, round_name, anchor_id):
-        if response.status == 404:
-            self.logger.warning(f"404 error for {response.url}")
-
-        page = response.meta["playwright_page"]
-
-        html = await page.content()
-
-        round_sections = response.xpath("(//section)[1]//ul//li")
-        for round in round_sections:
-            result_name = round.xpath("./a//text()").get()
-            href = round.xpath("./a/@href").get()
-            result_href = response.urljoin(href)
-            # self.result_name = result_name
-
-            self.logger.info(f"Extracting for Result name :- {result_name}")
-            # self.logger.info(f"Result URL : {result_href}")
-
-            yield response.follow(
-                url=result_href,
-                callback=self.parse_results,
-                meta={
-                    "playwright": True,
-                    "playwright_include_page": True,
-                    "handle_httpstatus_list": [404],
-                },
-                cb_kwargs={
-                    "event_name": event_name,
-                    "round_name": round_name,
-                    "result_name": result_name,
-                    "anchor_id": anchor_id,
-                },
-            )
-        await page.close()
 
     async def parse_results(
-        self, response, result_name, event_name, round_name, anchor_id
+        self,
+        response,
+        result_name,
+        event_name,
+        round_name,
+        anchor_id,
+        championship=None,
     ):
+        if championship is None:
+            championship = championship_from_url(response.url)
         if response.status == 404:
-            self.logger.warning(f"404 error for {response.url}")
-
-        page = response.meta["playwright_page"]
-
-        html = await page.content()
+            self.logger.warning("404 error for %s", response.url)
+
+        async with managed_page(self, response) as page:
+            if self.row_cache is not None:
+                rows = self.row_cache.get(self, response)
+                if rows is not None:
+                    for row in rows:
+                        yield OutdoorResultItem(**row)
+                    return
+
+            if page is None:
+                ## Cached page but no cached rows, the tab has to be clicked
+                yield uncached_request(response)
+                return
+
+            rows = []
+            async for row in self._extract_results(
+                page,
+                response,
+                result_name,
+                event_name,
+                round_name,
+                anchor_id,
+                championship,
+            ):
+                rows.append(row)
+                yield row
+
+            if rows and self.row_cache is not None:
+                self.row_cache.set(self, response, rows)
+
+    async def _extract_results(
+        self,
+        page,
+        response,
+        result_name,
+        event_name,
+        round_name,
+        anchor_id,
+        championship,
+    ):
+        snapshot = RenderSnapshot.for_spider(self, page, response)
 
         if result_name.lower().strip() != "final":
-            self.logger.info(f"Clicking on the Summary Section for {result_name}")
-            await page.click("div[role='button']:has-text('Summary')")
-            await page.wait_for_selector(
-                "div[role='button']:has-text('Summary').ResultsLOC_unitTabActive__1e8HU"
+            response = await self._show_tab(
+                page, response, snapshot, "Summary", "anchor.summary", result_name
             )
-            html = await page.content()
-            sel = scrapy.Selector(text=html)
-            rows = sel.xpath('//table[contains(@class,"Table_table__2zsdR")]//tr')
-
-            # self.logger.info(f"Rows Section :- {rows}")
-
-            for row in rows:
-                position = row.xpath("./td[1]//text()").get()
-                rank = row.xpath("./td[2]//text()").get()
-                heat = row.xpath("./td[3]//text()").get()
-                bib = row.xpath("./td[4]//text()").get()
-                country = row.xpath("./td[5]//text()").get()
-                athlete = row.xpath("./td[6]//text()").get()
-                mark = row.xpath("./td[7]//text()").get()
-                details = row.xpath("./td[8]//text()").get()
-                reaction_time = row.xpath("./td[9]//text()").get()
-                wind = row.xpath("./td[10]//text()").get()
-
-                yield {
-                    "anchor_id": anchor_id,
-                    "championship": self.championship_name,
-                    "event_name": event_name,
-                    "round_name": round_name,
-                    "result_name": result_name,
-                    "position": position,
-                    "rank": rank,
-                    "heat": heat,
-                    "bib": bib,
-                    "country": country,
-                    "athlete": athlete,
-                    "mark": mark,
-                    "details": details,
-                    "reaction_time": reaction_time,
-                    "wind": wind,
-                }
+            if response is None:
+                return
+            tables = response.xpath(RESULT_TABLE_XPATH)
+
+            for table in tables:
+                for row in SUMMARY_TABLE.rows(table):
+                    yield OutdoorResultItem(
+                        anchor_id=anchor_id,
+                        championship=championship,
+                        event_name=event_name,
+                        round_name=round_name,
+                        result_name=result_name,
+                        **row,
+                    )
 
         if result_name.lower().strip() == "final":
-            self.logger.info(f"Clicking on the Final Section for {result_name}")
-            await page.click("div[role='button']:has-text('Final')")
-            await page.wait_for_selector(
-                "div[role='button']:has-text('Final').ResultsLOC_unitTabActive__1e8HU"
+            response = await self._show_tab(
+                page, response, snapshot, "Final", "anchor.final", result_name
+            )
+            if response is None:
+                return
+            tables = response.xpath(RESULT_TABLE_XPATH)
+
+            for table in tables:
+                for row in FINAL_TABLE.rows(table):
+                    yield OutdoorResultItem(
+                        anchor_id=anchor_id,
+                        championship=championship,
+                        event_name=event_name,
+                        round_name=round_name,
+                        result_name=result_name,
+                        position=row["position"],
+                        rank="",
+                        heat="",
+                        bib=row["bib"],
+                        country=row["country"],
+                        athlete=row["athlete"],
+                        mark=row["mark"],
+                        details="",
+                        reaction_time=row["reaction_time"],
+                        wind="",
+                    )
+
+    async def _show_tab(self, page, response, snapshot, label, page_type, result_name):
+        """
+        Response showing the Summary / Final tab: the downloaded page when it
+        already shows the tab and its table, else the page after clicking the
+        tab. None when the tab could not be activated.
+        """
+        if (
+            self.direct_tabs
+            and response.xpath(ACTIVE_TAB_XPATH.format(label=label))
+            and response.xpath(RESULT_TABLE_XPATH)
+        ):
+            self._inc_stat("tab_switch/direct")
+            return response
+
+        ## The tabs are buttons without a URL, click the tab
+        readiness = self.readiness or ReadinessEngine()
+        self.logger.info("Clicking on the %s Section for %s", label, result_name)
+        button = f"div[role='button']:has-text('{label}')"
+        with timed(response, CLICK_WAIT):
+            ## The click runs inside the wait so the requests it starts are seen
+            outcome = await readiness.wait(
+                page,
+                page_type,
+                f"{button}.ResultsLOC_unitTabActive__1e8HU",
+                action=lambda: page.click(button),
+            )
+        if outcome != READY:
+            ## The tab never showed, a later run retries the page
+            self.logger.warning(
+                "%s tab not activated on %s (%s)", label, response.url, outcome
             )
-            html = await page.content()
-            sel = scrapy.Selector(text=html)
-            rows = sel.xpath('//table[contains(@class,"Table_table__2zsdR")]//tr')
-
-            # self.logger.info(f"Rows Section :- {rows}")
-
-            for row in rows:
-                position = row.xpath("./td[1]//text()").get()
-                # rank = row.xpath("./td[2]//text()").get()
-                # heat = row.xpath("./td[3]//text()").get()
-                bib = row.xpath("./td[2]//text()").get()
-                country = row.xpath("./td[3]//text()").get()
-                athlete = row.xpath("./td[4]//text()").get()
-                mark = row.xpath("./td[5]//text()").get()
-                # details = row.xpath("./td[8]//text()").get()
-                reaction_time = row.xpath("./td[6]//text()").get()
-                # wind = row.xpath("./td[10]//text()").get()
-
-                yield {
-                    "anchor_id": anchor_id,
-                    "championship": self.championship_name,
-                    "event_name": event_name,
-                    "round_name": round_name,
-                    "result_name": result_name,
-                    "position": position,
-                    "rank": "",
-                    "heat": "",
-                    "bib": bib,
-                    "country": country,
-                    "athlete": athlete,
-                    "mark": mark,
-                    "details": "",
-                    "reaction_time": reaction_time,
-                    "wind": "",
-                }
-        await page.close()
+            log_failed_url(response.url, self.crawler.stats)
+            return None
+        self._inc_stat("tab_switch/click")
+        snapshot.changed()
+        return await snapshot.response()
@@ -1,9 +1,22 @@
-from itertools import count
 import scrapy
-from datetime import datetime
-import os
-import logging
-import logging.config
+
+from world_athletics.download_modes import HTTP, build_meta, get_download_mode
+from world_athletics.items import AsianResultItem
+from world_athletics.logs import setup_logging
+from world_athletics.normalize import normalize_results
+from world_athletics.page_pool import managed_page
+from world_athletics.snapshot import RenderSnapshot
+from world_athletics.tables import Column, TableExtractor
+
+RESULT_TABLE = TableExtractor(
+    [
+        Column("position", index=1),
+        Column("name", index=3),
+        Column("country", index=4),
+        Column("mark", index=7),
+    ],
+    row_path=".//tbody//tr",
+)
 
 
 class AsianAthleticsSpider(scrapy.Spider):
@@ -12,6 +25,10 @@ class AsianAthleticsSpider(scrapy.Spider):
     start_urls = ["https://asianathletics.com/26th-asian-event-wise-result/"]
 
     output_dir = "results_for_asian_athletics"
+    log_dir = "logs"
+
+    ## Result page is server rendered, no browser needed unless asked for
+    download_mode = HTTP
 
     run_id: str
     base_log_dir: str
@@ -22,6 +39,7 @@ class AsianAthleticsSpider(scrapy.Spider):
     custom_settings = {
         "ITEM_PIPELINES": {
             # "world_athletics.pipelines.WorldAthleteIndoorAnchorPipeline": 100,
+            "world_athletics.pipelines.CanonicalIndexPipeline": 200,
             # "world_athletics.pipelines.WorldAthleteIndoorResultPipeline": 300,
         }
     }
@@ -29,86 +47,54 @@ class AsianAthleticsSpider(scrapy.Spider):
     @classmethod
     def from_crawler(cls, crawler, *args, **kwargs):
         spider = super().from_crawler(crawler, *args, **kwargs)
+        ## Comma separated start URLs given with -a start_urls=...
+        if isinstance(spider.start_urls, str):
+            spider.start_urls = spider.start_urls.split(",")
 
-        spider.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-        spider.base_log_dir = f"logs/{spider.name}"
-        spider.error_log_dir = f"{spider.base_log_dir}/error_log"
-        spider.info_log_dir = f"{spider.base_log_dir}/info_log"
-        spider.fail_log_dir = f"{spider.base_log_dir}/fail_log"
-        os.makedirs(spider.error_log_dir, exist_ok=True)
-        os.makedirs(spider.info_log_dir, exist_ok=True)
-        os.makedirs(spider.fail_log_dir, exist_ok=True)
-
-        logging.config.dictConfig(
-            {
-                "version": 1,
-                "disable_existing_loggers": False,
-                "formatters": {
-                    "standard": {
-                        "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-                    }
-                },
-                "handlers": {
-                    "info_file": {
-                        "class": "logging.FileHandler",
-                        "filename": f"{spider.info_log_dir}/info_{spider.run_id}.log",
-                        "formatter": "standard",
-                        "level": "INFO",
-                    },
-                    "error_file": {
-                        "class": "logging.FileHandler",
-                        "filename": f"{spider.error_log_dir}/error_{spider.run_id}.log",
-                        "formatter": "standard",
-                        "level": "ERROR",
-                    },
-                    "console": {
-                        "class": "logging.StreamHandler",
-                        "formatter": "standard",
-                        "level": "INFO",
-                    },
-                },
-                "root": {
-                    "handlers": ["console", "info_file", "error_file"],
-                    "level": "INFO",
-                },
-            }
-        )
-
-        spider.logger.info("Logging initialized for spider: %s", spider.name)
+        setup_logging(spider, crawler)
         return spider
 
     def start_requests(self):
+        mode = get_download_mode(self, default=HTTP)
         for url in self.start_urls:
             yield scrapy.Request(
                 url,
-                meta={
-                    "playwright": True,
-                    "playwright_include_page": True,
-                },
+                meta=build_meta(mode),
                 callback=self.parse,
             )
 
     async def parse(self, response):
-        page = response.meta["playwright_page"]
-        html = await page.content()
-        response = response.replace(body=html)
+        async with managed_page(self, response) as page:
+            if page is not None:
+                ## The downloaded response already is the rendered page
+                response = await RenderSnapshot.for_spider(
+                    self, page, response
+                ).response()
 
         all_result_divs = response.xpath("//div[contains(@id,'result')]")
 
         for div in all_result_divs:
             h5_element = div.xpath("(./h5)[1]//text()").get()
 
-            all_rows = div.xpath(".//table//tbody//tr")
-            for row in all_rows:
-                pos = row.xpath("./td[1]//text()").get()
-                athlete = row.xpath("./td[3]//text()").get()
-                country = row.xpath("./td[4]//text()").get()
-                mark = row.xpath("./td[7]//text()").get()
-
-                yield {
-                    "event_details": h5_element,
-                    "position": pos,
-                    "name": athlete,
-                    "country": country,
-                    "mark": mark,
-                }
+            for table in div.xpath(".//table"):
+                columns = RESULT_TABLE.extract(table)
+                numeric = normalize_results(columns)
+                for position, name, country, mark, wind, records, status in zip(
+                    columns["position"],
+                    columns["name"],
+                    columns["country"],
+                    columns["mark"],
+                    numeric["wind_value"],
+                    numeric["records"],
+                    numeric["status"],
+                ):
+                    yield AsianResultItem(
+                        event_details=h5_element,
+                        position=position,
+                        name=name,
+                        country=country,
+                        mark=mark,
+                        wind=wind,
+                        records=records,
+                        status=status,
+                    )
@@ -1,11 +1,52 @@
-from socket import timeout
 import scrapy
-from scrapy_playwright.page import PageMethod
-from datetime import datetime
-import logging
-import logging.config
-import os
-from datetime import datetime
+from scrapy import signals
+
+from world_athletics.cache import RowCache, uncached_request
+from world_athletics.discovery import (
+    RoundProber,
+    event_url,
+    is_discovering,
+    navigation_meta,
+    parse_result_path,
+    render_request,
+    result_links,
+    round_title,
+    sitemap_locations,
+    tab_url,
+    url_tab,
+)
+from world_athletics.download_modes import HTTP, PLAYWRIGHT, build_meta
+from world_athletics.items import AnchorItem, IndoorResultItem
+from world_athletics.logs import log_failed_url, setup_logging
+from world_athletics.metrics import CLICK_WAIT, timed
+from world_athletics.page_pool import managed_page, release_request_page
+from world_athletics.readiness import READY, ReadinessEngine
+from world_athletics.snapshot import RenderSnapshot
+from world_athletics.tables import JOINED, VALUE, Column, TableExtractor
+
+EVENTS_LINK = "a[data-bind*='showevents']"
+EVENT_ROWS = "div.modal-dialog tr.eventdetailslanding a"
+
+RESULT_TABLE = TableExtractor(
+    [
+        Column("position", header="POS", path="text()"),
+        Column("rank", header="Rank", path="text()"),
+        Column("heat", header="Heat", path="text()"),
+        Column(
+            "athlete",
+            header="athlete",
+            path="normalize-space(string(.//a))",
+            mode=VALUE,
+            default="",
+        ),
+        Column("country", header="COUNTRY", mode=JOINED, default=""),
+        Column(
+            "mark", header="RESULTS", path=".//span/text()", mode=JOINED, default=""
+        ),
+    ],
+    row_path="./tbody/tr",
+    header_attr="data-th",
+)
 
 
 class WorldAthleteIndoorSpider(scrapy.Spider):
@@ -18,6 +59,12 @@ class WorldAthleteIndoorSpider(scrapy.Spider):
     ]
 
     output_dir = "results_for_world_athletics_indoor_championships"
+    log_dir = "logs"
+
+    row_cache = None
+    readiness = None
+    round_prober = None
+    direct_tabs = True
 
     run_id: str
     base_log_dir: str
@@ -28,6 +75,7 @@ class WorldAthleteIndoorSpider(scrapy.Spider):
     custom_settings = {
         "ITEM_PIPELINES": {
             "world_athletics.pipelines.WorldAthleteIndoorAnchorPipeline": 100,
+            "world_athletics.pipelines.CanonicalIndexPipeline": 200,
             "world_athletics.pipelines.WorldAthleteIndoorResultPipeline": 300,
         }
     }
@@ -35,71 +83,47 @@ class WorldAthleteIndoorSpider(scrapy.Spider):
     @classmethod
     def from_crawler(cls, crawler, *args, **kwargs):
         spider = super().from_crawler(crawler, *args, **kwargs)
-
-        spider.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-        spider.base_log_dir = f"logs/{spider.name}"
-        spider.error_log_dir = f"{spider.base_log_dir}/error_log"
-        spider.info_log_dir = f"{spider.base_log_dir}/info_log"
-        spider.fail_log_dir = f"{spider.base_log_dir}/fail_log"
-        os.makedirs(spider.error_log_dir, exist_ok=True)
-        os.makedirs(spider.info_log_dir, exist_ok=True)
-        os.makedirs(spider.fail_log_dir, exist_ok=True)
-
-        logging.config.dictConfig(
-            {
-                "version": 1,
-                "disable_existing_loggers": False,
-                "formatters": {
-                    "standard": {
-                        "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-                    }
-                },
-                "handlers": {
-                    "info_file": {
-                        "class": "logging.FileHandler",
-                        "filename": f"{spider.info_log_dir}/info_{spider.run_id}.log",
-                        "formatter": "standard",
-                        "level": "INFO",
-                    },
-                    "error_file": {
-                        "class": "logging.FileHandler",
-                        "filename": f"{spider.error_log_dir}/error_{spider.run_id}.log",
-                        "formatter": "standard",
-                        "level": "ERROR",
-                    },
-                    "console": {
-                        "class": "logging.StreamHandler",
-                        "formatter": "standard",
-                        "level": "INFO",
-                    },
-                },
-                "root": {
-                    "handlers": ["console", "info_file", "error_file"],
-                    "level": "INFO",
-                },
-            }
-        )
-
-        spider.logger.info("Logging initialized for spider: %s", spider.name)
+        ## Comma separated start URLs given with -a start_urls=...
+        if isinstance(spider.start_urls, str):
+            spider.start_urls = spider.start_urls.split(",")
+
+        setup_logging(spider, crawler)
+        spider.row_cache = RowCache.from_crawler(crawler)
+        spider.readiness = ReadinessEngine.from_crawler(crawler, spider)
+        crawler.signals.connect(spider.readiness.save, signal=signals.spider_closed)
+        spider.round_prober = RoundProber.from_settings(crawler.settings)
+        spider.direct_tabs = crawler.settings.getbool("DIRECT_TAB_URLS", True)
         return spider
 
-    def errback_log(self, failure):
+    def _inc_stat(self, key):
+        ## Callbacks also run without a crawler (world_athletics.benchmark)
+        crawler = getattr(self, "crawler", None)
+        if crawler is not None:
+            crawler.stats.inc_value(key)
+
+    async def errback_log(self, failure):
         request = failure.request
-        with open(f"{self.fail_log_dir}/failed_urls_{self.run_id}.txt", "a") as f:
-            f.write(request.url + "\n")
+        await release_request_page(self, request)
+        checkpoint = getattr(self, "checkpoint", None)
+        if checkpoint is not None:
+            checkpoint.mark_failed(request)
+        log_failed_url(request.url, self.crawler.stats)
 
         self.logger.error(
-            f"Request failed: {request.url}",
+            "Request failed: %s",
+            request.url,
             exc_info=failure.value,
         )
 
     def start_requests(self):
         for url in self.start_urls:
+            ## Plain HTML first when discovering, see world_athletics.discovery
             yield scrapy.Request(
                 url,
-                meta={
-                    "playwright": True,
-                    "playwright_include_page": True,
+                meta=navigation_meta(
+                    self,
+                    playwright=True,
+                    playwright_include_page=True,
                     # "playwright_page_goto_kwargs": {
                     #     "wait_until": "domcontentloaded",
                     #     "timeout": 45000,
@@ -108,98 +132,246 @@ class WorldAthleteIndoorSpider(scrapy.Spider):
                     #     "wait_until": "domcontentloaded",
                     #     "timeout": 45000,
                     # },
-                    "playwright_page_methods": [
-                        # PageMethod("wait_for_timeout", 50000),
-                        PageMethod(
-                            "wait_for_selector",
-                            "a[data-bind*='showevents']",
-                            state="visible",
-                        ),
-                        PageMethod("click", "a[data-bind*='showevents']"),
-                        # PageMethod("wait_for_timeout", 50000),
-                    ],
-                },
+                    ## The events modal is opened in parse_anchors
+                    # "playwright_page_methods": [
+                    #     PageMethod(
+                    #         "wait_for_selector",
+                    #         "a[data-bind*='showevents']",
+                    #         state="visible",
+                    #     ),
+                    #     PageMethod("click", "a[data-bind*='showevents']"),
+                    # ],
+                ),
                 callback=self.parse_anchors,
+                errback=self.errback_log,
                 cb_kwargs={"anchor_id": url},
             )
 
-    async def parse_anchors(self, response, anchor_id):
-        self.logger.info(f"Parsing URL: {response}")
-
-        page = response.meta["playwright_page"]
-
-        html = await page.content()
-
-        response = response.replace(body=html)
-
-        anchors = response.xpath(
-            "//div[contains(@class,'modal-dialog')]//tr[contains(@class,'eventdetailslanding')]//a"
-        )
-        self.logger.info(f"Found {len(anchors)} anchors on the page.")
-        for anchor in anchors:
-            anchor_text = anchor.xpath("normalize-space(.)").get()
-            anchor_link = response.urljoin(anchor.xpath("@href").get())
-            yield {
-                "anchor_id": anchor_id,
-                "anchor_text": anchor_text,
-                "anchor_link": anchor_link,
-            }
+        if not is_discovering(self):
+            return
+        for url in self.settings.getlist("DISCOVERY_SITEMAP_URLS"):
+            yield scrapy.Request(
+                url,
+                meta=build_meta(HTTP),
+                callback=self.discover_sitemap,
+                errback=self.errback_log,
+            )
 
-            yield response.follow(
-                url=anchor_link,
+    def discover_sitemap(self, response):
+        """Event pages of the crawled competitions listed in a sitemap."""
+        slugs = {
+            parts["slug"]
+            for parts in map(parse_result_path, self.start_urls)
+            if parts is not None
+        }
+        for is_sitemap, url in sitemap_locations(response):
+            if is_sitemap:
+                yield scrapy.Request(
+                    url,
+                    meta=build_meta(HTTP),
+                    callback=self.discover_sitemap,
+                    errback=self.errback_log,
+                )
+                continue
+            parts = parse_result_path(url)
+            if parts is None or (slugs and parts["slug"] not in slugs):
+                continue
+            self._inc_stat("discovery/sitemap_urls")
+            yield scrapy.Request(
+                event_url(url),
                 callback=self.parse_competition_rounds,
                 errback=self.errback_log,
-                meta={
-                    "playwright": True,
-                    "playwright_include_page": True,
-                    # "playwright_page_methods": [],
-                    "handle_httpstatus_list": [404],
-                },
-                cb_kwargs={"anchor_id": anchor_id},
+                meta=build_meta(HTTP, handle_httpstatus_list=[404]),
+                cb_kwargs={"anchor_id": url},
             )
-        await page.close()
+
+    async def parse_anchors(self, response, anchor_id):
+        self.logger.info("Parsing URL: %s", response)
+
+        async with managed_page(self, response) as page:
+            if (
+                page is None
+                and "cached" in response.flags
+                and response.meta.get("playwright")
+            ):
+                ## The cached landing page was saved before the modal opened
+                yield uncached_request(response)
+                return
+
+            snapshot = RenderSnapshot.for_spider(self, page, response)
+            if page is not None:
+                with timed(response, CLICK_WAIT):
+                    await self._open_events_modal(page, response)
+                snapshot.changed()
+            response = await snapshot.response()
+
+            anchors = response.xpath(
+                "//div[contains(@class,'modal-dialog')]//tr[contains(@class,'eventdetailslanding')]//a"
+            )
+            links = [
+                (
+                    anchor.xpath("normalize-space(.)").get(),
+                    response.urljoin(anchor.xpath("@href").get()),
+                )
+                for anchor in anchors
+            ]
+            if not links and page is None:
+                ## Unrendered page: event links from its source, one link is
+                ## only the page itself, render it to open the events modal
+                events = dict.fromkeys(map(event_url, result_links(response)))
+                events.pop(None, None)
+                if len(events) <= 1:
+                    fallback = render_request(self, response)
+                    if fallback is not None:
+                        yield fallback
+                    return
+                links = [(None, event) for event in events]
+
+            self.logger.info("Found %d anchors on the page.", len(links))
+            for anchor_text, anchor_link in links:
+                yield AnchorItem(
+                    anchor_id=anchor_id,
+                    anchor_text=anchor_text,
+                    anchor_link=anchor_link,
+                )
+
+                yield response.follow(
+                    url=anchor_link,
+                    callback=self.parse_competition_rounds,
+                    errback=self.errback_log,
+                    meta=navigation_meta(
+                        self,
+                        # "playwright_page_methods": [],
+                        handle_httpstatus_list=[404],
+                    ),
+                    cb_kwargs={"anchor_id": anchor_id},
+                )
+
+    async def _open_events_modal(self, page, response):
+        readiness = self.readiness or ReadinessEngine()
+        outcome = await readiness.wait(
+            page, "indoor.landing", EVENTS_LINK, network_idle=False
+        )
+        if outcome != READY:
+            self.logger.warning(
+                "Events link not found on %s (%s)", response.url, outcome
+            )
+            return
+        outcome = await readiness.wait(
+            page, "indoor.events", EVENT_ROWS, action=lambda: page.click(EVENTS_LINK)
+        )
+        if outcome != READY:
+            self._not_ready(response, "Event list", outcome)
 
     async def parse_competition_rounds(self, response, anchor_id):
         # self.logger.info("Inside parsing competition rounds")
         if response.status == 404:
-            self.logger.warning(f"404 error for {response.url}")
+            self.logger.warning("404 error for %s", response.url)
 
-        page = response.meta["playwright_page"]
+        async with managed_page(self, response) as page:
+            response = await RenderSnapshot.for_spider(self, page, response).response()
 
-        html = await page.content()
-
-        competition_name = response.xpath(
-            "normalize-space((//div[contains(@class,'col-sm-6')])[1]//h3/a/text())"
-        ).get()
-        competition_description_all = (
-            response.xpath(
-                "(//div[contains(@class,'col-sm-6') and contains(@class,'col-md-6')])[1]"
+            competition_name = response.xpath(
+                "normalize-space((//div[contains(@class,'col-sm-6')])[1]//h3/a/text())"
+            ).get()
+            competition_description_all = (
+                response.xpath(
+                    "(//div[contains(@class,'col-sm-6') and contains(@class,'col-md-6')])[1]"
+                )
+                .xpath("./span/text()")
+                .getall()
+            )
+            competition_description = " ".join(
+                t.strip() for t in competition_description_all if t.strip()
             )
-            .xpath("./span/text()")
-            .getall()
-        )
-        competition_description = " ".join(
-            t.strip() for t in competition_description_all if t.strip()
-        )
 
-        # self.logger.info(competition_description)
+            # self.logger.info(competition_description)
 
-        event_name = response.xpath(
-            "normalize-space(((//div[contains(@class,'col-sm-6')])[1]//h1)[1]/text())"
-        ).get()
+            event_name = response.xpath(
+                "normalize-space(((//div[contains(@class,'col-sm-6')])[1]//h1)[1]/text())"
+            ).get()
 
-        round_links = response.xpath(
-            "//ul[contains(@class,'nav nav-tabs nav-results offset-above')]//li"
+            round_links = response.xpath(
+                "//ul[contains(@class,'nav nav-tabs nav-results offset-above')]//li"
+            )
+            names = {
+                "competition_name": competition_name,
+                "competition_description": competition_description,
+                "event_name": event_name,
+                "anchor_id": anchor_id,
+            }
+            if not round_links and page is None:
+                for request in self._discover_rounds(response, names):
+                    yield request
+                return
+
+            for li in round_links:
+                round_name = li.xpath("normalize-space(a/text())").get()
+                href = li.xpath("a/@href").get()
+                if not href:
+                    continue
+                url = self._results_url(response.urljoin(href), round_name)
+                yield response.follow(
+                    url=url,
+                    callback=self.parse_rounds,
+                    errback=self.errback_log,
+                    meta={
+                        "playwright": True,
+                        "playwright_include_page": True,
+                        "handle_httpstatus_list": [404],
+                    },
+                    cb_kwargs={
+                        "competition_name": competition_name,
+                        "competition_description": competition_description,
+                        "event_name": event_name,
+                        "round_name": round_name,
+                        "anchor_id": anchor_id,
+                    },
+                )
+
+    def _discover_rounds(self, response, names):
+        ## Round tabs missing from the unrendered event page: probe the round
+        ## URLs of the pattern, render the page if that is not possible
+        event = event_url(response.url)
+        if event is not None and self.round_prober.rounds:
+            yield from self.round_prober.requests(
+                self, event, self.probe_round, self.errback_probe, names
+            )
+            return
+        fallback = render_request(self, response)
+        if fallback is not None:
+            yield fallback
+
+    def _render_event(self, request, anchor_id):
+        return scrapy.Request(
+            request.meta["discovery_event"],
+            callback=self.parse_competition_rounds,
+            errback=self.errback_log,
+            meta=build_meta(
+                PLAYWRIGHT, handle_httpstatus_list=[404], discovery_rendered=True
+            ),
+            cb_kwargs={"anchor_id": anchor_id},
+            dont_filter=True,
         )
 
-        for li in round_links:
-            round_name = li.xpath("normalize-space(a/text())").get()
-            href = li.xpath("a/@href").get()
-            if not href:
-                continue
-            url = response.urljoin(href)
-            yield response.follow(
-                url=url,
+    def probe_round(
+        self,
+        response,
+        competition_name,
+        competition_description,
+        event_name,
+        anchor_id,
+    ):
+        request = response.request
+        if response.status == 405 and request.method == "HEAD":
+            yield request.replace(method="GET", dont_filter=True)
+            return
+
+        found = self.round_prober.found(response)
+        if found:
+            round_name = round_title(request.meta["discovery_round"])
+            yield scrapy.Request(
+                self._results_url(request.url, round_name),
                 callback=self.parse_rounds,
                 errback=self.errback_log,
                 meta={
@@ -215,7 +387,14 @@ class WorldAthleteIndoorSpider(scrapy.Spider):
                     "anchor_id": anchor_id,
                 },
             )
-        await page.close()
+        if self.round_prober.finished(self, request, found):
+            yield self._render_event(request, anchor_id)
+
+    def errback_probe(self, failure):
+        request = failure.request
+        self.logger.debug("Round probe failed: %s (%s)", request.url, failure.value)
+        if self.round_prober.finished(self, request, False):
+            yield self._render_event(request, request.cb_kwargs["anchor_id"])
 
     async def parse_rounds(
         self,
@@ -227,198 +406,131 @@ class WorldAthleteIndoorSpider(scrapy.Spider):
         competition_description,
     ):
         if response.status == 404:
-            self.logger.warning(f"404 error for {response.url}")
-        page = response.meta["playwright_page"]
-
-        await page.content()
+            self.logger.warning("404 error for %s", response.url)
+        async with managed_page(self, response) as page:
+            if self.row_cache is not None:
+                rows = self.row_cache.get(self, response)
+                if rows is not None:
+                    for row in rows:
+                        yield IndoorResultItem(**row)
+                    return
+
+            if page is None:
+                ## Cached page but no cached rows, the tab has to be clicked
+                yield uncached_request(response)
+                return
+
+            rows = []
+            async for row in self._extract_rounds(
+                page,
+                response,
+                round_name,
+                competition_name,
+                event_name,
+                anchor_id,
+                competition_description,
+            ):
+                rows.append(row)
+                yield row
+
+            if rows and self.row_cache is not None:
+                self.row_cache.set(self, response, rows)
+
+    @staticmethod
+    def _tab_name(round_name):
+        return "Result" if round_name.lower().strip() == "final" else "Summary"
+
+    def _results_url(self, url, round_name):
+        """URL of the round's results tab, so no tab has to be clicked."""
+        if not self.direct_tabs:
+            return url
+        return tab_url(url, self._tab_name(round_name).lower()) or url
+
+    def _on_results_tab(self, response, round_name):
+        return self.direct_tabs and url_tab(response.url) == (
+            self._tab_name(round_name).lower()
+        )
 
-        try:
-            await page.wait_for_selector("div.res-nav-container", timeout=15000)
-        except Exception as e:
-            self.logger.warning(
-                "Navigation container not found on %s: %s", response.url, e
+    def _not_ready(self, response, what, outcome):
+        ## The page never showed what was expected, a later run retries it
+        self.logger.warning("%s not found on %s (%s)", what, response.url, outcome)
+        log_failed_url(response.url, self.crawler.stats)
+
+    async def _open_results_tab(self, page, response, round_name):
+        """Activate the Summary / Result tab and wait for its table."""
+        readiness = self.readiness or ReadinessEngine()
+        if self._on_results_tab(response, round_name):
+            ## Navigated straight to the tab, only its table may still render
+            outcome = await readiness.wait(
+                page, "indoor.results", "table.records-table"
             )
-            return
+            if outcome == READY:
+                self._inc_stat("tab_switch/direct_wait")
+                return True
+
+        outcome = await readiness.wait(page, "indoor.nav", "div.res-nav-container")
+        if outcome != READY:
+            self._not_ready(response, "Navigation container", outcome)
+            return False
         nav = page.locator("div.res-nav-container")
 
-        tab_name = "Result" if round_name.lower().strip() == "final" else "Summary"
+        tab_name = self._tab_name(round_name)
         tab_li = nav.locator("li", has_text=tab_name)
 
         if await tab_li.count() == 0:
             self.logger.warning("%s tab not found on %s", tab_name, response.url)
-            return
+            return False
 
+        click = None
         is_active = await tab_li.evaluate("el => el.classList.contains('active')")
         if not is_active:
-            await tab_li.locator("a").click()
-
-        await page.content()
-
-        try:
-            await page.wait_for_selector("table.records-table", timeout=15000)
-        except Exception as e:
-            self.logger.warning("Results table not found on %s: %s", response.url, e)
-            return
-
-        html = await page.content()
-        response = response.replace(body=html)
-
-        rows = response.xpath("//table[contains(@class,'records-table')]/tbody/tr")
-
-        for row in rows:
-            pos = row.xpath('./td[@data-th="POS"]/text()').get()
-            rank = row.xpath('./td[@data-th="Rank"]/text()').get()
-            heat = row.xpath('./td[@data-th="Heat"]/text()').get()
-
-            athlete_name = row.xpath(
-                "normalize-space(string(.//td[translate(@data-th,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz')='athlete']//a))"
-            ).get()
-
-            country = " ".join(
-                t.strip()
-                for t in row.xpath('./td[@data-th="COUNTRY"]//text()').getall()
-                if t.strip()
-            )
+            click = tab_li.locator("a").click
+            self._inc_stat("tab_switch/click")
+
+        ## The click runs inside the wait so the requests it starts are seen
+        outcome = await readiness.wait(
+            page,
+            "indoor.results",
+            "table.records-table",
+            action=click,
+        )
+        if outcome != READY:
+            self._not_ready(response, "Results table", outcome)
+            return False
 
-            mark = " ".join(
-                t.strip()
-                for t in row.xpath(".//td[@data-th='RESULTS']//span/text()").getall()
-                if t.strip()
-            )
+        return True
 
-            yield {
-                "anchor_id": anchor_id,
-                "competition_name": competition_name,
-                "competition_description": competition_description,
-                "event_name": event_name,
-                "round_name": round_name,
-                "position": pos,
-                "rank": rank,
-                "heat": heat,
-                "athlete": athlete_name,
-                "country": country,
-                "mark": mark,
-            }
-
-        await page.close()
-
-        # if round_name.lower().strip() != "final":
-        #     # await page.wait_for_load_state("networkidle")
-        #     nav = page.locator("div.res-nav-container")
-
-        #     summary_li = nav.locator("li", has_text="Summary")
-
-        #     if await summary_li.count() == 0:
-        #         self.logger.warning("Summary tab not found on %s", response.url)
-        #         return
-
-        #     is_active = await summary_li.evaluate(
-        #         "el => el.classList.contains('active')"
-        #     )
-
-        #     if not is_active:
-        #         await summary_li.locator("a").click()
-
-        #     await page.wait_for_selector(
-        #         "div#results.site-container div.row table.records-table", timeout=15000
-        #     )
-
-        #     html = await page.content()
-
-        #     response = response.replace(body=html)
-
-        #     rows = response.xpath(
-        #         ".//table[contains(@class,'records-table')]/tbody//tr"
-        #     )
-
-        #     for row in rows:
-        #         pos = row.xpath('./td[@data-th="POS"]/text()').get()
-        #         rank = row.css("td[data-th='Rank']::text").get()
-        #         heat = row.css("td[data-th='Heat']::text").get()
-        #         athlete_name = row.xpath(
-        #             "normalize-space(string(.//td[translate(@data-th,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz')='athlete']//a))"
-        #         ).get()
-        #         # athlete_name = " ".join(t.strip() for t in athlete_name if t.strip())
-        #         country = row.xpath('./td[@data-th="COUNTRY"]//text()').getall()
-        #         mark = " ".join(
-        #             t.strip()
-        #             for t in row.css("td[data-th='RESULTS'] span::text").getall()
-        #             if t.strip()
-        #         )
-        #         yield {
-        #             "anchor_id": anchor_id,
-        #             "competition_name": competition_name,
-        #             "competition_description": competition_description,
-        #             "event_name": event_name,
-        #             "round_name": round_name,
-        #             "position": pos,
-        #             "rank": rank,
-        #             "heat": heat,
-        #             "athlete": athlete_name,
-        #             "country": country,
-        #             "mark": mark,
-        #         }
-        # else:
-        #     # await page.wait_for_load_state("networkidle")
-        #     nav = page.locator("div.res-nav-container.module")
-
-        #     summary_li = nav.locator("li", has_text="Result")
-
-        #     if await summary_li.count() == 0:
-        #         self.logger.warning("Final tab not found on %s", response.url)
-        #         return
-
-        #     is_active = await summary_li.evaluate(
-        #         "el => el.classList.contains('active')"
-        #     )
-
-        #     if not is_active:
-        #         await summary_li.locator("a").click()
-
-        #     await page.wait_for_selector(
-        #         "div#results.site-container div.row table.records-table", timeout=15000
-        #     )
-
-        #     html = await page.content()
-
-        #     response = response.replace(body=html)
-        #     rows = response.xpath(
-        #         "//table[contains(@class,'records-table') and contains(@class,'clickable')]/tbody/tr"
-        #     )
-
-        #     for row in rows:
-        #         pos = row.xpath('./td[@data-th="POS"]/text()').get()
-        #         rank = row.css("td[data-th='Rank']::text").get()
-        #         heat = row.css("td[data-th='Heat']::text").get()
-        #         athlete_name = row.xpath(
-        #             "normalize-space(string(.//td[translate(@data-th,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz')='athlete']//a))"
-        #         ).get()
-
-        #         # athlete_name = " ".join(t.strip() for t in athlete_name if t.strip())
-        #         country = row.xpath('./td[@data-th="COUNTRY"]//text()').getall()
-        #         mark = " ".join(
-        #             t.strip()
-        #             for t in row.css("td[data-th='RESULTS'] span::text").getall()
-        #             if t.strip()
-        #         )
-
-        #         if not mark:
-        #             mark = " ".join(
-        #                 t.strip()
-        #                 for t in row.css("td[data-th='MARK'] ::text").getall()
-        #                 if t.strip()
-        #             )
-
-        #         yield {
-        #             "anchor_id": anchor_id,
-        #             "competition_name": competition_name,
-        #             "competition_description": competition_description,
-        #             "event_name": event_name,
-        #             "round_name": round_name,
-        #             "position": pos,
-        #             "rank": rank,
-        #             "heat": heat,
-        #             "athlete": athlete_name,
-        #             "country": country,
-        #             "mark": mark,
-        #         }
+    async def _extract_rounds(
+        self,
+        page,
+        response,
+        round_name,
+        competition_name,
+        event_name,
+        anchor_id,
+        competition_description,
+    ):
+        snapshot = RenderSnapshot.for_spider(self, page, response)
+        tables = response.xpath("//table[contains(@class,'records-table')]")
+        if tables and self._on_results_tab(response, round_name):
+            ## The navigation landed on the tab with its table, nothing to do
+            self._inc_stat("tab_switch/direct")
+        else:
+            with timed(response, CLICK_WAIT):
+                opened = await self._open_results_tab(page, response, round_name)
+            if not opened:
+                return
+            snapshot.changed()
+            response = await snapshot.response()
+            tables = response.xpath("//table[contains(@class,'records-table')]")
+
+        for table in tables:
+            for row in RESULT_TABLE.rows(table):
+                yield IndoorResultItem(
+                    anchor_id=anchor_id,
+                    competition_name=competition_name,
+                    competition_description=competition_description,
+                    event_name=event_name,
+                    round_name=round_name,
+                    **row,
+                )
@@ -0,0 +1,143 @@
+## Row-vectorised table extraction shared by the spiders
+#
+# Column positions are resolved once per table (from a header row, a data-th
+# style attribute or a fixed td index), all XPath expressions are compiled
+# once per extractor and every row is walked a single time, collecting each
+# cell into columnar lists.
+
+from lxml import etree
+
+FIRST = "first"
+JOINED = "joined"
+VALUE = "value"
+
+
+class Column:
+    """
+    One output column of a table.
+
+    :param name: key of the column in the extracted data
+    :param header: header label(s) (case insensitive) used to find the td
+    :param index: 1-based td index, used when no header matches
+    :param path: XPath relative to the td, defaults to all descendant text
+    :param mode: FIRST keeps the first text node (like ``.get()``), JOINED
+        joins the stripped non-empty text nodes with a space and VALUE keeps
+        the result of an XPath string expression as is
+    :param default: value used when the row has no such cell
+    """
+
+    __slots__ = ("name", "headers", "index", "path", "mode", "default", "_xpath")
+
+    def __init__(
+        self, name, header=None, index=None, path=None, mode=FIRST, default=None
+    ):
+        if isinstance(header, str):
+            header = (header,)
+        self.name = name
+        self.headers = tuple(h.lower().strip() for h in header or ())
+        self.index = index
+        self.path = path
+        self.mode = mode
+        self.default = default
+        self._xpath = etree.XPath(path) if path else None
+
+    def read(self, cell):
+        if self._xpath is None:
+            texts = cell.itertext()
+        else:
+            texts = self._xpath(cell)
+            if self.mode == VALUE or isinstance(texts, str):
+                return str(texts)
+
+        if self.mode == JOINED:
+            return " ".join(t.strip() for t in texts if t.strip())
+        for t in texts:
+            return str(t)
+        return None
+
+
+class TableExtractor:
+    """
+    Extract columns from ``<table>`` elements.
+
+    :param columns: list of Column
+    :param row_path: XPath of the data rows relative to the table
+    :param header_path: XPath of the header cells relative to the table
+    :param header_attr: take the header labels from this attribute of the
+        cells of the first data row (e.g. ``data-th``) instead of header_path
+    """
+
+    def __init__(
+        self,
+        columns,
+        row_path=".//tbody/tr",
+        header_path=".//thead//th",
+        header_attr=None,
+    ):
+        self.columns = list(columns)
+        self.names = [c.name for c in self.columns]
+        self.header_attr = header_attr
+        self._rows = etree.XPath(row_path)
+        self._header = etree.XPath(header_path)
+
+    @staticmethod
+    def _cells(row):
+        return [cell for cell in row if cell.tag == "td"]
+
+    def _header_labels(self, table, rows):
+        if self.header_attr:
+            for row in rows:
+                cells = self._cells(row)
+                if cells:
+                    return [c.get(self.header_attr) or "" for c in cells]
+            return []
+        return ["".join(th.itertext()) for th in self._header(table)]
+
+    def resolve(self, table, rows=None):
+        """Return the 0-based td position of every column (or None)."""
+        if rows is None:
+            rows = self._rows(table)
+        labels = [label.lower().strip() for label in self._header_labels(table, rows)]
+
+        positions = []
+        for column in self.columns:
+            position = None
+            for header in column.headers:
+                if header in labels:
+                    position = labels.index(header)
+                    break
+            if position is None and column.index is not None:
+                position = column.index - 1
+            positions.append(position)
+        return positions
+
+    def extract(self, table):
+        """
+        Return ``{column name: [value per row]}`` for a table element or a
+        parsel Selector wrapping one.
+        """
+        table = getattr(table, "root", table)
+        rows = self._rows(table)
+        positions = self.resolve(table, rows)
+
+        data = {name: [] for name in self.names}
+        plan = [
+            (column, position, data[column.name].append)
+            for column, position in zip(self.columns, positions)
+        ]
+
+        for row in rows:
+            cells = self._cells(row)
+            n_cells = len(cells)
+            for column, position, append in plan:
+                if position is None or position >= n_cells:
+                    append(column.default)
+                else:
+                    append(column.read(cells[position]))
+        return data
+
+    def rows(self, table):
+        """Yield one dict per row, see extract()."""
+        data = self.extract(table)
+        for values in zip(*(data[name] for name in self.names)):
+            yield dict(zip(self.names, values))
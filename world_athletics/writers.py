@@ -0,0 +1,174 @@
+## Incremental JSON Lines output
+#
+# Rows are appended to one .jsonl file per key as items arrive. Writes are
+# buffered up to a bounded number of rows and flushed (optionally fsync'ed)
+# when the buffer is full and, once start() was called from open_spider, every
+# flush_interval seconds by a reactor timer, so a crash loses at most one
+# buffer or flush_interval seconds of rows however slowly items arrive. compact_jsonl() turns a finished .jsonl file into the
+# grouped, indented .json layout the pipelines always produced.
+#
+# With max_open_files > 0 files stay open between flushes, the least
+# recently used handle is closed once the cap is reached. With append (resumed
+# crawls) rows go after those of the earlier run, expanding its compacted
+# .json file back to .jsonl first.
+
+from collections import OrderedDict
+import json
+import os
+import time
+
+from itemadapter import ItemAdapter
+from twisted.internet import task
+
+
+class JsonLinesWriter:
+    def __init__(
+        self,
+        buffer_rows=500,
+        flush_interval=30,
+        fsync=True,
+        append=False,
+        max_open_files=0,
+    ):
+        self.buffer_rows = buffer_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.append = append
+        self.max_open_files = max_open_files
+        self._handles = OrderedDict()
+        self.paths = []
+        self._started = set()
+        self._buffers = {}
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._task = None
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        kwargs.setdefault("buffer_rows", settings.getint("STREAMING_BUFFER_ROWS", 500))
+        kwargs.setdefault(
+            "flush_interval", settings.getfloat("STREAMING_FLUSH_INTERVAL", 30)
+        )
+        kwargs.setdefault("fsync", settings.getbool("STREAMING_FSYNC", True))
+        kwargs.setdefault(
+            "max_open_files", settings.getint("STREAMING_MAX_OPEN_FILES", 0)
+        )
+        return cls(**kwargs)
+
+    def start(self, clock=None):
+        """Flush every flush_interval seconds until close()."""
+        if self.flush_interval <= 0:
+            return
+        self._task = task.LoopingCall(self.flush)
+        if clock is not None:
+            self._task.clock = clock
+        self._task.start(self.flush_interval, now=False)
+
+    def write(self, path, record):
+        buffer = self._buffers.get(path)
+        if buffer is None:
+            if path not in self._started:
+                self._start_file(path)
+            buffer = self._buffers[path] = []
+
+        ## Items (slotted dataclasses) are only turned into a dict to be dumped
+        if not isinstance(record, dict):
+            record = ItemAdapter(record).asdict()
+        buffer.append(json.dumps(record, ensure_ascii=False))
+        self._buffered += 1
+
+        if (
+            self._buffered >= self.buffer_rows
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def _start_file(self, path):
+        self._started.add(path)
+        self.paths.append(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        ## A new run starts the file from scratch unless asked to append
+        if not self.append:
+            open(path, "w", encoding="utf-8").close()
+        elif not os.path.exists(path):
+            ## Appending to a file compacted by an earlier run
+            expand_json(path[: -len(".jsonl")] + ".json", path)
+
+    def _handle(self, path):
+        f = self._handles.get(path)
+        if f is not None:
+            self._handles.move_to_end(path)
+            return f
+
+        while len(self._handles) >= self.max_open_files:
+            _, oldest = self._handles.popitem(last=False)
+            oldest.close()
+        f = self._handles[path] = open(path, "a", encoding="utf-8")
+        return f
+
+    @property
+    def open_files(self):
+        return len(self._handles)
+
+    def _write_lines(self, path, lines):
+        data = "\n".join(lines) + "\n"
+        if self.max_open_files <= 0:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            return
+
+        f = self._handle(path)
+        f.write(data)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def flush(self):
+        for path, lines in self._buffers.items():
+            if lines:
+                self._write_lines(path, lines)
+        self._buffers.clear()
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._task is not None and self._task.running:
+            self._task.stop()
+        self.flush()
+        for f in self._handles.values():
+            f.close()
+        self._handles.clear()
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def compact_jsonl(jsonl_path, json_path, remove=True):
+    """Write the rows of a .jsonl file as one indented JSON list."""
+    records = list(read_jsonl(jsonl_path))
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    if remove:
+        os.remove(jsonl_path)
+
+
+def expand_json(json_path, jsonl_path):
+    """Turn a file written by compact_jsonl() back into JSON Lines."""
+    if not os.path.exists(json_path):
+        return
+    with open(json_path, encoding="utf-8") as f:
+        records = json.load(f)
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.remove(json_path)